@@ -11,6 +11,8 @@ from datetime import datetime
 from app.script.highLevelAPI import LeadConnectorClient
 from app.script.scrapper import scrape_post_comments
 from app.services.ai_service import generateCommentsReply
+from app.services.ai_reply_queue_service import AIReplyQueueService
+from app.services.ghl_token_service import token_provider
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -111,24 +113,12 @@ def signup():
                         redirect_uri=current_app.config.get('GHL_REDIRECT_URI')
                     )
                     
-                    # Auto-refresh agency token if expired or expiring soon
-                    if agency_token.expires_soon(minutes=30):
-                        try:
-                            logging.info('Agency token expired or expiring soon, refreshing...')
-                            refresh_data = oauth_client.refresh_access_token(
-                                agency_token.refresh_token,
-                                agency_token.user_type
-                            )
-                            agency_token.update_tokens(refresh_data)
-                            db.session.commit()
-                            logging.info('Agency token refreshed successfully during signup')
-                        except Exception as refresh_err:
-                            logging.error(f"Failed to refresh agency token during signup: {refresh_err}")
-                            # Continue anyway - the token might still work
+                    # Agency token comes from the shared token cache, which handles refreshing
+                    agency_access_token, company_id = token_provider.get_agency_token()
                     
                     location_token_data = oauth_client.get_location_token_from_company(
-                        company_access_token=agency_token.access_token,
-                        company_id=agency_token.company_id,
+                        company_access_token=agency_access_token,
+                        company_id=company_id,
                         location_id=locationId
                     )
                     logging.info(f'Generated OAuth token for location: {locationId}')
@@ -194,7 +184,9 @@ def run_quick_service_background(app, userId):
             scraperResult = scrape_post_comments(posts)
             
             logging.info(f"Generating comments replies for user {userId}")
-            generateCommentsReply([userId])
+            # Scraping queued the new comments; reply to this user's now rather than on the next queue run
+            AIReplyQueueService.enqueue_pending([userId])
+            AIReplyQueueService.process(user_ids=[userId])
             
             print(f'*********** Quick Service Completed for user {userId}')
         except Exception as e:
@@ -305,23 +297,12 @@ def facebook_login():
                             redirect_uri=current_app.config.get('GHL_REDIRECT_URI')
                         )
                         
-                        # Auto-refresh agency token if expired or expiring soon
-                        if agency_token.expires_soon(minutes=30):
-                            try:
-                                logging.info('Agency token expired or expiring soon, refreshing (FB signup)...')
-                                refresh_data = oauth_client.refresh_access_token(
-                                    agency_token.refresh_token,
-                                    agency_token.user_type
-                                )
-                                agency_token.update_tokens(refresh_data)
-                                db.session.commit()
-                                logging.info('Agency token refreshed successfully during FB signup')
-                            except Exception as refresh_err:
-                                logging.error(f"Failed to refresh agency token during FB signup: {refresh_err}")
+                        # Agency token comes from the shared token cache, which handles refreshing
+                        agency_access_token, company_id = token_provider.get_agency_token()
                         
                         location_token_data = oauth_client.get_location_token_from_company(
-                            company_access_token=agency_token.access_token,
-                            company_id=agency_token.company_id,
+                            company_access_token=agency_access_token,
+                            company_id=company_id,
                             location_id=locationId
                         )
                         GHLToken.create_location_token(
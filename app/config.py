@@ -19,10 +19,50 @@ class Config:
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:3001,http://localhost:8081,http://localhost:8080').split(',')
     
     #OPENAI Settings
+    # 'openai', or 'fake' for the offline stand-in used by app/script/benchmark_replies.py
+    AI_LLM_BACKEND = os.getenv('AI_LLM_BACKEND', 'openai')
+    AI_FAKE_LLM_LATENCY_MS = float(os.getenv('AI_FAKE_LLM_LATENCY_MS', 0))
+    AI_FAKE_LLM_ERROR_RATE = float(os.getenv('AI_FAKE_LLM_ERROR_RATE', 0))
+    AI_FAKE_LLM_MALFORMED_RATE = float(os.getenv('AI_FAKE_LLM_MALFORMED_RATE', 0))
+    AI_FAKE_LLM_SEED = int(os.getenv('AI_FAKE_LLM_SEED', 0))
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
     OPENAI_TEMPERATURE = os.getenv('OPENAI_TEMPERATURE', 0.7)
     OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', 2000))
+    OPENAI_REQUEST_TIMEOUT_SECONDS = int(os.getenv('OPENAI_REQUEST_TIMEOUT_SECONDS', 60))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+    # Batch reply requests kept in flight at once by generateCommentsReply
+    OPENAI_REPLY_CONCURRENCY = int(os.getenv('OPENAI_REPLY_CONCURRENCY', 4))
+    # Reply batches are packed up to a prompt token budget (posts sent once per batch)
+    AI_BATCH_PROMPT_TOKEN_BUDGET = int(os.getenv('AI_BATCH_PROMPT_TOKEN_BUDGET', 6000))
+    # Expected output tokens per reply; with OPENAI_MAX_TOKENS this caps comments per batch
+    AI_BATCH_REPLY_TOKENS = int(os.getenv('AI_BATCH_REPLY_TOKENS', 120))
+    AI_BATCH_MAX_COMMENTS = int(os.getenv('AI_BATCH_MAX_COMMENTS', 50))
+    AI_BATCH_MAX_POST_TOKENS = int(os.getenv('AI_BATCH_MAX_POST_TOKENS', 1500))
+    AI_BATCH_MAX_COMMENT_TOKENS = int(os.getenv('AI_BATCH_MAX_COMMENT_TOKENS', 300))
+    # Ask for a JSON object (response_format json_object); disable for models without JSON mode
+    OPENAI_JSON_MODE = os.getenv('OPENAI_JSON_MODE', 'true').lower() == 'true'
+    # Comments missing from a batch response are retried this many times, in batches of this size
+    AI_REPLY_RETRY_ROUNDS = int(os.getenv('AI_REPLY_RETRY_ROUNDS', 1))
+    AI_REPLY_RETRY_BATCH_SIZE = int(os.getenv('AI_REPLY_RETRY_BATCH_SIZE', 5))
+    # Comments that failed this many times are no longer sent to the LLM
+    AI_REPLY_MAX_FAILURES = int(os.getenv('AI_REPLY_MAX_FAILURES', 3))
+    # Pending comments read per query by the reply generator
+    AI_REPLY_PAGE_SIZE = int(os.getenv('AI_REPLY_PAGE_SIZE', 500))
+    # Reply work queue: how often it is drained, and how each round is shared out
+    AI_REPLY_QUEUE_MINUTES = int(os.getenv('AI_REPLY_QUEUE_MINUTES', 2))
+    AI_REPLY_QUEUE_ROUND_USERS = int(os.getenv('AI_REPLY_QUEUE_ROUND_USERS', 50))
+    AI_REPLY_QUEUE_USER_SHARE = int(os.getenv('AI_REPLY_QUEUE_USER_SHARE', 20))
+    AI_REPLY_QUEUE_LEASE_MINUTES = int(os.getenv('AI_REPLY_QUEUE_LEASE_MINUTES', 15))
+    # Users signed up within this many hours get their replies first
+    AI_REPLY_QUEUE_NEW_USER_HOURS = int(os.getenv('AI_REPLY_QUEUE_NEW_USER_HOURS', 72))
+    # Comments posted within this many hours get a fading freshness boost
+    AI_REPLY_QUEUE_FRESH_HOURS = int(os.getenv('AI_REPLY_QUEUE_FRESH_HOURS', 24))
+    # Reuse replies for repeated short comments ("Nice!", emoji-only) on the same post and user
+    AI_REPLY_CACHE_ENABLED = os.getenv('AI_REPLY_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_REPLY_CACHE_TTL_HOURS = int(os.getenv('AI_REPLY_CACHE_TTL_HOURS', 168))
+    AI_REPLY_CACHE_MAX_ENTRIES = int(os.getenv('AI_REPLY_CACHE_MAX_ENTRIES', 20000))
+    AI_REPLY_CACHE_MAX_COMMENT_CHARS = int(os.getenv('AI_REPLY_CACHE_MAX_COMMENT_CHARS', 80))
 
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
@@ -57,6 +97,48 @@ class Config:
     GHL_CLIENT_ID = os.getenv('GHL_CLIENT_ID')
     GHL_CLIENT_SECRET = os.getenv('GHL_CLIENT_SECRET')
     GHL_REDIRECT_URI = os.getenv('GHL_REDIRECT_URI')
+    # Users (by email, comma-separated) allowed to call the /ghl/admin/* endpoints
+    GHL_ADMIN_EMAILS = [e.strip().lower() for e in os.getenv('GHL_ADMIN_EMAILS', '').split(',') if e.strip()]
+
+    # GoHighLevel mirror sync
+    GHL_TASK_SYNC_MINUTES = int(os.getenv('GHL_TASK_SYNC_MINUTES', 60))
+    GHL_OPPORTUNITY_SYNC_MINUTES = int(os.getenv('GHL_OPPORTUNITY_SYNC_MINUTES', 30))
+    # Opportunity syncs are incremental (changed since the last run); a full
+    # reconcile that also drops deleted opportunities runs this often
+    GHL_OPPORTUNITY_FULL_SYNC_HOURS = int(os.getenv('GHL_OPPORTUNITY_FULL_SYNC_HOURS', 24))
+    GHL_SYNC_CONCURRENCY = int(os.getenv('GHL_SYNC_CONCURRENCY', 5))
+    GHL_FANOUT_CONCURRENCY = int(os.getenv('GHL_FANOUT_CONCURRENCY', 8))
+    GHL_STATS_CACHE_TTL_SECONDS = int(os.getenv('GHL_STATS_CACHE_TTL_SECONDS', 120))
+    # Pages of history fetched the first time a conversation is opened (older ones load on scroll)
+    GHL_MESSAGE_INITIAL_PAGES = int(os.getenv('GHL_MESSAGE_INITIAL_PAGES', 1))
+
+    # GoHighLevel bulk messaging
+    GHL_BULK_MESSAGE_CONCURRENCY = int(os.getenv('GHL_BULK_MESSAGE_CONCURRENCY', 4))
+    GHL_BULK_MESSAGE_BATCH_SIZE = int(os.getenv('GHL_BULK_MESSAGE_BATCH_SIZE', 50))
+    GHL_BULK_MESSAGE_MAX_ATTEMPTS = int(os.getenv('GHL_BULK_MESSAGE_MAX_ATTEMPTS', 3))
+    # When the rate limiter holds sends back, wait this long in-process at most;
+    # longer waits (e.g. a spent daily quota) pause the job for the resume job to pick up
+    GHL_BULK_MESSAGE_MAX_SLEEP_SECONDS = int(os.getenv('GHL_BULK_MESSAGE_MAX_SLEEP_SECONDS', 60))
+    # A running job that hasn't reported progress for this long is taken over by the resume job
+    GHL_BULK_MESSAGE_STALE_MINUTES = int(os.getenv('GHL_BULK_MESSAGE_STALE_MINUTES', 10))
+    # How often a runner reports it is alive while a batch is in flight
+    GHL_BULK_MESSAGE_HEARTBEAT_SECONDS = int(os.getenv('GHL_BULK_MESSAGE_HEARTBEAT_SECONDS', 30))
+    GHL_BULK_MESSAGE_RESUME_MINUTES = int(os.getenv('GHL_BULK_MESSAGE_RESUME_MINUTES', 5))
+
+    # GoHighLevel contact import; uploads and result reports go to GHL_IMPORT_DIR
+    # (default: <instance path>/ghl_imports)
+    GHL_IMPORT_DIR = os.getenv('GHL_IMPORT_DIR')
+    GHL_IMPORT_CONCURRENCY = int(os.getenv('GHL_IMPORT_CONCURRENCY', 4))
+    GHL_IMPORT_CHUNK_SIZE = int(os.getenv('GHL_IMPORT_CHUNK_SIZE', 200))
+    # How often imports paused on a spent daily quota are checked for resuming
+    GHL_IMPORT_RESUME_MINUTES = int(os.getenv('GHL_IMPORT_RESUME_MINUTES', 15))
+
+    # GoHighLevel OAuth token cache
+    GHL_TOKEN_CACHE_TTL_SECONDS = int(os.getenv('GHL_TOKEN_CACHE_TTL_SECONDS', 300))
+    GHL_TOKEN_REFRESH_MARGIN_MINUTES = int(os.getenv('GHL_TOKEN_REFRESH_MARGIN_MINUTES', 30))
+    GHL_TOKEN_REFRESH_INTERVAL_MINUTES = int(os.getenv('GHL_TOKEN_REFRESH_INTERVAL_MINUTES', 5))
+    GHL_TOKEN_REFRESH_BATCH_SIZE = int(os.getenv('GHL_TOKEN_REFRESH_BATCH_SIZE', 20))
+    GHL_TOKEN_REFRESH_CONCURRENCY = int(os.getenv('GHL_TOKEN_REFRESH_CONCURRENCY', 4))
 
     FACEBOOK_TASK_TIME_MINUTES = int(os.getenv('FACEBOOK_TASK_TIME_MINUTES', 59))
     FACEBOOK_POST_LIMIT = int(os.getenv('FACEBOOK_POST_LIMIT', 50))
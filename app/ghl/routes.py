@@ -1,12 +1,27 @@
-from flask import Blueprint, current_app, request, jsonify
-from app.script.highLevelAPI import LeadConnectorClient
+from flask import Blueprint, current_app, request, jsonify, send_file
+from app.script.ghl_rate_limiter import rate_limiter
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.ghl_token import GHLToken
 from app.models.ghl_task import GHLTask
+from app.models.ghl_sync_state import GHLSyncState
+from app.models.ghl_opportunity import GHLOpportunity
+from app.models.ghl_message import GHLMessage
+from app.models.job import Job
+from app.models.bulk_message_recipient import BulkMessageRecipient
 from app.extensions import db
+from app.services.pagination import keyset_paginate, InvalidCursor
+from app.services.ghl_sync_service import GHLTaskSyncService, GHLOpportunitySyncService
+from app.services.ghl_token_service import token_provider
+from app.services.ghl_contact_service import GHLContactService
+from app.services.ghl_message_service import GHLMessageService
+from app.services.ghl_bulk_message_service import GHLBulkMessageService, MESSAGE_TYPES as BULK_MESSAGE_TYPES
+from app.services.ghl_contact_import_service import GHLContactImportService, FORMATS as IMPORT_FORMATS
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, or_
 from functools import wraps
 import logging
+import os
 
 ghl = Blueprint('ghl', __name__)
 
@@ -14,49 +29,17 @@ def init_ghl_client():
     """
     Initialize GHL client with the current user's OAuth token.
     
-    Gets OAuth token from ghl_tokens table for the user's location.
-    Auto-refreshes if token is expiring soon.
+    Tokens are served from the in-process token cache; the database is only
+    consulted on a cache miss, and a refresh only happens inline if the token
+    has (nearly) expired. Pre-emptive refreshes run in the scheduler.
     """
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
-    if not user:
-        raise Exception("User not found")
-    
-    location_id = user.ghl_location_id
-    if not location_id:
-        raise Exception("User has no GHL location configured")
-    
-    # Get OAuth token for this location
-    ghl_token = GHLToken.get_by_location(location_id)
-    
-    if not ghl_token:
-        raise Exception(f"No OAuth token found for location {location_id}. Please re-authorize.")
-    
-    # Check if token needs refresh
-    if ghl_token.expires_soon(minutes=30):
-        try:
-            from app.script.ghl_oauth import GHLOAuthClient
-            oauth_client = GHLOAuthClient(
-                client_id=current_app.config.get('GHL_CLIENT_ID'),
-                client_secret=current_app.config.get('GHL_CLIENT_SECRET'),
-                redirect_uri=current_app.config.get('GHL_REDIRECT_URI')
-            )
-            token_data = oauth_client.refresh_access_token(
-                ghl_token.refresh_token,
-                ghl_token.user_type
-            )
-            ghl_token.update_tokens(token_data)
-            db.session.commit()
-            logging.info(f"Refreshed OAuth token for location {location_id}")
-        except Exception as e:
-            logging.error(f"Failed to refresh OAuth token: {e}")
-            # Continue with existing token if refresh fails
-    
-    return LeadConnectorClient(
-        access_token=ghl_token.access_token,
-        location_id=location_id
-    )
+    location_id = token_provider.get_user_location(get_jwt_identity())
+    return token_provider.client_for_location(location_id)
+
+
+def _wants_fresh():
+    """True if the caller asked to bypass the GHL metadata cache (?fresh=true)."""
+    return request.args.get('fresh', '').lower() in ('true', '1')
 
 
 def init_agency_client():
@@ -65,34 +48,19 @@ def init_agency_client():
     
     Use this for admin operations that need access to all locations.
     """
-    agency_token = GHLToken.get_agency_token()
-    
-    if not agency_token:
-        raise Exception("No agency OAuth token found. Please authorize the marketplace app first.")
-    
-    # Check if token needs refresh
-    if agency_token.expires_soon(minutes=30):
-        try:
-            from app.script.ghl_oauth import GHLOAuthClient
-            oauth_client = GHLOAuthClient(
-                client_id=current_app.config.get('GHL_CLIENT_ID'),
-                client_secret=current_app.config.get('GHL_CLIENT_SECRET'),
-                redirect_uri=current_app.config.get('GHL_REDIRECT_URI')
-            )
-            token_data = oauth_client.refresh_access_token(
-                agency_token.refresh_token,
-                agency_token.user_type
-            )
-            agency_token.update_tokens(token_data)
-            db.session.commit()
-            logging.info("Refreshed agency OAuth token")
-        except Exception as e:
-            logging.error(f"Failed to refresh agency OAuth token: {e}")
-    
-    return LeadConnectorClient(
-        access_token=agency_token.access_token,
-        location_id=None  # Agency level - no specific location
-    )
+    return token_provider.agency_client()
+
+
+def admin_required(fn):
+    """Allow only users listed in GHL_ADMIN_EMAILS; use below @jwt_required()."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        user = User.query.get(get_jwt_identity())
+        admins = current_app.config.get('GHL_ADMIN_EMAILS') or []
+        if not user or (user.email or '').lower() not in admins:
+            return jsonify({"error": "Admin access required"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
 
 
 # ========== Agency Admin Endpoints ==========
@@ -120,13 +88,50 @@ def get_agency_location(location_id):
     """Get any location details using agency token (admin only)"""
     try:
         client = init_agency_client()
-        location = client.get_location(location_id)
+        location = client.get_location(location_id, fresh=_wants_fresh())
         return jsonify(location), 200
     except Exception as e:
         logging.error(f"Error getting location {location_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@ghl.route('/admin/rate-limits', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_rate_limits():
+    """Current GHL rate-limit budget usage per location/agency key (admin only)
+
+    Query params:
+        - key: Only return this key, e.g. location:<id> or agency:<companyId>
+    """
+    try:
+        budgets = rate_limiter.snapshot(request.args.get('key'))
+        return jsonify({"budgets": budgets, "total": len(budgets)}), 200
+    except Exception as e:
+        logging.error(f"Error getting rate limits: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@ghl.route('/admin/token-health', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_token_health():
+    """Tokens whose background refresh is failing or that have already expired (admin only)"""
+    try:
+        unhealthy = GHLToken.query.filter(
+            (GHLToken.refresh_failures > 0) | (GHLToken.expires_at <= datetime.utcnow())
+        ).order_by(GHLToken.expires_at.asc()).all()
+
+        return jsonify({
+            "tokens": [token.to_dict() for token in unhealthy],
+            "total": len(unhealthy),
+            "cache": token_provider.stats()
+        }), 200
+    except Exception as e:
+        logging.error(f"Error getting token health: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 # ========== Contact Management ==========
 @ghl.route('/contacts', methods=['GET'])
 @jwt_required()
@@ -158,6 +163,7 @@ def list_contacts():
         query_params = {k: v for k, v in query_params.items() if v is not None and v != ''}
         
         contacts = client.list_contacts(**query_params)
+        GHLContactService.cache_contacts(client.location_id, contacts.get('contacts', []))
         return jsonify(contacts), 200
     except Exception as e:
         logging.error(f"Error listing contacts: {str(e)}")
@@ -170,6 +176,7 @@ def get_contact(contact_id):
     try:
         client = init_ghl_client()
         contact = client.get_contact(contact_id)
+        GHLContactService.cache_contacts(client.location_id, [contact.get('contact', contact)])
         return jsonify(contact), 200
     except Exception as e:
         logging.error(f"Error getting contact {contact_id}: {str(e)}")
@@ -186,6 +193,7 @@ def create_contact():
         
         client = init_ghl_client()
         contact = client.create_contact(data)
+        GHLContactService.cache_contacts(client.location_id, [contact.get('contact', contact)])
         return jsonify(contact), 201
     except Exception as e:
         logging.error(f"Error creating contact: {str(e)}")
@@ -202,6 +210,7 @@ def update_contact(contact_id):
         
         client = init_ghl_client()
         contact = client.update_contact(contact_id, data)
+        GHLContactService.cache_contacts(client.location_id, [contact.get('contact', contact)])
         return jsonify(contact), 200
     except Exception as e:
         logging.error(f"Error updating contact {contact_id}: {str(e)}")
@@ -214,11 +223,94 @@ def delete_contact(contact_id):
     try:
         client = init_ghl_client()
         client.delete_contact(contact_id)
+        GHLContactService.forget_contact(client.location_id, contact_id)
         return jsonify({"message": "Contact deleted successfully"}), 200
     except Exception as e:
         logging.error(f"Error deleting contact {contact_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def _get_import_job(job_id):
+    """The current user's contact import job, or None."""
+    return Job.query.filter_by(
+        id=job_id, user_id=get_jwt_identity(), job_type=Job.TYPE_GHL_CONTACT_IMPORT
+    ).first()
+
+@ghl.route('/contacts/import', methods=['POST'])
+@jwt_required()
+def import_contacts():
+    """Bulk-import contacts from a CSV or NDJSON file as a background job
+
+    Send the file as multipart field `file` (format taken from its extension,
+    or the `format` form field), or as the raw request body with Content-Type
+    text/csv or application/x-ndjson.
+
+    Recognised columns / keys: firstName, lastName, name, email, phone,
+    companyName, address1, city, state, postalCode, country, website,
+    timezone, source, tags (comma separated in CSV), dateOfBirth. Header
+    spelling is flexible (e.g. "First Name", "first_name").
+    """
+    try:
+        upload = request.files.get('file')
+        if upload:
+            fmt = request.form.get('format') or os.path.splitext(upload.filename or '')[1].lstrip('.').lower()
+            stream = upload.stream
+        else:
+            fmt = request.args.get('format') or request.mimetype.rsplit('/', 1)[-1].replace('x-', '')
+            stream = request.stream
+        fmt = {'jsonl': 'ndjson', 'json': 'ndjson'}.get(fmt, fmt)
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({"error": f"Upload a CSV or NDJSON file (got format '{fmt}')"}), 400
+
+        user_id = get_jwt_identity()
+        location_id = token_provider.get_user_location(user_id)
+        job = GHLContactImportService.create_job(user_id, location_id, stream, fmt)
+
+        from app.extensions import init_scheduler
+        app = current_app._get_current_object()
+        job_id = init_scheduler().run_job_async(GHLContactImportService.run_job_background, app, job.id)
+        if not job_id:
+            job.mark_failed("Failed to schedule import")
+            return jsonify({"error": "Failed to schedule import"}), 500
+
+        return jsonify({"message": "Contact import started", "job_id": job.id, "job": job.to_dict()}), 202
+    except Exception as e:
+        logging.error(f"Error starting contact import: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/contacts/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_contact_import(job_id):
+    """Progress of a contact import job (result counts appear in `result` once it completes)"""
+    try:
+        job = _get_import_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job.to_dict()), 200
+    except Exception as e:
+        logging.error(f"Error getting contact import {job_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/contacts/import/<job_id>/report', methods=['GET'])
+@jwt_required()
+def download_contact_import_report(job_id):
+    """Download the per-row CSV report (row, email, phone, result, contact_id, error); partial while running"""
+    try:
+        job = _get_import_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        report_path = job.get_params().get('report_path')
+        if not report_path or not os.path.exists(report_path):
+            return jsonify({"error": "Report not available yet"}), 404
+        return send_file(
+            report_path,
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=f"contact-import-{job.id}.csv"
+        )
+    except Exception as e:
+        logging.error(f"Error downloading contact import report {job_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # ========== Location Management ==========
 @ghl.route('/locations', methods=['GET'])
 @jwt_required()
@@ -228,7 +320,7 @@ def get_location(location_id=None):
         client = init_ghl_client()
         # Always use the user's own location from their profile
         # The location_id param is ignored for security
-        location = client.get_location()
+        location = client.get_location(fresh=_wants_fresh())
         return jsonify(location), 200
     except Exception as e:
         logging.error(f"Error getting location: {str(e)}")
@@ -259,7 +351,7 @@ def list_campaigns():
 def get_all_tasks():
     """Get all tasks across all contacts.
     
-    Loops through contacts and fetches their tasks.
+    Fetches each contact's tasks concurrently (GHL_FANOUT_CONCURRENCY in flight).
     Query params:
         - limit: Max contacts to scan (default 100, max 500)
     """
@@ -268,7 +360,10 @@ def get_all_tasks():
         limit = request.args.get('limit', 100, type=int)
         limit = min(limit, 500)  # Cap at 500 contacts
         
-        result = client.get_all_tasks(limit=limit)
+        result = client.get_all_tasks(
+            limit=limit,
+            max_workers=current_app.config.get('GHL_FANOUT_CONCURRENCY', 8)
+        )
         return jsonify(result), 200
     except Exception as e:
         logging.error(f"Error fetching all tasks: {str(e)}")
@@ -301,19 +396,8 @@ def create_task(contact_id):
         # Save to local DB after GHL success
         try:
             user_id = get_jwt_identity()
-            # Try to get contact info for caching
-            contact_info = None
-            try:
-                contact_data = client.get_contact(contact_id)
-                c = contact_data.get('contact', contact_data)
-                contact_info = {
-                    'firstName': c.get('firstName', ''),
-                    'lastName': c.get('lastName', ''),
-                    'email': c.get('email', ''),
-                    'phone': c.get('phone', ''),
-                }
-            except Exception:
-                pass
+            # Contact info comes from the local contact cache; a miss is filled in the background
+            contact_info = GHLContactService.get_contact_info(client.location_id, contact_id)
 
             ghl_task_data = task.get('task', task)
             local_task = GHLTask.from_ghl_response(
@@ -325,6 +409,14 @@ def create_task(contact_id):
             db.session.add(local_task)
             db.session.commit()
             logging.info(f"Saved task {local_task.ghl_task_id} locally")
+
+            if contact_info is None:
+                GHLContactService.fill_task_contact_background(
+                    current_app._get_current_object(),
+                    client.location_id,
+                    local_task.ghl_task_id,
+                    contact_id
+                )
         except Exception as local_err:
             db.session.rollback()
             logging.warning(f"GHL task created but local save failed: {local_err}")
@@ -428,80 +520,125 @@ def complete_task(contact_id, task_id):
 
 
 # ========== Local Task Routes (read from local DB only) ==========
+LOCAL_TASK_SORT_COLUMNS = {
+    'created_at': GHLTask.created_at,
+    'updated_at': GHLTask.updated_at,
+    'due_date': GHLTask.due_date,
+    'title': GHLTask.title,
+    'completed': GHLTask.completed
+}
+
+
+def _filter_local_tasks(query):
+    """Apply the shared completed / due_date / pending_today filters from the query string."""
+    completed_filter = request.args.get('completed')
+    if completed_filter is not None:
+        query = query.filter_by(completed=completed_filter.lower() == 'true')
+
+    # Due Date / Pending Filtering
+    due_date_str = request.args.get('due_date') # Format: YYYY-MM-DD
+    pending_today = request.args.get('pending_today', '').lower() == 'true'
+
+    target_date = None
+    if pending_today:
+        # Force completed=False and due_date = today if 'pending_today' flag is passed
+        query = query.filter_by(completed=False)
+        target_date = datetime.now(timezone.utc).date()
+    elif due_date_str:
+        # Only filter due_date if pending_today wasn't used
+        try:
+            target_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            logging.warning(f"Invalid due_date format: {due_date_str}. Expected YYYY-MM-DD.")
+
+    if target_date:
+        # Range filter instead of DATE(due_date) so the due_date index can be used
+        day_start = datetime.combine(target_date, datetime.min.time())
+        query = query.filter(
+            GHLTask.due_date >= day_start,
+            GHLTask.due_date < day_start + timedelta(days=1)
+        )
+
+    return query
+
+
+def _paginate_local_tasks(query):
+    """
+    Keyset-paginate a filtered GHLTask query using the request's sort/cursor params.
+
+    Returns a (response, status) tuple ready to be returned from the route.
+    """
+    return _paginate_local(query, LOCAL_TASK_SORT_COLUMNS, 'created_at', GHLTask.id, 'tasks')
+
+
+def _paginate_local(query, sort_columns, default_sort, id_column, items_key):
+    """Keyset-paginate any local mirror query; the page's rows go under items_key."""
+    sort_by = request.args.get('sortBy', default_sort)
+    if sort_by not in sort_columns:
+        sort_by = default_sort
+    sort_order = 'asc' if request.args.get('sortOrder', 'desc').lower() == 'asc' else 'desc'
+
+    per_page = request.args.get('per_page', type=int) or request.args.get('limit', 50, type=int)
+    per_page = max(1, min(per_page, 200))
+    cursor = request.args.get('cursor')
+    # Legacy page numbers still work but use OFFSET; new clients should follow next_cursor
+    page = request.args.get('page', 1, type=int)
+    include_total = request.args.get('include_total', '').lower() == 'true'
+
+    total = query.order_by(None).count() if include_total else None
+
+    try:
+        items, next_cursor = keyset_paginate(
+            query,
+            sort_key=sort_by,
+            sort_column=sort_columns[sort_by],
+            id_column=id_column,
+            sort_order=sort_order,
+            cursor=cursor,
+            limit=per_page,
+            offset=(page - 1) * per_page if page > 1 else None,
+        )
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = {
+        items_key: [item.to_dict() for item in items],
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    }
+    if not cursor:
+        response['page'] = page
+    if include_total:
+        response['total'] = total
+        response['pages'] = (total + per_page - 1) // per_page
+    return jsonify(response), 200
+
+
 @ghl.route('/local/tasks', methods=['GET'])
 @jwt_required()
 def list_local_tasks():
     """List all tasks from local DB for the current user.
     
     Query params:
-        - page: Page number (default 1)
         - per_page: Items per page (default 50, max 200)
+        - cursor: Opaque cursor from the previous page's next_cursor
+        - sortBy: created_at, updated_at, due_date, title or completed
+        - sortOrder: asc or desc (default desc)
+        - include_total: Also return total/pages (runs a COUNT, default false)
+        - page: Legacy page number, ignored when cursor is given
         - completed: Filter by completed status (true/false)
         - contact_id: Filter by GHL contact ID
     """
     try:
         user_id = get_jwt_identity()
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 50, type=int), 200)
-
-        query = GHLTask.query.filter_by(user_id=user_id)
-
-        # Optional filters
-        completed_filter = request.args.get('completed')
-        if completed_filter is not None:
-            query = query.filter_by(completed=completed_filter.lower() == 'true')
-            
-        # Due Date / Pending Filtering
-        due_date_str = request.args.get('due_date') # Format: YYYY-MM-DD
-        pending_today = request.args.get('pending_today', '').lower() == 'true'
-        
-        if pending_today:
-            # Force completed=False and due_date = today if 'pending_today' flag is passed
-            query = query.filter_by(completed=False)
-            from datetime import datetime, timezone
-            today = datetime.now(timezone.utc).date()
-            query = query.filter(db.func.date(GHLTask.due_date) == today)
-        elif due_date_str:
-            # Only filter due_date if pending_today wasn't used
-            try:
-                from datetime import datetime
-                target_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
-                query = query.filter(db.func.date(GHLTask.due_date) == target_date)
-            except ValueError:
-                logging.warning(f"Invalid due_date format: {due_date_str}. Expected YYYY-MM-DD.")
+        query = _filter_local_tasks(GHLTask.query.filter_by(user_id=user_id))
 
         contact_id_filter = request.args.get('contact_id')
         if contact_id_filter:
             query = query.filter_by(ghl_contact_id=contact_id_filter)
 
-        # Add support for sorting
-        sort_by = request.args.get('sortBy', 'created_at')
-        sort_order = request.args.get('sortOrder', 'desc').lower()
-
-        valid_sort_columns = {
-            'created_at': GHLTask.created_at,
-            'updated_at': GHLTask.updated_at,
-            'due_date': GHLTask.due_date,
-            'title': GHLTask.title,
-            'completed': GHLTask.completed
-        }
-        
-        sort_column = valid_sort_columns.get(sort_by, GHLTask.created_at)
-        
-        if sort_order == 'asc':
-            query = query.order_by(sort_column.asc())
-        else:
-            query = query.order_by(sort_column.desc())
-
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-        return jsonify({
-            'tasks': [t.to_dict() for t in pagination.items],
-            'total': pagination.total,
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'pages': pagination.pages,
-        }), 200
+        return _paginate_local_tasks(query)
     except Exception as e:
         logging.error(f"Error listing local tasks: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -525,67 +662,221 @@ def get_local_task(task_id):
 @ghl.route('/local/contacts/<contact_id>/tasks', methods=['GET'])
 @jwt_required()
 def list_local_contact_tasks(contact_id):
-    """List local tasks for a specific GHL contact."""
+    """List local tasks for a specific GHL contact.
+
+    Accepts the same pagination, sorting and filter params as /local/tasks.
+    """
     try:
         user_id = get_jwt_identity()
-
-        # Sorting logic
-        sort_by = request.args.get('sortBy', 'created_at')
-        sort_order = request.args.get('sortOrder', 'desc').lower()
-
-        valid_sort_columns = {
-            'created_at': GHLTask.created_at,
-            'updated_at': GHLTask.updated_at,
-            'due_date': GHLTask.due_date,
-            'title': GHLTask.title,
-            'completed': GHLTask.completed
-        }
-        
-        sort_column = valid_sort_columns.get(sort_by, GHLTask.created_at)
-
         query = GHLTask.query.filter_by(
             user_id=user_id,
             ghl_contact_id=contact_id
         )
+        query = _filter_local_tasks(query)
+        return _paginate_local_tasks(query)
+    except Exception as e:
+        logging.error(f"Error listing local tasks for contact {contact_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-        # Optional filters
-        completed_filter = request.args.get('completed')
-        if completed_filter is not None:
-            query = query.filter_by(completed=completed_filter.lower() == 'true')
 
-        # Due Date / Pending Filtering
-        due_date_str = request.args.get('due_date') # Format: YYYY-MM-DD
-        pending_today = request.args.get('pending_today', '').lower() == 'true'
-        
-        if pending_today:
-            # Force completed=False and due_date = today if 'pending_today' flag is passed
-            query = query.filter_by(completed=False)
-            from datetime import datetime, timezone
-            today = datetime.now(timezone.utc).date()
-            query = query.filter(db.func.date(GHLTask.due_date) == today)
-        elif due_date_str:
-            # Only filter due_date if pending_today wasn't used
-            try:
-                from datetime import datetime
-                target_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
-                query = query.filter(db.func.date(GHLTask.due_date) == target_date)
-            except ValueError:
-                logging.warning(f"Invalid due_date format: {due_date_str}. Expected YYYY-MM-DD.")
-
-        # Sorting logic
-        if sort_order == 'asc':
-            query = query.order_by(sort_column.asc())
-        else:
-            query = query.order_by(sort_column.desc())
+@ghl.route('/local/tasks/sync', methods=['POST'])
+@jwt_required()
+def trigger_local_task_sync():
+    """Start a background mirror sync of the user's GHL tasks into the local table."""
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        if not user or not user.ghl_location_id:
+            return jsonify({"error": "User has no GHL location configured"}), 400
 
-        tasks = query.all()
+        state = GHLSyncState.get_or_create(user.ghl_location_id, GHLSyncState.RESOURCE_TASKS)
+        if state.is_locked():
+            return jsonify({"message": "Task sync already running", "sync": state.to_dict()}), 202
 
-        return jsonify({
-            'tasks': [t.to_dict() for t in tasks],
-            'total': len(tasks),
-        }), 200
+        from app.extensions import init_scheduler
+        app = current_app._get_current_object()
+        job_id = init_scheduler().run_job_async(GHLTaskSyncService.run_for_user_background, app, user.id)
+        if not job_id:
+            return jsonify({"error": "Failed to schedule task sync"}), 500
+
+        return jsonify({"message": "Task sync started", "job_id": job_id}), 202
     except Exception as e:
-        logging.error(f"Error listing local tasks for contact {contact_id}: {str(e)}")
+        logging.error(f"Error triggering local task sync: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@ghl.route('/local/tasks/sync', methods=['GET'])
+@jwt_required()
+def get_local_task_sync_status():
+    """Get the mirror sync checkpoint for the user's GHL location."""
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        if not user or not user.ghl_location_id:
+            return jsonify({"error": "User has no GHL location configured"}), 400
+
+        state = GHLSyncState.query.filter_by(
+            location_id=user.ghl_location_id,
+            resource=GHLSyncState.RESOURCE_TASKS
+        ).first()
+        if not state:
+            return jsonify({"status": GHLSyncState.STATUS_IDLE, "location_id": user.ghl_location_id}), 200
+        return jsonify(state.to_dict()), 200
+    except Exception as e:
+        logging.error(f"Error getting local task sync status: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+# ========== Local Opportunity Routes (read from local DB only) ==========
+LOCAL_OPPORTUNITY_SORT_COLUMNS = {
+    'updated_at': GHLOpportunity.ghl_updated_at,
+    'created_at': GHLOpportunity.ghl_created_at,
+    'monetary_value': GHLOpportunity.monetary_value,
+    'name': GHLOpportunity.name
+}
+
+
+def _filter_local_opportunities(query):
+    """Apply the pipeline / stage / status / contact / q filters from the query string."""
+    pipeline_id = request.args.get('pipeline_id') or request.args.get('pipelineId')
+    if pipeline_id:
+        query = query.filter(GHLOpportunity.pipeline_id == pipeline_id)
+
+    stage_id = request.args.get('pipeline_stage_id') or request.args.get('stageId')
+    if stage_id:
+        query = query.filter(GHLOpportunity.pipeline_stage_id == stage_id)
+
+    status = request.args.get('status')
+    if status and status.lower() != 'all':
+        query = query.filter(GHLOpportunity.status == status.lower())
+
+    contact_id = request.args.get('contact_id') or request.args.get('contactId')
+    if contact_id:
+        query = query.filter(GHLOpportunity.ghl_contact_id == contact_id)
+
+    q = request.args.get('q')
+    if q:
+        pattern = f"%{q}%"
+        query = query.filter(or_(
+            GHLOpportunity.name.ilike(pattern),
+            GHLOpportunity.contact_name.ilike(pattern),
+            GHLOpportunity.contact_email.ilike(pattern)
+        ))
+
+    return query
+
+
+@ghl.route('/local/opportunities', methods=['GET'])
+@jwt_required()
+def list_local_opportunities():
+    """List opportunities from the local mirror for the current user's location.
+
+    Query params:
+        - per_page, cursor, page, include_total, sortOrder: As for /local/tasks
+        - sortBy: updated_at (default), created_at, monetary_value or name
+        - pipelineId, stageId, status, contactId: Filters (same names as /opportunities)
+        - q: Substring match on opportunity name, contact name or email
+    """
+    try:
+        location_id = token_provider.get_user_location(get_jwt_identity())
+        query = _filter_local_opportunities(GHLOpportunity.query.filter_by(location_id=location_id))
+        return _paginate_local(
+            query, LOCAL_OPPORTUNITY_SORT_COLUMNS, 'updated_at', GHLOpportunity.id, 'opportunities'
+        )
+    except Exception as e:
+        logging.error(f"Error listing local opportunities: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@ghl.route('/local/opportunities/stats', methods=['GET'])
+@jwt_required()
+def get_local_opportunity_stats():
+    """Opportunity counts and value by status and stage, computed from the local mirror.
+
+    Accepts the same filters as /local/opportunities.
+    """
+    try:
+        location_id = token_provider.get_user_location(get_jwt_identity())
+        query = _filter_local_opportunities(GHLOpportunity.query.filter_by(location_id=location_id))
+
+        by_status = query.with_entities(
+            GHLOpportunity.status,
+            func.count(GHLOpportunity.id),
+            func.coalesce(func.sum(GHLOpportunity.monetary_value), 0)
+        ).group_by(GHLOpportunity.status).all()
+
+        by_stage = query.with_entities(
+            GHLOpportunity.pipeline_stage_id,
+            func.count(GHLOpportunity.id),
+            func.coalesce(func.sum(GHLOpportunity.monetary_value), 0)
+        ).group_by(GHLOpportunity.pipeline_stage_id).all()
+
+        counts = {status: count for status, count, _ in by_status}
+        values = {status: float(value) for status, _, value in by_status}
+        stats = {'total': sum(counts.values())}
+        for status in ('open', 'won', 'lost', 'abandoned'):
+            stats[status] = counts.get(status, 0)
+        stats['purchased'] = stats['won']
+        stats['long_term_future'] = stats['lost'] + stats['abandoned']
+        stats['new_opportunities'] = stats['total'] - stats['won'] - stats['lost'] - stats['abandoned']
+        stats['engaged_leads'] = 0
+        stats['monetary_value'] = {
+            'total': round(sum(values.values()), 2),
+            **{status: round(values.get(status, 0.0), 2) for status in ('open', 'won', 'lost', 'abandoned')}
+        }
+        stats['by_stage'] = [
+            {'stage_id': stage_id, 'count': count, 'monetary_value': round(float(value), 2)}
+            for stage_id, count, value in by_stage
+        ]
+        return jsonify(stats), 200
+    except Exception as e:
+        logging.error(f"Error getting local opportunity stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@ghl.route('/local/opportunities/sync', methods=['POST'])
+@jwt_required()
+def trigger_local_opportunity_sync():
+    """Start a background mirror sync of the user's GHL opportunities into the local table.
+
+    Query params:
+        - full: true to run the full reconcile (also drops deleted opportunities) instead of an incremental sync
+    """
+    try:
+        full = True if request.args.get('full', '').lower() in ('true', '1') else None
+        location_id = token_provider.get_user_location(get_jwt_identity())
+
+        state = GHLSyncState.get_or_create(location_id, GHLSyncState.RESOURCE_OPPORTUNITIES)
+        if state.is_locked():
+            return jsonify({"message": "Opportunity sync already running", "sync": state.to_dict()}), 202
+
+        from app.extensions import init_scheduler
+        app = current_app._get_current_object()
+        job_id = init_scheduler().run_job_async(GHLOpportunitySyncService.run_for_location_background, app, location_id, full)
+        if not job_id:
+            return jsonify({"error": "Failed to schedule opportunity sync"}), 500
+
+        return jsonify({"message": "Opportunity sync started", "job_id": job_id}), 202
+    except Exception as e:
+        logging.error(f"Error triggering local opportunity sync: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@ghl.route('/local/opportunities/sync', methods=['GET'])
+@jwt_required()
+def get_local_opportunity_sync_status():
+    """Get the opportunity mirror sync checkpoint for the user's GHL location."""
+    try:
+        location_id = token_provider.get_user_location(get_jwt_identity())
+        state = GHLSyncState.query.filter_by(
+            location_id=location_id,
+            resource=GHLSyncState.RESOURCE_OPPORTUNITIES
+        ).first()
+        if not state:
+            return jsonify({"status": GHLSyncState.STATUS_IDLE, "location_id": location_id}), 200
+        return jsonify(state.to_dict()), 200
+    except Exception as e:
+        logging.error(f"Error getting local opportunity sync status: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -601,7 +892,7 @@ def list_calendars():
             'page': request.args.get('page', type=int)
         }
         query_params = {k: v for k, v in query_params.items() if v is not None}
-        calendars = client.list_calendars(**query_params)
+        calendars = client.list_calendars(fresh=_wants_fresh(), **query_params)
         return jsonify(calendars), 200
     except Exception as e:
         logging.error(f"Error listing calendars: {str(e)}")
@@ -670,7 +961,7 @@ def list_pipelines():
     """List all pipelines"""
     try:
         client = init_ghl_client()
-        pipelines = client.list_pipelines()
+        pipelines = client.list_pipelines(fresh=_wants_fresh())
         return jsonify(pipelines), 200
     except Exception as e:
         logging.error(f"Error listing pipelines: {str(e)}")
@@ -682,13 +973,25 @@ def get_pipeline_stages(pipeline_id):
     """Get stages for a specific pipeline"""
     try:
         client = init_ghl_client()
-        stages = client.get_pipeline_stages(pipeline_id)
+        stages = client.get_pipeline_stages(pipeline_id, fresh=_wants_fresh())
         return jsonify(stages), 200
     except Exception as e:
         logging.error(f"Error getting pipeline stages {pipeline_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 # ========== Opportunity Management ==========
+def _mirror_opportunity(location_id, opportunity=None, deleted_id=None):
+    """Write a GHL opportunity change through to the local mirror. Never fails the request."""
+    try:
+        if deleted_id:
+            GHLOpportunity.query.filter_by(ghl_opportunity_id=deleted_id).delete()
+        else:
+            GHLOpportunity.upsert_from_ghl(location_id, [opportunity])
+        db.session.commit()
+    except Exception as local_err:
+        db.session.rollback()
+        logging.warning(f"GHL opportunity saved but local mirror update failed: {local_err}")
+
 @ghl.route('/opportunities', methods=['GET'])
 @jwt_required()
 def search_opportunities():
@@ -741,6 +1044,7 @@ def create_opportunity():
         
         client = init_ghl_client()
         opportunity = client.create_opportunity(data)
+        _mirror_opportunity(client.location_id, opportunity.get('opportunity', opportunity))
         return jsonify(opportunity), 201
     except Exception as e:
         logging.error(f"Error creating opportunity: {str(e)}")
@@ -757,6 +1061,7 @@ def update_opportunity(opportunity_id):
         
         client = init_ghl_client()
         opportunity = client.update_opportunity(opportunity_id, data)
+        _mirror_opportunity(client.location_id, opportunity.get('opportunity', opportunity))
         return jsonify(opportunity), 200
     except Exception as e:
         logging.error(f"Error updating opportunity {opportunity_id}: {str(e)}")
@@ -773,6 +1078,7 @@ def update_opportunity_status(opportunity_id):
         
         client = init_ghl_client()
         opportunity = client.update_opportunity_status(opportunity_id, data['status'])
+        _mirror_opportunity(client.location_id, {'id': opportunity_id, 'status': data['status']})
         return jsonify(opportunity), 200
     except Exception as e:
         logging.error(f"Error updating opportunity status {opportunity_id}: {str(e)}")
@@ -785,6 +1091,7 @@ def delete_opportunity(opportunity_id):
     try:
         client = init_ghl_client()
         client.delete_opportunity(opportunity_id)
+        _mirror_opportunity(client.location_id, deleted_id=opportunity_id)
         return jsonify({"message": "Opportunity deleted successfully"}), 200
     except Exception as e:
         logging.error(f"Error deleting opportunity {opportunity_id}: {str(e)}")
@@ -868,6 +1175,140 @@ def send_whatsapp():
         logging.error(f"Error sending WhatsApp: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def _get_bulk_job(job_id):
+    """The current user's bulk message job, or None."""
+    return Job.query.filter_by(
+        id=job_id, user_id=get_jwt_identity(), job_type=Job.TYPE_GHL_BULK_MESSAGE
+    ).first()
+
+@ghl.route('/messages/bulk', methods=['POST'])
+@jwt_required()
+def send_bulk_message():
+    """Send one message template to many contacts as a background job
+
+    Body:
+        - type: Email, SMS or WhatsApp
+        - message: Message body; {{contact.first_name}}, {{contact.last_name}},
+          {{contact.name}}, {{contact.email}} and {{contact.phone}} are filled per contact
+        - subject: Required for Email (merge fields work here too)
+        - html, attachments: Optional, as for the single-message endpoints
+        - contactIds: Recipients, and/or
+        - tag: Send to every contact with this tag
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        message_type = {t.lower(): t for t in BULK_MESSAGE_TYPES}.get(str(data.get('type', '')).lower())
+        if not message_type:
+            return jsonify({"error": f"type must be one of: {', '.join(BULK_MESSAGE_TYPES)}"}), 400
+        if not data.get('message'):
+            return jsonify({"error": "Missing required field: message"}), 400
+        if message_type == 'Email' and not data.get('subject'):
+            return jsonify({"error": "Missing required field: subject"}), 400
+
+        contact_ids = data.get('contactIds') or []
+        if not isinstance(contact_ids, list):
+            return jsonify({"error": "contactIds must be a list"}), 400
+        if not contact_ids and not data.get('tag'):
+            return jsonify({"error": "Provide contactIds or tag"}), 400
+
+        user_id = get_jwt_identity()
+        location_id = token_provider.get_user_location(user_id)
+        job = GHLBulkMessageService.create_job(
+            user_id,
+            location_id,
+            message_type,
+            data['message'],
+            contact_ids=contact_ids,
+            tag=data.get('tag'),
+            subject=data.get('subject'),
+            html=data.get('html'),
+            attachments=data.get('attachments'),
+        )
+
+        from app.extensions import init_scheduler
+        app = current_app._get_current_object()
+        # If scheduling fails the job stays pending and the resume job picks it up
+        init_scheduler().run_job_async(GHLBulkMessageService.run_job_background, app, job.id)
+
+        return jsonify({"message": "Bulk message job started", "job_id": job.id, "job": job.to_dict()}), 202
+    except Exception as e:
+        logging.error(f"Error starting bulk message: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/messages/bulk', methods=['GET'])
+@jwt_required()
+def list_bulk_messages():
+    """List the current user's bulk message jobs, newest first
+
+    Query params:
+        - limit: Max jobs to return (default 20)
+        - status: Only jobs in this status
+    """
+    try:
+        query = Job.query.filter_by(user_id=get_jwt_identity(), job_type=Job.TYPE_GHL_BULK_MESSAGE)
+        if request.args.get('status'):
+            query = query.filter_by(status=request.args.get('status'))
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        jobs = query.order_by(Job.created_at.desc()).limit(limit).all()
+        return jsonify({"jobs": [job.to_dict() for job in jobs], "total": len(jobs)}), 200
+    except Exception as e:
+        logging.error(f"Error listing bulk messages: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/messages/bulk/<job_id>', methods=['GET'])
+@jwt_required()
+def get_bulk_message(job_id):
+    """Progress of a bulk message job, with recipient counts per status"""
+    try:
+        job = _get_bulk_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({**job.to_dict(), "recipients": BulkMessageRecipient.counts_by_status(job.id)}), 200
+    except Exception as e:
+        logging.error(f"Error getting bulk message {job_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/messages/bulk/<job_id>/recipients', methods=['GET'])
+@jwt_required()
+def list_bulk_message_recipients(job_id):
+    """Per-recipient status of a bulk message job
+
+    Query params:
+        - status: pending, sending, sent, failed or unknown
+        - per_page, cursor, page, include_total, sortOrder: As for /local/tasks
+    """
+    try:
+        job = _get_bulk_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        query = BulkMessageRecipient.query.filter_by(job_id=job.id)
+        if request.args.get('status'):
+            query = query.filter_by(status=request.args.get('status'))
+        return _paginate_local(
+            query, {'id': BulkMessageRecipient.id}, 'id', BulkMessageRecipient.id, 'recipients'
+        )
+    except Exception as e:
+        logging.error(f"Error listing recipients of bulk message {job_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/messages/bulk/<job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_bulk_message(job_id):
+    """Stop a bulk message job; messages already sent are not recalled"""
+    try:
+        job = _get_bulk_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        GHLBulkMessageService.cancel(job)
+        return jsonify(job.to_dict()), 200
+    except Exception as e:
+        logging.error(f"Error cancelling bulk message {job_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @ghl.route('/conversations/<conversation_id>/messages', methods=['GET'])
 @jwt_required()
 def get_conversation_messages(conversation_id):
@@ -885,6 +1326,107 @@ def get_conversation_messages(conversation_id):
         logging.error(f"Error getting conversation messages {conversation_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@ghl.route('/local/conversations/<conversation_id>/messages', methods=['GET'])
+@jwt_required()
+def list_local_conversation_messages(conversation_id):
+    """Messages for a conversation from the local store, newest first.
+
+    The first page (no cursor) first pulls any messages newer than the newest
+    stored one; reaching the end of the stored history pulls one older page.
+
+    Query params:
+        - per_page (or limit): Page size, max 200 (default 50)
+        - cursor: next_cursor from the previous page
+        - sync: 'false' to serve only what is stored locally
+    """
+    try:
+        location_id = token_provider.get_user_location(get_jwt_identity())
+        per_page = request.args.get('per_page', type=int) or request.args.get('limit', 50, type=int)
+        per_page = max(1, min(per_page, 200))
+        cursor = request.args.get('cursor')
+        sync = request.args.get('sync', 'true').lower() != 'false'
+
+        client = None
+        new_messages = 0
+        sync_error = None
+        if sync:
+            try:
+                client = token_provider.client_for_location(location_id)
+                if not cursor:
+                    new_messages = GHLMessageService.sync_new_messages(client, conversation_id)
+            except Exception as e:
+                # Serve what we have; the next open will pick up the delta
+                db.session.rollback()
+                client = None
+                sync_error = str(e)
+                logging.warning(f"Message delta sync failed for conversation {conversation_id}: {sync_error}")
+
+        query = GHLMessage.query.filter_by(location_id=location_id, ghl_conversation_id=conversation_id)
+
+        def page():
+            return keyset_paginate(
+                query,
+                sort_key='date_added',
+                sort_column=GHLMessage.date_added,
+                id_column=GHLMessage.id,
+                sort_order='desc',
+                cursor=cursor,
+                limit=per_page,
+            )
+
+        try:
+            items, next_cursor = page()
+            if next_cursor is None and client is not None:
+                try:
+                    if GHLMessageService.sync_older_messages(client, conversation_id):
+                        items, next_cursor = page()
+                except Exception as e:
+                    db.session.rollback()
+                    logging.warning(f"Loading older messages failed for conversation {conversation_id}: {str(e)}")
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({
+            'messages': [item.to_dict() for item in items],
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'new_messages': new_messages,
+            'sync_error': sync_error,
+        }), 200
+    except Exception as e:
+        logging.error(f"Error listing local messages for conversation {conversation_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@ghl.route('/local/messages/search', methods=['GET'])
+@jwt_required()
+def search_local_messages():
+    """Full-text search over stored conversation messages in the user's location.
+
+    Query params:
+        - q: Search text (required)
+        - conversationId, contactId: Narrow the search
+        - per_page, cursor, page, include_total, sortOrder: As for /local/tasks (sorted by date)
+    """
+    try:
+        text = (request.args.get('q') or '').strip()
+        if not text:
+            return jsonify({"error": "q is required"}), 400
+
+        location_id = token_provider.get_user_location(get_jwt_identity())
+        query = GHLMessageService.search(
+            location_id,
+            text,
+            conversation_id=request.args.get('conversationId'),
+            contact_id=request.args.get('contactId'),
+        )
+        return _paginate_local(
+            query, {'date_added': GHLMessage.date_added}, 'date_added', GHLMessage.id, 'messages'
+        )
+    except Exception as e:
+        logging.error(f"Error searching local messages: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # ========== Tag Management ==========
 @ghl.route('/tags', methods=['GET'])
 @jwt_required()
@@ -897,7 +1439,7 @@ def list_tags():
             'page': request.args.get('page', type=int)
         }
         query_params = {k: v for k, v in query_params.items() if v is not None}
-        tags = client.list_tags(**query_params)
+        tags = client.list_tags(fresh=_wants_fresh(), **query_params)
         return jsonify(tags), 200
     except Exception as e:
         logging.error(f"Error listing tags: {str(e)}")
@@ -1026,7 +1568,7 @@ def list_workflows():
             'page': request.args.get('page', type=int)
         }
         query_params = {k: v for k, v in query_params.items() if v is not None}
-        workflows = client.list_workflows(**query_params)
+        workflows = client.list_workflows(fresh=_wants_fresh(), **query_params)
         return jsonify(workflows), 200
     except Exception as e:
         logging.error(f"Error listing workflows: {str(e)}")
@@ -1045,7 +1587,7 @@ def get_opportunity_stats():
             'endDate': request.args.get('endDate')
         }
         query_params = {k: v for k, v in query_params.items() if v is not None}
-        stats = client.get_opportunity_stats(**query_params)
+        stats = client.get_opportunity_stats(fresh=_wants_fresh(), **query_params)
         return jsonify(stats), 200
     except Exception as e:
         logging.error(f"Error getting opportunity stats: {str(e)}")
@@ -1054,7 +1596,13 @@ def get_opportunity_stats():
 @ghl.route('/stats/dashboard', methods=['GET'])
 @jwt_required()
 def get_dashboard_stats():
-    """Get comprehensive dashboard analytics"""
+    """Get comprehensive dashboard analytics
+
+    Query params:
+        - pipelineId, startDate, endDate: Opportunity filters
+        - sections: Comma-separated subset of opportunities,pipelines,tasks,contacts
+        - timeout: Seconds to wait for each section before returning without it
+    """
     try:
         client = init_ghl_client()
         query_params = {
@@ -1063,7 +1611,13 @@ def get_dashboard_stats():
             'endDate': request.args.get('endDate')
         }
         query_params = {k: v for k, v in query_params.items() if v is not None}
-        stats = client.get_dashboard_stats(**query_params)
+        sections = request.args.get('sections')
+        stats = client.get_dashboard_stats(
+            user_id=get_jwt_identity(),
+            sections=sections.split(',') if sections else None,
+            timeout=request.args.get('timeout', type=float),
+            **query_params
+        )
         return jsonify(stats), 200
     except Exception as e:
         logging.error(f"Error getting dashboard stats: {str(e)}")
@@ -54,29 +54,30 @@ def get_social_posts():
             top_level_comments = FacebookComment.query.filter_by(
                 post_id=post.id,
                 parent_comment_id=None
-            ).order_by(FacebookComment.fetched_at.desc()).all()
+            ).order_by(FacebookComment.commented_at.desc(), FacebookComment.fetched_at.desc()).all()
             
             comments_data = []
             has_new_comments = False
             has_new_sub_comments = False
             
-            # Check if comment is "new" (within last 7 days for example)
-            def is_new(fetched_at):
-                if not fetched_at:
+            # Check if comment is "new" (posted within last 7 days for example)
+            def is_new(comment):
+                posted_at = comment.commented_at or comment.fetched_at
+                if not posted_at:
                     return False
                 seven_days_ago = datetime.utcnow() - timedelta(days=7)
-                return fetched_at > seven_days_ago
+                return posted_at > seven_days_ago
             
             for comment in top_level_comments:
                 # Get replies for this comment
                 replies = FacebookComment.query.filter_by(
                     parent_comment_id=comment.id
-                ).order_by(FacebookComment.fetched_at.asc()).all()
+                ).order_by(FacebookComment.commented_at.asc(), FacebookComment.fetched_at.asc()).all()
                 
                 replies_data = []
                 for reply in replies:
                     db_is_new = reply.is_new if reply.is_new is not None else False
-                    reply_is_new = db_is_new and is_new(reply.fetched_at)
+                    reply_is_new = db_is_new and is_new(reply)
                     
                     if reply_is_new:
                         has_new_sub_comments = True
@@ -85,7 +86,7 @@ def get_social_posts():
                         'id': f'r{reply.id}',
                         'author': reply.from_name if reply.from_name else 'Unknown',
                         'content': reply.message if reply.message else '',
-                        'timestamp': reply.fetched_at.isoformat() if reply.fetched_at else datetime.utcnow().isoformat(),
+                        'timestamp': (reply.commented_at or reply.fetched_at or datetime.utcnow()).isoformat(),
                         'isNew': reply_is_new,
                         'ai_reply': reply.ai_reply,
                         'likes': reply.likes_count if reply.likes_count else 0,
@@ -93,7 +94,7 @@ def get_social_posts():
                     })
                 
                 db_is_new_comment = comment.is_new if comment.is_new is not None else False
-                comment_is_new = db_is_new_comment and is_new(comment.fetched_at)
+                comment_is_new = db_is_new_comment and is_new(comment)
                 
                 if comment_is_new:
                     has_new_comments = True
@@ -102,7 +103,7 @@ def get_social_posts():
                     'id': f'c{comment.id}',
                     'author': comment.from_name if comment.from_name else 'Unknown',
                     'content': comment.message if comment.message else '',
-                    'timestamp': comment.fetched_at.isoformat() if comment.fetched_at else datetime.utcnow().isoformat(),
+                    'timestamp': (comment.commented_at or comment.fetched_at or datetime.utcnow()).isoformat(),
                     'isNew': comment_is_new,
                     'replies': replies_data,
                     'ai_reply': comment.ai_reply,
@@ -267,7 +268,10 @@ def generate_comment_reply(comment_id):
             comment_id=comment.id,
             comment_text=comment.message or '',
             post_text=post.message or post.story or '',
-            user_code=user_code
+            user_code=user_code,
+            language=comment.language,
+            # Regenerating an existing reply should produce a new one
+            use_cache=not comment.ai_reply
         )
         
         if not ai_reply:
@@ -391,50 +395,26 @@ def log_lead():
                 elif not ref_user.ghl_location_id:
                     logging.warning(f"User {ref_user.id} has no GHL location configured")
                 else:
-                    # Get the GHL OAuth token for this user's location
-                    from app.models.ghl_token import GHLToken
-                    from app.script.highLevelAPI import LeadConnectorClient
+                    # Token comes from the shared token cache
+                    from app.services.ghl_token_service import token_provider
+                    from app.services.ghl_contact_service import GHLContactService
                     
-                    ghl_token = GHLToken.get_by_location(ref_user.ghl_location_id)
+                    client = token_provider.client_for_location(ref_user.ghl_location_id)
+                    
+                    contact_data = {
+                        "firstName": lead_data['firstName'],
+                        "email": lead_data['email'],
+                        "phone": lead_data['phone'],
+                        "source": "Zestal Builder Facebook Comments"
+                    }
+                    
+                    # Upsert so a repeated form submission updates the same contact
+                    ghl_result = client.upsert_contact(contact_data)
+                    logging.info(f"GHL contact upserted for lead {lead_data['email']}: {ghl_result}")
+                    GHLContactService.cache_contacts(
+                        ref_user.ghl_location_id, [ghl_result.get('contact', ghl_result)]
+                    )
                     
-                    if not ghl_token:
-                        logging.warning(f"No GHL token found for location {ref_user.ghl_location_id}")
-                    else:
-                        # Refresh token if expiring soon
-                        if ghl_token.expires_soon(minutes=30):
-                            try:
-                                from app.script.ghl_oauth import GHLOAuthClient
-                                oauth_client = GHLOAuthClient(
-                                    client_id=current_app.config.get('GHL_CLIENT_ID'),
-                                    client_secret=current_app.config.get('GHL_CLIENT_SECRET'),
-                                    redirect_uri=current_app.config.get('GHL_REDIRECT_URI')
-                                )
-                                token_data = oauth_client.refresh_access_token(
-                                    ghl_token.refresh_token,
-                                    ghl_token.user_type
-                                )
-                                ghl_token.update_tokens(token_data)
-                                db.session.commit()
-                                logging.info(f"Refreshed GHL token for location {ref_user.ghl_location_id}")
-                            except Exception as refresh_err:
-                                logging.error(f"Failed to refresh GHL token: {refresh_err}")
-                        
-                        # Initialize GHL client and create contact
-                        client = LeadConnectorClient(
-                            access_token=ghl_token.access_token,
-                            location_id=ref_user.ghl_location_id
-                        )
-                        
-                        contact_data = {
-                            "firstName": lead_data['firstName'],
-                            "email": lead_data['email'],
-                            "phone": lead_data['phone'],
-                            "source": "Zestal Builder Facebook Comments"
-                        }
-                        
-                        ghl_result = client.create_contact(contact_data)
-                        logging.info(f"GHL contact created for lead {lead_data['email']}: {ghl_result}")
-                        
             except Exception as ghl_err:
                 logging.error(f"Error creating GHL contact: {str(ghl_err)}")
                 ghl_result = {"error": str(ghl_err)}
@@ -613,6 +593,7 @@ def ghl_callback():
         }), 400
     
     try:
+        from app.services.ghl_token_service import token_provider
         client = get_ghl_oauth_client()
         
         # Exchange code for tokens - use 'Company' user type for agency-level auth
@@ -625,6 +606,7 @@ def ghl_callback():
         if is_agency:
             # Store as agency token
             ghl_token = GHLToken.create_or_update_agency(token_data)
+            token_provider.invalidate(agency=True)
             logging.info(f"Agency token stored for company: {ghl_token.company_id}")
             
             return jsonify({
@@ -637,6 +619,7 @@ def ghl_callback():
         else:
             # Store as location token
             ghl_token = GHLToken.create_or_update(token_data)
+            token_provider.invalidate(ghl_token.location_id)
             logging.info(f"Location token stored for: {ghl_token.location_id}")
             
             return jsonify({
@@ -671,27 +654,17 @@ def ghl_refresh_token(location_id):
         New token expiry info
     """
     from app.models.ghl_token import GHLToken
+    from app.services.ghl_token_service import token_provider
     
     try:
-        ghl_token = GHLToken.get_by_location(location_id)
-        
-        if not ghl_token:
+        if not GHLToken.get_by_location(location_id):
             return jsonify({
                 "success": False,
                 "error": "Location not found"
             }), 404
         
-        client = get_ghl_oauth_client()
-        
-        # Refresh the token
-        token_data = client.refresh_access_token(
-            ghl_token.refresh_token,
-            ghl_token.user_type
-        )
-        
-        # Update stored tokens
-        ghl_token.update_tokens(token_data)
-        db.session.commit()
+        # Goes through the provider so it can't race a background refresh
+        ghl_token = token_provider.refresh(location_id)
         
         logging.info(f"GHL token refreshed for location: {location_id}")
         
@@ -782,11 +755,22 @@ def ghl_webhooks():
             if token:
                 db.session.delete(token)
                 db.session.commit()
+                from app.services.ghl_token_service import token_provider
+                token_provider.invalidate(location_id)
                 logging.info(f"Removed token for uninstalled location: {location_id}")
         
-        # Add more event handlers as needed:
-        # elif event_type == 'ContactCreate':
-        #     handle_contact_create(data)
+        elif event_type in ('ContactCreate', 'ContactUpdate', 'ContactDelete'):
+            from app.services.ghl_contact_service import GHLContactService
+            GHLContactService.handle_webhook(event_type, data)
+        
+        elif event_type.startswith('Opportunity'):
+            from app.services.ghl_stats_service import OpportunityStatsService, OPPORTUNITY_EVENTS
+            from app.services.ghl_sync_service import GHLOpportunitySyncService
+            if event_type in OPPORTUNITY_EVENTS:
+                OpportunityStatsService.handle_webhook(event_type, data)
+                GHLOpportunitySyncService.handle_webhook(event_type, data)
+        
+        # Add more event handlers as needed
         
         # Always return 200 to acknowledge receipt
         return jsonify({"success": True, "message": "Webhook received"}), 200
@@ -4,3 +4,10 @@ from .facebook_post import FacebookPost, FacebookComment
 from .job import Job
 from .ghl_token import GHLToken
 from .ghl_task import GHLTask
+from .ghl_sync_state import GHLSyncState
+from .ghl_contact import GHLContact
+from .ghl_opportunity import GHLOpportunity
+from .ghl_message import GHLMessage
+from .bulk_message_recipient import BulkMessageRecipient
+from .ai_reply_cache import AIReplyCache
+from .ai_reply_queue import AIReplyQueueItem
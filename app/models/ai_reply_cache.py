@@ -0,0 +1,38 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class AIReplyCache(db.Model):
+    """Generated AI replies reused for identical (normalized) comments on the same post context."""
+    __tablename__ = 'ai_reply_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # sha256 of (normalized comment, post hash, language, user code)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)
+    user_code = db.Column(db.String(255), nullable=True)
+    language = db.Column(db.String(50), nullable=True)
+    post_hash = db.Column(db.String(64), nullable=True)
+    normalized_comment = db.Column(db.String(500), nullable=True)
+    reply = db.Column(db.Text, nullable=False)
+    hit_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)  # LRU eviction
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_code': self.user_code,
+            'language': self.language,
+            'normalized_comment': self.normalized_comment,
+            'reply': self.reply,
+            'hit_count': self.hit_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+    def __repr__(self):
+        return f'<AIReplyCache {self.cache_key[:12]} hits={self.hit_count}>'
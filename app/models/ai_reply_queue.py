@@ -0,0 +1,37 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class AIReplyQueueItem(db.Model):
+    """A comment waiting for an AI reply; higher priority is served first."""
+    __tablename__ = 'ai_reply_queue'
+    __table_args__ = (
+        db.Index('ix_ai_reply_queue_user_priority', 'user_id', 'priority', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    comment_id = db.Column(db.Integer, db.ForeignKey('facebook_comments.id'),
+                           unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    priority = db.Column(db.Integer, default=0, nullable=False)
+
+    # Set while a runner works on the item; a stale claim may be taken over
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    claim_token = db.Column(db.String(36), nullable=True, index=True)
+
+    # Timestamps
+    enqueued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'comment_id': self.comment_id,
+            'user_id': self.user_id,
+            'priority': self.priority,
+            'claimed_at': self.claimed_at.isoformat() if self.claimed_at else None,
+            'enqueued_at': self.enqueued_at.isoformat() if self.enqueued_at else None,
+        }
+
+    def __repr__(self):
+        return f'<AIReplyQueueItem comment={self.comment_id} user={self.user_id} priority={self.priority}>'
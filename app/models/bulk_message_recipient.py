@@ -0,0 +1,85 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class BulkMessageRecipient(db.Model):
+    """One contact of a bulk GHL message job and its delivery state."""
+    __tablename__ = 'bulk_message_recipients'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'contact_id', name='uq_bulk_message_recipients_job_contact'),
+        db.Index('ix_bulk_message_recipients_job_status', 'job_id', 'status', 'id'),
+    )
+
+    # Status constants
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'  # Claimed by a runner; the request may or may not have reached GHL
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_UNKNOWN = 'unknown'  # Outcome unknown (crash or timeout mid-request); never resent automatically
+
+    STATUSES = (STATUS_PENDING, STATUS_SENDING, STATUS_SENT, STATUS_FAILED, STATUS_UNKNOWN)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(50), db.ForeignKey('jobs.id'), nullable=False)
+    contact_id = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default=STATUS_PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    # Job runner that claimed it for sending (see Job.runner_id)
+    runner_id = db.Column(db.String(36), nullable=True)
+
+    # Set once GHL accepted the message
+    ghl_message_id = db.Column(db.String(255), nullable=True)
+    ghl_conversation_id = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'contact_id': self.contact_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'ghl_message_id': self.ghl_message_id,
+            'ghl_conversation_id': self.ghl_conversation_id,
+            'error': self.error,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    @classmethod
+    def add_contacts(cls, job_id: str, contact_ids: list) -> int:
+        """
+        Add recipients to a job, skipping contacts it already has.
+        Does not commit. Returns the number of recipients added.
+        """
+        contact_ids = list(dict.fromkeys(c for c in contact_ids if c))
+        if not contact_ids:
+            return 0
+
+        existing = {
+            row.contact_id
+            for row in cls.query.with_entities(cls.contact_id).filter(
+                cls.job_id == job_id,
+                cls.contact_id.in_(contact_ids)
+            ).all()
+        }
+        added = [cls(job_id=job_id, contact_id=c) for c in contact_ids if c not in existing]
+        db.session.add_all(added)
+        return len(added)
+
+    @classmethod
+    def counts_by_status(cls, job_id: str) -> dict:
+        """Number of recipients in each status (every status is present)."""
+        counts = dict.fromkeys(cls.STATUSES, 0)
+        rows = db.session.query(cls.status, db.func.count(cls.id)).filter(
+            cls.job_id == job_id
+        ).group_by(cls.status).all()
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def __repr__(self):
+        return f'<BulkMessageRecipient job={self.job_id} contact={self.contact_id} status={self.status}>'
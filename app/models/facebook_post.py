@@ -48,6 +48,9 @@ class FacebookPost(db.Model):
 
 class FacebookComment(db.Model):
     __tablename__ = 'facebook_comments'
+    __table_args__ = (
+        db.Index('ix_facebook_comments_post_commented_at', 'post_id', 'commented_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('facebook_posts.id'), nullable=False)
@@ -58,12 +61,16 @@ class FacebookComment(db.Model):
     from_name = db.Column(db.String(255), nullable=True)  # Name of the person who commented
     likes_count = db.Column(db.Integer, default=0)
     comment_date = db.Column(db.String(255), nullable=True)
+    # comment_date ("5h", "2w", "March 5") resolved against the scrape time
+    commented_at = db.Column(db.DateTime, nullable=True, index=True)
     post_url = db.Column(db.String(255), nullable=True)
     has_liked = db.Column(db.Boolean, default=False)
     language = db.Column(db.String(255), nullable=True)
     self_comment = db.Column(db.Boolean, default=False)
     fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
     ai_reply = db.Column(db.Text, nullable=True)
+    # Batches in which the LLM returned no usable reply; the comment is skipped past AI_REPLY_MAX_FAILURES
+    ai_reply_failures = db.Column(db.Integer, default=0, nullable=False, server_default='0')
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     is_new = db.Column(db.Boolean, default=True)  # Track if comment is new (unread)
     # Relationships
@@ -80,6 +87,7 @@ class FacebookComment(db.Model):
             'from_id': self.from_id,
             'from_name': self.from_name,
             'comment_date': self.comment_date,
+            'commented_at': self.commented_at.isoformat() if self.commented_at else None,
             'likes_count': self.likes_count,
             'parent_comment_id': self.parent_comment_id,
             'post_url': self.post_url,
@@ -87,6 +95,7 @@ class FacebookComment(db.Model):
             'language': self.language,
             'self_comment': self.self_comment,
             'ai_reply': self.ai_reply,
+            'ai_reply_failures': self.ai_reply_failures or 0,
             'user_id': self.user_id,
             'fetched_at': self.fetched_at.isoformat(),
             'last_updated': self.last_updated.isoformat(),
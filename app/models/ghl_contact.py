@@ -0,0 +1,90 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class GHLContact(db.Model):
+    """Local summary of GoHighLevel contacts (name, email, phone) for fast lookups."""
+    __tablename__ = 'ghl_contacts'
+    __table_args__ = (
+        db.UniqueConstraint('location_id', 'ghl_contact_id', name='uq_ghl_contacts_location_contact'),
+        db.Index('ix_ghl_contacts_location_email', 'location_id', 'email'),
+        db.Index('ix_ghl_contacts_location_phone', 'location_id', 'phone'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.String(50), nullable=False)
+    ghl_contact_id = db.Column(db.String(255), nullable=False)
+
+    # Summary fields
+    first_name = db.Column(db.String(100), nullable=True)
+    last_name = db.Column(db.String(100), nullable=True)
+    email = db.Column(db.String(255), nullable=True)
+    phone = db.Column(db.String(50), nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_contact_info(self):
+        """Contact fields in the shape GHLTask.set_contact_info expects."""
+        return {
+            'firstName': self.first_name or '',
+            'lastName': self.last_name or '',
+            'email': self.email or '',
+            'phone': self.phone or '',
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.ghl_contact_id,
+            'location_id': self.location_id,
+            **self.to_contact_info(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def update_from_ghl(self, ghl_data):
+        """Update summary fields from a GHL contact dict (API response or webhook payload)."""
+        if 'firstName' in ghl_data:
+            self.first_name = ghl_data['firstName']
+        if 'lastName' in ghl_data:
+            self.last_name = ghl_data['lastName']
+        if 'email' in ghl_data:
+            self.email = ghl_data['email']
+        if 'phone' in ghl_data:
+            self.phone = ghl_data['phone']
+
+    @classmethod
+    def get_by_contact(cls, location_id: str, contact_id: str) -> 'GHLContact':
+        """Get the cached summary for one contact."""
+        return cls.query.filter_by(location_id=location_id, ghl_contact_id=contact_id).first()
+
+    @classmethod
+    def upsert_from_ghl(cls, location_id: str, contacts: list) -> int:
+        """
+        Insert or update summaries for a batch of GHL contact dicts.
+        Does not commit. Returns the number of contacts written.
+        """
+        contacts = [c for c in contacts if c.get('id')]
+        if not contacts:
+            return 0
+
+        existing = {
+            c.ghl_contact_id: c
+            for c in cls.query.filter(
+                cls.location_id == location_id,
+                cls.ghl_contact_id.in_([c['id'] for c in contacts])
+            ).all()
+        }
+
+        for contact in contacts:
+            row = existing.get(contact['id'])
+            if not row:
+                row = cls(location_id=location_id, ghl_contact_id=contact['id'])
+                db.session.add(row)
+                existing[contact['id']] = row
+            row.update_from_ghl(contact)
+
+        return len(contacts)
+
+    def __repr__(self):
+        return f'<GHLContact location={self.location_id} contact={self.ghl_contact_id}>'
@@ -0,0 +1,108 @@
+import json
+from datetime import datetime
+from ..extensions import db
+from .ghl_opportunity import parse_ghl_datetime
+
+
+class GHLMessage(db.Model):
+    """Local store of GoHighLevel conversation messages (SMS, WhatsApp, Email, ...)."""
+    __tablename__ = 'ghl_messages'
+    __table_args__ = (
+        # Conversation timeline, newest first, backs keyset pagination
+        db.Index('ix_ghl_messages_conversation_date', 'ghl_conversation_id', 'date_added', 'id'),
+        db.Index('ix_ghl_messages_location_contact', 'location_id', 'ghl_contact_id'),
+        # FULLTEXT on MySQL; other databases fall back to LIKE in GHLMessageService.search
+        db.Index('ix_ghl_messages_body_fulltext', 'body', mysql_prefix='FULLTEXT'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.String(50), nullable=False)
+    ghl_conversation_id = db.Column(db.String(255), nullable=False)
+    ghl_message_id = db.Column(db.String(255), unique=True, nullable=False)
+    ghl_contact_id = db.Column(db.String(255), nullable=True)
+
+    # Message fields
+    message_type = db.Column(db.String(50), nullable=True)  # e.g. TYPE_SMS, TYPE_WHATSAPP
+    direction = db.Column(db.String(20), nullable=True)  # inbound / outbound
+    status = db.Column(db.String(50), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    attachments = db.Column(db.Text, nullable=True)  # JSON list of URLs
+
+    # GHL timestamp
+    date_added = db.Column(db.DateTime, nullable=False)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ghl_message_id': self.ghl_message_id,
+            'conversation_id': self.ghl_conversation_id,
+            'contact_id': self.ghl_contact_id,
+            'message_type': self.message_type,
+            'direction': self.direction,
+            'status': self.status,
+            'body': self.body,
+            'attachments': json.loads(self.attachments) if self.attachments else [],
+            'date_added': self.date_added.isoformat() if self.date_added else None,
+        }
+
+    @classmethod
+    def from_ghl_response(cls, ghl_data, location_id, conversation_id):
+        """Build a GHLMessage from a message dict returned by the GHL conversations API."""
+        return cls(
+            location_id=location_id,
+            ghl_conversation_id=conversation_id,
+            ghl_message_id=ghl_data.get('id'),
+            ghl_contact_id=ghl_data.get('contactId'),
+            message_type=ghl_data.get('messageType') or ghl_data.get('type'),
+            direction=ghl_data.get('direction'),
+            status=ghl_data.get('status'),
+            body=ghl_data.get('body', ''),
+            attachments=json.dumps(ghl_data['attachments']) if ghl_data.get('attachments') else None,
+            date_added=parse_ghl_datetime(ghl_data.get('dateAdded')) or datetime.utcnow(),
+        )
+
+    @classmethod
+    def known_ids(cls, message_ids: list) -> set:
+        """The subset of message_ids already stored locally."""
+        if not message_ids:
+            return set()
+        return {
+            row.ghl_message_id
+            for row in cls.query.with_entities(cls.ghl_message_id)
+            .filter(cls.ghl_message_id.in_(message_ids)).all()
+        }
+
+    @classmethod
+    def add_new(cls, location_id: str, conversation_id: str, messages: list) -> int:
+        """
+        Insert the GHL message dicts that aren't stored yet (messages are immutable
+        apart from delivery status, which is refreshed for known ones).
+        Does not commit. Returns the number of messages inserted.
+        """
+        messages = [m for m in messages if m.get('id')]
+        if not messages:
+            return 0
+
+        existing = {
+            m.ghl_message_id: m
+            for m in cls.query.filter(cls.ghl_message_id.in_([m['id'] for m in messages])).all()
+        }
+
+        inserted = 0
+        for message in messages:
+            row = existing.get(message['id'])
+            if row:
+                if message.get('status'):
+                    row.status = message['status']
+                continue
+            row = cls.from_ghl_response(message, location_id, conversation_id)
+            db.session.add(row)
+            existing[message['id']] = row
+            inserted += 1
+        return inserted
+
+    def __repr__(self):
+        return f'<GHLMessage {self.ghl_message_id} conversation={self.ghl_conversation_id}>'
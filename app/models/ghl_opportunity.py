@@ -0,0 +1,146 @@
+from datetime import datetime
+from ..extensions import db
+
+
+def parse_ghl_datetime(value):
+    """Parse a GHL ISO timestamp into a naive UTC datetime, or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return parsed.replace(tzinfo=None) if parsed.tzinfo else parsed
+    except (ValueError, AttributeError):
+        return None
+
+
+class GHLOpportunity(db.Model):
+    """Local mirror of GoHighLevel opportunities for fast querying."""
+    __tablename__ = 'ghl_opportunities'
+    __table_args__ = (
+        db.Index('ix_ghl_opportunities_location_pipeline_stage', 'location_id', 'pipeline_id', 'pipeline_stage_id', 'id'),
+        db.Index('ix_ghl_opportunities_location_status', 'location_id', 'status', 'id'),
+        db.Index('ix_ghl_opportunities_location_contact', 'location_id', 'ghl_contact_id'),
+        # (location, sort column, id) indexes back keyset pagination
+        db.Index('ix_ghl_opportunities_location_created', 'location_id', 'ghl_created_at', 'id'),
+        db.Index('ix_ghl_opportunities_location_updated', 'location_id', 'ghl_updated_at', 'id'),
+        db.Index('ix_ghl_opportunities_location_value', 'location_id', 'monetary_value', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.String(50), nullable=False)
+    ghl_opportunity_id = db.Column(db.String(255), unique=True, nullable=False)
+    ghl_contact_id = db.Column(db.String(255), nullable=True)
+
+    # Opportunity fields
+    name = db.Column(db.String(500), nullable=True)
+    pipeline_id = db.Column(db.String(255), nullable=True)
+    pipeline_stage_id = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), nullable=True)
+    monetary_value = db.Column(db.Float, default=0)
+    assigned_to = db.Column(db.String(255), nullable=True)
+    source = db.Column(db.String(255), nullable=True)
+
+    # Cached contact info
+    contact_name = db.Column(db.String(255), nullable=True)
+    contact_email = db.Column(db.String(255), nullable=True)
+    contact_phone = db.Column(db.String(50), nullable=True)
+
+    # GHL timestamps
+    ghl_created_at = db.Column(db.DateTime, nullable=True)
+    ghl_updated_at = db.Column(db.DateTime, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_synced_at = db.Column(db.DateTime, nullable=True)  # Set by the background mirror sync
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ghl_opportunity_id': self.ghl_opportunity_id,
+            'location_id': self.location_id,
+            'name': self.name,
+            'pipeline_id': self.pipeline_id,
+            'pipeline_stage_id': self.pipeline_stage_id,
+            'status': self.status,
+            'monetary_value': self.monetary_value,
+            'assigned_to': self.assigned_to,
+            'source': self.source,
+            'contact': {
+                'id': self.ghl_contact_id,
+                'name': self.contact_name,
+                'email': self.contact_email,
+                'phone': self.contact_phone,
+            },
+            'ghl_created_at': self.ghl_created_at.isoformat() if self.ghl_created_at else None,
+            'ghl_updated_at': self.ghl_updated_at.isoformat() if self.ghl_updated_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def update_from_ghl(self, ghl_data):
+        """
+        Update local fields from a GHL opportunity dict. Works for full API
+        responses and for partial webhook payloads (missing keys are left alone).
+        """
+        if 'name' in ghl_data:
+            self.name = ghl_data['name']
+        if 'pipelineId' in ghl_data:
+            self.pipeline_id = ghl_data['pipelineId']
+        if 'pipelineStageId' in ghl_data:
+            self.pipeline_stage_id = ghl_data['pipelineStageId']
+        if ghl_data.get('status'):
+            self.status = ghl_data['status'].lower()
+        if 'monetaryValue' in ghl_data:
+            try:
+                self.monetary_value = float(ghl_data['monetaryValue'] or 0)
+            except (TypeError, ValueError):
+                self.monetary_value = 0
+        if 'assignedTo' in ghl_data:
+            self.assigned_to = ghl_data['assignedTo']
+        if 'source' in ghl_data:
+            self.source = ghl_data['source']
+
+        contact = ghl_data.get('contact') or {}
+        contact_id = ghl_data.get('contactId') or contact.get('id')
+        if contact_id:
+            self.ghl_contact_id = contact_id
+        if contact:
+            self.contact_name = contact.get('name', self.contact_name)
+            self.contact_email = contact.get('email', self.contact_email)
+            self.contact_phone = contact.get('phone', self.contact_phone)
+
+        if ghl_data.get('createdAt') or ghl_data.get('dateAdded'):
+            self.ghl_created_at = parse_ghl_datetime(ghl_data.get('createdAt') or ghl_data.get('dateAdded'))
+        self.ghl_updated_at = parse_ghl_datetime(ghl_data.get('updatedAt')) or datetime.utcnow()
+
+    @classmethod
+    def upsert_from_ghl(cls, location_id: str, opportunities: list, synced_at: datetime = None) -> int:
+        """
+        Insert or update a batch of GHL opportunity dicts.
+        Does not commit. Returns the number of opportunities written.
+        """
+        opportunities = [o for o in opportunities if o.get('id')]
+        if not opportunities:
+            return 0
+
+        existing = {
+            o.ghl_opportunity_id: o
+            for o in cls.query.filter(
+                cls.ghl_opportunity_id.in_([o['id'] for o in opportunities])
+            ).all()
+        }
+
+        for opp in opportunities:
+            row = existing.get(opp['id'])
+            if not row:
+                row = cls(location_id=location_id, ghl_opportunity_id=opp['id'])
+                db.session.add(row)
+                existing[opp['id']] = row
+            row.update_from_ghl(opp)
+            if synced_at:
+                row.last_synced_at = synced_at
+
+        return len(opportunities)
+
+    def __repr__(self):
+        return f'<GHLOpportunity {self.ghl_opportunity_id} status={self.status}>'
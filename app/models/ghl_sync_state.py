@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from ..extensions import db
+import json
+
+
+class GHLSyncState(db.Model):
+    """Per-location checkpoint for background GHL mirror jobs."""
+    __tablename__ = 'ghl_sync_states'
+    __table_args__ = (
+        db.UniqueConstraint('location_id', 'resource', name='uq_ghl_sync_states_location_resource'),
+    )
+
+    # Status constants
+    STATUS_IDLE = 'idle'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
+    # Resource constants
+    RESOURCE_TASKS = 'tasks'
+    RESOURCE_OPPORTUNITIES = 'opportunities'
+
+    # A running state that hasn't checkpointed for this long is treated as abandoned
+    STALE_AFTER = timedelta(minutes=30)
+
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.String(50), nullable=False)
+    resource = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default=STATUS_IDLE, nullable=False)
+
+    # Resume point within the current run (JSON), None when starting fresh
+    cursor = db.Column(db.Text, nullable=True)
+
+    # Progress of the current / last run
+    run_started_at = db.Column(db.DateTime, nullable=True)
+    items_synced = db.Column(db.Integer, default=0)
+    items_deleted = db.Column(db.Integer, default=0)
+    contacts_scanned = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    error_message = db.Column(db.Text, nullable=True)
+
+    # Incremental syncs: whether the current / last run was a full reconcile,
+    # and the start of the last completed run (changes older than it are mirrored)
+    full_run = db.Column(db.Boolean, default=True, nullable=False)
+    watermark = db.Column(db.DateTime, nullable=True)
+
+    # Timestamps
+    last_completed_at = db.Column(db.DateTime, nullable=True)
+    last_full_sync_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_cursor(self):
+        """Return the decoded resume cursor, or None."""
+        if not self.cursor:
+            return None
+        try:
+            return json.loads(self.cursor)
+        except (ValueError, TypeError):
+            return None
+
+    def set_cursor(self, cursor):
+        self.cursor = json.dumps(cursor) if cursor else None
+
+    def is_locked(self) -> bool:
+        """True if another worker is actively running this sync."""
+        return (
+            self.status == self.STATUS_RUNNING
+            and self.updated_at is not None
+            and datetime.utcnow() - self.updated_at < self.STALE_AFTER
+        )
+
+    def can_resume(self) -> bool:
+        """True if an interrupted run left a checkpoint to continue from."""
+        return self.status in (self.STATUS_RUNNING, self.STATUS_FAILED) and self.run_started_at is not None
+
+    def to_dict(self):
+        return {
+            'location_id': self.location_id,
+            'resource': self.resource,
+            'status': self.status,
+            'cursor': self.get_cursor(),
+            'run_started_at': self.run_started_at.isoformat() if self.run_started_at else None,
+            'items_synced': self.items_synced,
+            'items_deleted': self.items_deleted,
+            'contacts_scanned': self.contacts_scanned,
+            'error_count': self.error_count,
+            'error_message': self.error_message,
+            'full_run': self.full_run,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'last_completed_at': self.last_completed_at.isoformat() if self.last_completed_at else None,
+            'last_full_sync_at': self.last_full_sync_at.isoformat() if self.last_full_sync_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    @classmethod
+    def get_or_create(cls, location_id: str, resource: str) -> 'GHLSyncState':
+        """Get the checkpoint row for a location/resource, creating it if missing."""
+        state = cls.query.filter_by(location_id=location_id, resource=resource).first()
+        if not state:
+            state = cls(location_id=location_id, resource=resource, status=cls.STATUS_IDLE)
+            db.session.add(state)
+            db.session.commit()
+        return state
+
+    def __repr__(self):
+        return f'<GHLSyncState location={self.location_id} resource={self.resource} status={self.status}>'
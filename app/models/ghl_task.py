@@ -5,6 +5,15 @@ from ..extensions import db
 class GHLTask(db.Model):
     """Local mirror of GoHighLevel tasks for fast querying."""
     __tablename__ = 'ghl_tasks'
+    __table_args__ = (
+        # Composite (user, sort column, id) indexes back keyset pagination on every sortBy
+        db.Index('ix_ghl_tasks_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_ghl_tasks_user_updated', 'user_id', 'updated_at', 'id'),
+        db.Index('ix_ghl_tasks_user_due', 'user_id', 'due_date', 'id'),
+        db.Index('ix_ghl_tasks_user_title', 'user_id', 'title', 'id'),
+        db.Index('ix_ghl_tasks_user_completed', 'user_id', 'completed', 'id'),
+        db.Index('ix_ghl_tasks_user_contact', 'user_id', 'ghl_contact_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -27,6 +36,7 @@ class GHLTask(db.Model):
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_synced_at = db.Column(db.DateTime, nullable=True)  # Set by the background mirror sync
 
     # Relationship
     user = db.relationship('User', backref='ghl_tasks')
@@ -85,13 +95,17 @@ class GHLTask(db.Model):
         )
 
         if contact_info:
-            task.contact_first_name = contact_info.get('firstName', '')
-            task.contact_last_name = contact_info.get('lastName', '')
-            task.contact_email = contact_info.get('email', '')
-            task.contact_phone = contact_info.get('phone', '')
+            task.set_contact_info(contact_info)
 
         return task
 
+    def set_contact_info(self, contact_info):
+        """Cache contact fields from a dict with firstName, lastName, email, phone."""
+        self.contact_first_name = contact_info.get('firstName', '')
+        self.contact_last_name = contact_info.get('lastName', '')
+        self.contact_email = contact_info.get('email', '')
+        self.contact_phone = contact_info.get('phone', '')
+
     def update_from_ghl(self, ghl_data):
         """Update local fields from a GHL API response dict."""
         if 'title' in ghl_data:
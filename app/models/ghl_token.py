@@ -32,11 +32,16 @@ class GHLToken(db.Model):
     token_type = db.Column(db.String(20), default='Bearer')
     
     # Token metadata
-    expires_at = db.Column(db.DateTime, nullable=False)  # When access_token expires
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # When access_token expires
     scope = db.Column(db.Text, nullable=True)  # Granted scopes
     user_type = db.Column(db.String(20), default='Location')  # 'Location' or 'Company'
     is_agency = db.Column(db.Boolean, default=False)  # True for agency-level token
     
+    # Background refresh health (consecutive failures reset on success)
+    refresh_failures = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    last_refresh_error = db.Column(db.Text, nullable=True)
+    last_refresh_attempt_at = db.Column(db.DateTime, nullable=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -59,8 +64,16 @@ class GHLToken(db.Model):
         self.expires_at = GHLOAuthClient.calculate_token_expiry(token_data['expires_in'])
         if 'scope' in token_data:
             self.scope = token_data['scope']
+        self.refresh_failures = 0
+        self.last_refresh_error = None
         self.updated_at = datetime.utcnow()
     
+    def record_refresh_failure(self, error: str):
+        """Note a failed refresh attempt so it can be alerted on and backed off."""
+        self.refresh_failures = (self.refresh_failures or 0) + 1
+        self.last_refresh_error = error
+        self.last_refresh_attempt_at = datetime.utcnow()
+    
     def to_dict(self) -> dict:
         """Return token info (without sensitive data)."""
         return {
@@ -70,6 +83,9 @@ class GHLToken(db.Model):
             'user_type': self.user_type,
             'is_expired': self.is_expired(),
             'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'refresh_failures': self.refresh_failures or 0,
+            'last_refresh_error': self.last_refresh_error,
+            'last_refresh_attempt_at': self.last_refresh_attempt_at.isoformat() if self.last_refresh_attempt_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
     
@@ -17,6 +17,8 @@ class Job(db.Model):
     TYPE_SYNC_POSTS = 'sync_posts'
     TYPE_SYNC_COMMENTS = 'sync_comments'
     TYPE_SYNC_ALL = 'sync_all'
+    TYPE_GHL_BULK_MESSAGE = 'ghl_bulk_message'
+    TYPE_GHL_CONTACT_IMPORT = 'ghl_contact_import'
     
     id = db.Column(db.String(50), primary_key=True)  # UUID
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -29,11 +31,17 @@ class Job(db.Model):
     success_count = db.Column(db.Integer, default=0)
     error_count = db.Column(db.Integer, default=0)
     
+    # Job input (JSON string), e.g. the template and audience of a bulk message
+    params = db.Column(db.Text, nullable=True)
+    
     # Results and error information
     result = db.Column(db.Text, nullable=True)  # JSON string
     error_message = db.Column(db.Text, nullable=True)
     error_details = db.Column(db.Text, nullable=True)  # JSON string for detailed errors
     
+    # Token of the runner that currently owns the job (resumable jobs only)
+    runner_id = db.Column(db.String(36), nullable=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     started_at = db.Column(db.DateTime, nullable=True)
@@ -43,6 +51,14 @@ class Job(db.Model):
     # Relationship
     user = db.relationship('User', backref='jobs')
     
+    def get_params(self):
+        """Job input as a dict"""
+        return json.loads(self.params) if self.params else {}
+    
+    def set_params(self, params):
+        """Store job input"""
+        self.params = json.dumps(params) if params else None
+    
     def to_dict(self):
         """Convert job to dictionary"""
         result_data = None
@@ -83,6 +99,7 @@ class Job(db.Model):
             'processed_items': self.processed_items,
             'success_count': self.success_count,
             'error_count': self.error_count,
+            'params': self.get_params(),
             'result': result_data,
             'error_message': self.error_message,
             'error_details': error_details_data,
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark the AI comment reply pipeline offline.
+
+Seeds users, posts and comments into a scratch SQLite database, runs the reply
+pipeline end to end against the fake LLM backend (no OpenAI calls, no network)
+and reports throughput, LLM calls and DB statements per comment, and batch latency.
+
+Usage:
+    python benchmark_replies.py [--users N] [--posts N] [--comments N]
+                                [--latency-ms MS] [--error-rate R] [--malformed-rate R]
+                                [--duplicate-rate R] [--concurrency N] [--mode queue|direct]
+                                [--no-cache] [--seed N] [--db PATH]
+
+Options:
+    --users / --posts / --comments   Users, posts per user, comments per post
+    --latency-ms                     Simulated LLM latency per call
+    --error-rate                     Share of LLM calls that fail
+    --malformed-rate                 Share of LLM answers cut off mid-JSON
+    --duplicate-rate                 Share of comments that are a short stock comment ("Nice!")
+    --concurrency                    OPENAI_REPLY_CONCURRENCY for the run
+    --mode                           queue: enqueue + AIReplyQueueService.process (scheduled path)
+                                     direct: generateCommentsReply
+    --no-cache                       Disable the AI reply cache
+    --db                             SQLite file to use (default: a temporary file, removed afterwards)
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add project root directory to path (go up 2 levels from this script)
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import event, insert
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import User, FacebookPost, FacebookComment
+
+STOCK_COMMENTS = ['Nice!', 'Interested', 'Info please', '😍😍', 'How much?', 'Great post']
+
+
+def seed(users, posts, comments, duplicate_rate, rng):
+    """Bulk-insert the benchmark data set; returns the user ids."""
+    db.session.execute(insert(User), [
+        {'first_name': 'Bench', 'last_name': str(u), 'email': f'bench{u}@example.com',
+         'code': f'bench{u}', 'is_verified': True}
+        for u in range(users)
+    ])
+    user_ids = [row.id for row in User.query.with_entities(User.id).order_by(User.id)]
+
+    db.session.execute(insert(FacebookPost), [
+        {'user_id': user_id, 'facebook_post_id': f'bench_p{user_id}_{p}',
+         'message': f"Post {p} of user {user_id}: " + 'Homes for sale near the lake, open house this weekend. ' * rng.randint(1, 8),
+         'likes_count': rng.randint(0, 300), 'comments_count': comments, 'shares_count': rng.randint(0, 20)}
+        for user_id in user_ids for p in range(posts)
+    ])
+    post_rows = FacebookPost.query.with_entities(FacebookPost.id, FacebookPost.user_id).all()
+
+    rows = []
+    for post_id, user_id in post_rows:
+        for c in range(comments):
+            if rng.random() < duplicate_rate:
+                message = rng.choice(STOCK_COMMENTS)
+            else:
+                message = f"Comment {c} on post {post_id}: " + 'is this still available and what is the price? ' * rng.randint(1, 4)
+            rows.append({
+                'post_id': post_id, 'user_id': user_id, 'facebook_comment_id': f'bench_c{post_id}_{c}',
+                'message': message, 'comment_date': f'{rng.randint(1, 23)}h', 'language': 'en',
+                'likes_count': rng.randint(0, 10), 'self_comment': False,
+            })
+    for start in range(0, len(rows), 1000):
+        db.session.execute(insert(FacebookComment), rows[start:start + 1000])
+    db.session.commit()
+    return user_ids
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def run(args):
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='reply-bench-'), 'bench.db')
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        DEBUG = True  # keeps create_app from starting the scheduler
+        TESTING = True
+        SECRET_KEY = os.getenv('SECRET_KEY') or 'benchmark'
+        JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY') or 'benchmark-benchmark-benchmark-key'
+        AI_LLM_BACKEND = 'fake'
+        AI_FAKE_LLM_LATENCY_MS = args.latency_ms
+        AI_FAKE_LLM_ERROR_RATE = args.error_rate
+        AI_FAKE_LLM_MALFORMED_RATE = args.malformed_rate
+        AI_FAKE_LLM_SEED = args.seed
+        OPENAI_REPLY_CONCURRENCY = args.concurrency
+        AI_REPLY_CACHE_ENABLED = not args.no_cache
+
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        rng = random.Random(args.seed)
+        user_ids = seed(args.users, args.posts, args.comments, args.duplicate_rate, rng)
+        total = FacebookComment.query.count()
+
+        from app.services import ai_service
+        from app.services.ai_reply_queue_service import AIReplyQueueService
+
+        statements = [0]
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements[0] += 1
+
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        started = time.perf_counter()
+        if args.mode == 'queue':
+            AIReplyQueueService.enqueue_pending(user_ids)
+            AIReplyQueueService.process()
+        else:
+            ai_service.generateCommentsReply(user_ids)
+        elapsed = time.perf_counter() - started
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+        llm = ai_service.get_llm_instance()
+        replied = FacebookComment.query.filter(
+            FacebookComment.ai_reply.isnot(None), FacebookComment.ai_reply != ''
+        ).count()
+
+        print(f"Comments seeded:          {total}")
+        print(f"Comments replied:         {replied} ({total - replied} without a reply)")
+        print(f"Elapsed:                  {elapsed:.2f}s")
+        print(f"Comments/sec:             {replied / elapsed if elapsed else 0:.1f}")
+        print(f"LLM calls:                {llm.calls} ({llm.errors} failed)")
+        print(f"LLM calls per comment:    {llm.calls / replied if replied else 0:.3f}")
+        print(f"DB statements:            {statements[0]}")
+        print(f"DB statements per comment:{statements[0] / replied if replied else 0:.2f}")
+        print(f"Batch latency p50 / p95:  {percentile(llm.latencies, 50) * 1000:.0f}ms / "
+              f"{percentile(llm.latencies, 95) * 1000:.0f}ms")
+
+        db.session.remove()
+
+    if not args.db:
+        os.remove(db_path)
+        os.rmdir(os.path.dirname(db_path))
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the AI comment reply pipeline with a fake LLM')
+    parser.add_argument('--users', type=int, default=5, help='Users to seed')
+    parser.add_argument('--posts', type=int, default=4, help='Posts per user')
+    parser.add_argument('--comments', type=int, default=50, help='Comments per post')
+    parser.add_argument('--latency-ms', type=float, default=300, help='Simulated LLM latency per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of LLM calls that fail')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of LLM answers cut off mid-JSON')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Share of short stock comments')
+    parser.add_argument('--concurrency', type=int, default=4, help='LLM requests in flight')
+    parser.add_argument('--mode', choices=('queue', 'direct'), default='queue', help='Pipeline entry point')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the AI reply cache')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for data and fake LLM outcomes')
+    parser.add_argument('--db', help='SQLite file to use (default: temporary)')
+
+    args = parser.parse_args()
+
+    success = run(args)
+    sys.exit(0 if success else 1)
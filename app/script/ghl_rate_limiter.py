@@ -0,0 +1,203 @@
+"""
+GoHighLevel Rate-Limit Governor
+Tracks GHL's burst and daily quotas per location (and per agency) from the
+X-RateLimit-* response headers and throttles requests before they are sent.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class GHLRateLimitExceeded(Exception):
+    """
+    Raised when a request can't be sent within its wait budget or the daily quota is spent.
+
+    retry_after is how many seconds until the key has budget again; daily is
+    True when the daily quota (not the burst window) is what ran out.
+    """
+
+    def __init__(self, message, retry_after=None, daily=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.daily = daily
+
+
+def _next_utc_midnight(now):
+    return datetime(now.year, now.month, now.day) + timedelta(days=1)
+
+
+class _Budget:
+    """Known quota state for one rate-limit key."""
+
+    def __init__(self, burst_max, interval):
+        self.burst_max = burst_max
+        self.burst_remaining = burst_max
+        self.interval = interval
+        self.window_started = time.monotonic()
+        self.daily_max = None
+        self.daily_remaining = None
+        # When a spent daily quota is assumed to be available again (GHL doesn't report it)
+        self.daily_resets_at = None
+        self.requests_sent = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.last_response_at = None
+
+    def roll_window(self, now):
+        if now - self.window_started >= self.interval:
+            self.window_started = now
+            self.burst_remaining = self.burst_max
+
+    def to_dict(self):
+        return {
+            'burst_max': self.burst_max,
+            'burst_remaining': self.burst_remaining,
+            'interval_seconds': self.interval,
+            'daily_max': self.daily_max,
+            'daily_remaining': self.daily_remaining,
+            'daily_used_percent': (
+                round(100 * (1 - self.daily_remaining / self.daily_max), 2)
+                if self.daily_max and self.daily_remaining is not None else None
+            ),
+            'requests_sent': self.requests_sent,
+            'throttled': self.throttled,
+            'rate_limited': self.rate_limited,
+            'last_response_at': self.last_response_at.isoformat() if self.last_response_at else None,
+        }
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class GHLRateLimiter:
+    """
+    Shared limiter keyed by "location:<id>" or "agency:<company id>".
+
+    Until GHL has reported a key's limits the documented defaults are assumed
+    (100 requests per 10 seconds). Each acquire() spends one request from the
+    current burst window; when the window is spent the caller waits for it to
+    roll over instead of letting GHL answer with 429.
+    """
+
+    DEFAULT_BURST = 100
+    DEFAULT_INTERVAL = 10.0
+
+    def __init__(self, burst=DEFAULT_BURST, interval=DEFAULT_INTERVAL, reserve=2, max_wait=60.0):
+        self.default_burst = burst
+        self.default_interval = interval
+        # Requests held back per window for other processes sharing the same quota
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._budgets = {}
+        self._cond = threading.Condition()
+
+    def _budget(self, key):
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = _Budget(self.default_burst, self.default_interval)
+            self._budgets[key] = budget
+        return budget
+
+    def acquire(self, key, max_wait=None):
+        """Block until `key` has budget for one more request."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        with self._cond:
+            budget = self._budget(key)
+            waited = False
+            while True:
+                now = time.monotonic()
+                budget.roll_window(now)
+
+                if budget.daily_remaining is not None and budget.daily_remaining <= 0:
+                    utcnow = datetime.utcnow()
+                    if budget.daily_resets_at is None:
+                        budget.daily_resets_at = _next_utc_midnight(utcnow)
+                    if utcnow < budget.daily_resets_at:
+                        raise GHLRateLimitExceeded(
+                            f"Daily GHL API quota exhausted for {key}",
+                            retry_after=(budget.daily_resets_at - utcnow).total_seconds(), daily=True
+                        )
+                    # Unknown again until the next response reports it
+                    budget.daily_remaining = None
+                    budget.daily_resets_at = None
+
+                if budget.burst_remaining > self.reserve:
+                    budget.burst_remaining -= 1
+                    budget.requests_sent += 1
+                    if budget.daily_remaining is not None:
+                        budget.daily_remaining -= 1
+                    return
+
+                wait = budget.window_started + budget.interval - now
+                if now + wait > deadline:
+                    raise GHLRateLimitExceeded(
+                        f"GHL rate limit for {key} would need a {wait:.1f}s wait (max {max_wait:.1f}s)",
+                        retry_after=wait
+                    )
+                if not waited:
+                    budget.throttled += 1
+                    waited = True
+                self._cond.wait(timeout=max(wait, 0.01))
+
+    def update(self, key, headers, status_code=None):
+        """Record the quota GHL reported on a response for `key`."""
+        with self._cond:
+            budget = self._budget(key)
+            now = time.monotonic()
+            budget.last_response_at = datetime.utcnow()
+
+            interval_ms = _int_header(headers, 'X-RateLimit-Interval-Milliseconds')
+            if interval_ms:
+                budget.interval = interval_ms / 1000.0
+
+            burst_max = _int_header(headers, 'X-RateLimit-Max')
+            if burst_max:
+                budget.burst_max = burst_max
+
+            burst_remaining = _int_header(headers, 'X-RateLimit-Remaining')
+            if burst_remaining is not None:
+                # Other in-flight requests were already deducted locally; keep the lower figure
+                budget.burst_remaining = min(budget.burst_remaining, burst_remaining)
+
+            daily_max = _int_header(headers, 'X-RateLimit-Limit-Daily')
+            if daily_max:
+                budget.daily_max = daily_max
+
+            daily_remaining = _int_header(headers, 'X-RateLimit-Daily-Remaining')
+            if daily_remaining is not None:
+                budget.daily_remaining = daily_remaining
+                if daily_remaining > 0:
+                    budget.daily_resets_at = None
+
+            if status_code == 429:
+                budget.rate_limited += 1
+                budget.burst_remaining = 0
+                budget.window_started = now
+
+            self._cond.notify_all()
+
+    def snapshot(self, key=None):
+        """Current budget usage for one key, or for every key seen so far."""
+        with self._cond:
+            now = time.monotonic()
+            if key is not None:
+                budget = self._budgets.get(key)
+                if budget is None:
+                    return {}
+                budget.roll_window(now)
+                return {key: budget.to_dict()}
+
+            for budget in self._budgets.values():
+                budget.roll_window(now)
+            return {k: b.to_dict() for k, b in self._budgets.items()}
+
+
+# Global limiter shared by every LeadConnectorClient in this process
+rate_limiter = GHLRateLimiter()
@@ -3,17 +3,161 @@ GoHighLevel (LeadConnectorHQ) Python Client
 Private Integrations API v2.0
 """
 
+import os
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .ghl_rate_limiter import rate_limiter
+from app.services.cache import TTLCache
+
+
+# (connect, read) timeouts in seconds for every GHL call
+DEFAULT_TIMEOUT = (5, 30)
+
+# Only methods that are safe to repeat are retried on 429/5xx
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 429/5xx retries are done by LeadConnectorClient._send, so each one passes the rate limiter
+STATUS_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+# A longer Retry-After is not waited out in the request thread; the error goes to the caller
+MAX_RETRY_AFTER_SECONDS = float(os.getenv("GHL_MAX_RETRY_AFTER_SECONDS", 10))
+
+_session = None
+_session_lock = threading.Lock()
+
+# Slow-changing per-location metadata (pipelines, calendars, tags, workflows,
+# users, location details), shared by every client instance in this process
+metadata_cache = TTLCache(
+    maxsize=int(os.getenv("GHL_METADATA_CACHE_SIZE", 2048)),
+    ttl=int(os.getenv("GHL_METADATA_CACHE_TTL_SECONDS", 300)),
+)
+
+
+def build_session(pool_maxsize: int = 32, retries: int = 3, backoff_factor: float = BACKOFF_FACTOR):
+    """
+    Build a pooled requests session for GHL.
+
+    Only connection errors are retried here (for every method, since nothing
+    was sent). 429/5xx are retried by LeadConnectorClient._send instead, where
+    each attempt is counted by the rate limiter.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=backoff_factor,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the module-level session shared by all client instances."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def set_transport(session):
+    """
+    Replace the shared session, e.g. with one whose adapters talk to a local
+    fake GHL server. Pass None to go back to the default pooled session.
+    """
+    global _session
+    with _session_lock:
+        _session = session
 
 
 class LeadConnectorClient:
-    BASE_URL = "https://services.leadconnectorhq.com"
+    # GHL_API_BASE_URL lets a local fake GHL server stand in for the real API
+    BASE_URL = os.getenv("GHL_API_BASE_URL", "https://services.leadconnectorhq.com")
 
-    def __init__(self, access_token: str, location_id: str = None):
+    def __init__(self, access_token: str, location_id: str = None, session=None, timeout=DEFAULT_TIMEOUT,
+                 rate_limit_key: str = None):
         self.access_token = access_token
         self.location_id = location_id
+        self.session = session
+        self.timeout = timeout
+        # GHL quotas are per location; agency-token calls share the agency's budget
+        self.rate_limit_key = rate_limit_key or (f"location:{location_id}" if location_id else "agency")
 
-    def _request(self, method, path, params=None, data=None):
+    def _send(self, method, url, headers, params=None, data=None, retry=None):
+        """
+        Send one request through the rate limiter. Idempotent methods (or
+        retry=True) are retried on 429/5xx with exponential backoff, honouring
+        Retry-After up to MAX_RETRY_AFTER_SECONDS; every attempt acquires its
+        own budget and reports GHL's quota headers.
+        """
+        session = self.session or get_session()
+        if retry is None:
+            retry = method in RETRY_METHODS
+        retries = STATUS_RETRIES if retry else 0
+        for attempt in range(retries + 1):
+            rate_limiter.acquire(self.rate_limit_key)
+            resp = session.request(
+                method, url, headers=headers, params=params, json=data, timeout=self.timeout
+            )
+            rate_limiter.update(self.rate_limit_key, resp.headers, resp.status_code)
+            if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                break
+            delay = self._retry_delay(resp, attempt)
+            if delay > MAX_RETRY_AFTER_SECONDS:
+                break
+            time.sleep(delay)
+
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as e:
+            raise Exception(
+                f"[{resp.status_code}] Error calling {method} {url}: {resp.text}"
+            ) from e
+
+        return resp.json()
+
+    @staticmethod
+    def _retry_delay(resp, attempt):
+        """Seconds to wait before retrying: GHL's Retry-After, else exponential backoff."""
+        try:
+            return max(0.0, float(resp.headers.get("Retry-After")))
+        except (TypeError, ValueError):
+            return BACKOFF_FACTOR * 2 ** attempt
+
+    def _cached(self, resource, fetch, query=None, fresh=False, scope=None):
+        """
+        Read-through metadata cache. Entries are keyed by location (scope),
+        resource name and query; fresh=True skips the lookup but still
+        repopulates the cache with what GHL returned.
+        """
+        scope = scope or self.location_id or self.rate_limit_key
+        key = (scope, resource, tuple(sorted((k, str(v)) for k, v in (query or {}).items())))
+        if not fresh:
+            value = metadata_cache.get(key)
+            if value is not None:
+                return value
+        value = fetch()
+        metadata_cache.set(key, value)
+        return value
+
+    def invalidate_metadata(self, *resources):
+        """Drop cached metadata for this location (only the given resources, if any)."""
+        scope = self.location_id or self.rate_limit_key
+        return metadata_cache.delete_where(
+            lambda key: key[0] == scope and (not resources or key[1] in resources)
+        )
+
+    def _request(self, method, path, params=None, data=None, retry=None):
         url = f"{self.BASE_URL}{path}"
         headers = {
             "Accept": "application/json",
@@ -31,18 +175,7 @@ class LeadConnectorClient:
         if self.location_id and not skip_location and "locationId" not in params:
             params["locationId"] = self.location_id
 
-        resp = requests.request(
-            method, url, headers=headers, params=params, json=data
-        )
-
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError as e:
-            raise Exception(
-                f"[{resp.status_code}] Error calling {method} {url}: {resp.text}"
-            ) from e
-
-        return resp.json()
+        return self._send(method, url, headers, params=params, data=data, retry=retry)
 
     def _request2(self, method, path, params=None, data=None):
         url = f"{self.BASE_URL}{path}"
@@ -55,25 +188,16 @@ class LeadConnectorClient:
         if self.location_id:
             headers["LocationId"] = self.location_id
 
-        resp = requests.request(
-            method, url, headers=headers, params=params, json=data
-        )
-
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError as e:
-            raise Exception(
-                f"[{resp.status_code}] Error calling {method} {url}: {resp.text}"
-            ) from e
-
-        return resp.json()
+        return self._send(method, url, headers, params=params, data=data)
 
     # =====================
     # Locations & Companies
     # =====================
-    def get_location(self, location_id: str = None):
+    def get_location(self, location_id: str = None, fresh: bool = False):
         loc_id = location_id or self.location_id
-        return self._request("GET", f"/locations/{loc_id}")
+        return self._cached(
+            "location", lambda: self._request("GET", f"/locations/{loc_id}"), fresh=fresh, scope=loc_id
+        )
 
     def create_location(self, data: dict):
         """Create a new sub-account/location."""
@@ -95,12 +219,21 @@ class LeadConnectorClient:
     def list_contacts(self, **query):
         return self._request("GET", "/contacts/", params=query)
 
+    def search_contacts(self, data: dict):
+        """POST /contacts/search - Search contacts with filters, paged with searchAfter"""
+        return self._request("POST", "/contacts/search", data={"locationId": self.location_id, **data})
+
     def get_contact(self, contact_id: str):
         return self._request("GET", f"/contacts/{contact_id}")
 
     def create_contact(self, data: dict):
         return self._request("POST", "/contacts/", data=data)
 
+    def upsert_contact(self, data: dict):
+        """POST /contacts/upsert - Create a contact, or update the one GHL matches by email/phone"""
+        # Safe to repeat: GHL matches the contact it created on the first attempt
+        return self._request("POST", "/contacts/upsert", data={"locationId": self.location_id, **data}, retry=True)
+
     def update_contact(self, contact_id: str, data: dict):
         return self._request("PUT", f"/contacts/{contact_id}", data=data)
 
@@ -167,64 +300,92 @@ class LeadConnectorClient:
         """Mark a task as completed or incomplete"""
         return self._request("PUT", f"/contacts/{contact_id}/tasks/{task_id}/completed", data={"completed": completed})
 
-    def get_all_tasks(self, limit: int = 100):
+    def _fetch_contacts_page(self, batch_size: int, page: int, cursor: dict = None):
+        """Fetch one page of contacts for get_all_tasks. Uses GHL's startAfter cursor when known."""
+        params = {"limit": batch_size}
+        if cursor:
+            params.update(cursor)
+        else:
+            params["page"] = page
+        result = self.list_contacts(**params)
+        meta = result.get("meta") or {}
+        next_cursor = {k: meta[k] for k in ("startAfterId", "startAfter") if meta.get(k)}
+        return result.get("contacts", []), next_cursor
+
+    def fetch_contact_tasks(self, contact: dict):
+        """Fetch one contact's tasks with contact info (id, firstName, lastName, email, phone) attached to each task."""
+        contact_id = contact["id"]
+        tasks = self.list_tasks(contact_id).get("tasks", [])
+        for task in tasks:
+            task["contact"] = {
+                "id": contact_id,
+                "firstName": contact.get("firstName", ""),
+                "lastName": contact.get("lastName", ""),
+                "email": contact.get("email", ""),
+                "phone": contact.get("phone", ""),
+            }
+        return tasks
+
+    def get_all_tasks(self, limit: int = 100, max_workers: int = 8):
         """
         Get all tasks across all contacts.
         
-        Loops through all contacts and fetches their tasks.
-        Returns combined list with contact info attached to each task.
+        Fetches each contact's tasks concurrently, with at most `max_workers`
+        task requests in flight so a single call stays inside GHL's per-location
+        burst limit. The next contacts page is requested while the current
+        page's tasks are still being fetched. Tasks are returned in contact order,
+        the same order as a serial scan.
         
         Args:
             limit: Max contacts to scan (default 100)
+            max_workers: Max concurrent task requests (default 8)
         """
         import logging
-        all_tasks = []
+        from concurrent.futures import ThreadPoolExecutor
+
+        contact_futures = []  # (contact_id, future) in contact order
         contacts_scanned = 0
         page = 1
-        
-        while contacts_scanned < limit:
-            # Fetch a page of contacts
-            try:
-                batch_size = min(100, limit - contacts_scanned)
-                result = self.list_contacts(limit=batch_size, page=page)
-                contacts = result.get("contacts", [])
-            except Exception as e:
-                logging.error(f"Error fetching contacts page {page}: {e}")
-                break
-            
-            if not contacts:
-                break
-            
-            # For each contact, fetch their tasks
-            for contact in contacts:
-                contact_id = contact.get("id")
-                if not contact_id:
-                    continue
-                    
+
+        # Separate pools so a queued page prefetch never waits behind task requests
+        with ThreadPoolExecutor(max_workers=1) as page_executor, \
+                ThreadPoolExecutor(max_workers=max(1, max_workers)) as task_executor:
+            batch_size = min(100, limit)
+            next_page = page_executor.submit(self._fetch_contacts_page, batch_size, page)
+
+            while next_page is not None:
                 try:
-                    tasks_result = self.list_tasks(contact_id)
-                    tasks = tasks_result.get("tasks", [])
-                    
-                    # Attach contact info to each task
-                    for task in tasks:
-                        task["contact"] = {
-                            "id": contact_id,
-                            "firstName": contact.get("firstName", ""),
-                            "lastName": contact.get("lastName", ""),
-                            "email": contact.get("email", ""),
-                            "phone": contact.get("phone", ""),
-                        }
-                        all_tasks.append(task)
+                    contacts, cursor = next_page.result()
+                except Exception as e:
+                    logging.error(f"Error fetching contacts page {page}: {e}")
+                    break
+                next_page = None
+
+                if not contacts:
+                    break
+
+                # Queue this page's task fetches
+                for contact in contacts:
+                    if contact.get("id"):
+                        contact_futures.append(
+                            (contact["id"], task_executor.submit(self.fetch_contact_tasks, contact))
+                        )
+
+                contacts_scanned += len(contacts)
+                page += 1
+
+                # Pipeline the next page unless we've hit the limit or the last page
+                if contacts_scanned < limit and len(contacts) >= batch_size:
+                    batch_size = min(100, limit - contacts_scanned)
+                    next_page = page_executor.submit(self._fetch_contacts_page, batch_size, page, cursor)
+
+            all_tasks = []
+            for contact_id, future in contact_futures:
+                try:
+                    all_tasks.extend(future.result())
                 except Exception as e:
                     logging.warning(f"Error fetching tasks for contact {contact_id}: {e}")
                     continue
-            
-            contacts_scanned += len(contacts)
-            page += 1
-            
-            # If we got fewer than requested, we've reached the end
-            if len(contacts) < batch_size:
-                break
         
         return {
             "tasks": all_tasks,
@@ -235,29 +396,41 @@ class LeadConnectorClient:
     # ====
     # Tags (under location)
     # ====
-    def list_tags(self, **query):
+    def list_tags(self, fresh: bool = False, **query):
         """List tags for the location"""
-        return self._request("GET", f"/locations/{self.location_id}/tags/", params=query)
+        return self._cached(
+            "tags",
+            lambda: self._request("GET", f"/locations/{self.location_id}/tags/", params=dict(query)),
+            query, fresh
+        )
 
     def create_tag(self, data: dict):
         """Create a tag"""
-        return self._request("POST", f"/locations/{self.location_id}/tags/", data=data)
+        result = self._request("POST", f"/locations/{self.location_id}/tags/", data=data)
+        self.invalidate_metadata("tags")
+        return result
 
     def delete_tag(self, tag_id: str):
         """Delete a tag"""
-        return self._request("DELETE", f"/locations/{self.location_id}/tags/{tag_id}")
+        result = self._request("DELETE", f"/locations/{self.location_id}/tags/{tag_id}")
+        self.invalidate_metadata("tags")
+        return result
 
     # =========
     # Workflows
     # =========
-    def list_workflows(self, **query):
-        return self._request("GET", "/workflows/", params=query)
+    def list_workflows(self, fresh: bool = False, **query):
+        return self._cached(
+            "workflows", lambda: self._request("GET", "/workflows/", params=dict(query)), query, fresh
+        )
 
     # =====
     # Users
     # =====
-    def list_users(self, **query):
-        return self._request("GET", "/users/", params=query)
+    def list_users(self, fresh: bool = False, **query):
+        return self._cached(
+            "users", lambda: self._request("GET", "/users/", params=dict(query)), query, fresh
+        )
 
     def get_user(self, user_id: str):
         return self._request("GET", f"/users/{user_id}")
@@ -265,31 +438,43 @@ class LeadConnectorClient:
     # =========
     # Calendars
     # =========
-    def list_calendars(self, **query):
-        return self._request("GET", "/calendars/", params=query)
+    def list_calendars(self, fresh: bool = False, **query):
+        return self._cached(
+            "calendars", lambda: self._request("GET", "/calendars/", params=dict(query)), query, fresh
+        )
 
     def get_calendar(self, calendar_id: str):
         return self._request("GET", f"/calendars/{calendar_id}")
 
     def create_calendar(self, data: dict):
-        return self._request("POST", "/calendars/", data=data)
+        result = self._request("POST", "/calendars/", data=data)
+        self.invalidate_metadata("calendars")
+        return result
 
     def update_calendar(self, calendar_id: str, data: dict):
-        return self._request("PUT", f"/calendars/{calendar_id}", data=data)
+        result = self._request("PUT", f"/calendars/{calendar_id}", data=data)
+        self.invalidate_metadata("calendars")
+        return result
 
     def delete_calendar(self, calendar_id: str):
-        return self._request("DELETE", f"/calendars/{calendar_id}")
+        result = self._request("DELETE", f"/calendars/{calendar_id}")
+        self.invalidate_metadata("calendars")
+        return result
 
     # =========
     # Pipelines
     # =========
-    def list_pipelines(self, **query):
+    def list_pipelines(self, fresh: bool = False, **query):
         """GET /opportunities/pipelines - Get all pipelines"""
-        return self._request("GET", "/opportunities/pipelines", params=query)
+        return self._cached(
+            "pipelines",
+            lambda: self._request("GET", "/opportunities/pipelines", params=dict(query)),
+            query, fresh
+        )
 
-    def get_pipeline_stages(self, pipeline_id: str):
-        """Get stages for a specific pipeline (from pipeline data)"""
-        pipelines = self.list_pipelines()
+    def get_pipeline_stages(self, pipeline_id: str, fresh: bool = False):
+        """Get stages for a specific pipeline (from the cached pipeline list)"""
+        pipelines = self.list_pipelines(fresh=fresh)
         if 'pipelines' in pipelines:
             for pipeline in pipelines['pipelines']:
                 if pipeline.get('id') == pipeline_id:
@@ -488,66 +673,51 @@ class LeadConnectorClient:
     # ======================
     # Analytics / Statistics
     # ======================
-    def get_opportunity_stats(self, pipeline_id: str = None, **query):
-        """Get opportunity statistics aggregated by status
+    def iter_opportunity_pages(self, page_size: int = 100, max_workers: int = 8, **query):
+        """
+        Yield every page of search_opportunities results.
+
+        The first page reports the total; the remaining pages are then requested
+        concurrently (at most `max_workers` in flight) and yielded as they arrive,
+        so callers can aggregate without holding every opportunity in memory.
+        """
+        import math
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        first = self.search_opportunities(limit=page_size, page=1, **query)
+        yield first.get("opportunities", [])
+
+        total = (first.get("meta") or {}).get("total") or 0
+        pages = math.ceil(total / page_size)
+        if pages <= 1:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, pages - 1))) as executor:
+            futures = [
+                executor.submit(self.search_opportunities, limit=page_size, page=page, **query)
+                for page in range(2, pages + 1)
+            ]
+            for future in as_completed(futures):
+                yield future.result().get("opportunities", [])
+
+    def get_opportunity_stats(self, pipeline_id: str = None, fresh: bool = False, **query):
+        """Get opportunity statistics aggregated by status, stage and monetary value
         
+        Counts every opportunity (all pages), not just the first search page.
         Returns counts for: new, engaged, purchased (won), long-term (lost/abandoned)
         """
-        opportunities = self.search_opportunities(pipelineId=pipeline_id, **query)
-        
-        stats = {
-            'total': 0,
-            'new_opportunities': 0,
-            'engaged_leads': 0,
-            'purchased': 0,
-            'long_term_future': 0,
-            'open': 0,
-            'won': 0,
-            'lost': 0,
-            'abandoned': 0
-        }
-        
-        if 'opportunities' in opportunities:
-            opps = opportunities['opportunities']
-            stats['total'] = len(opps)
-            
-            for opp in opps:
-                status = opp.get('status', '').lower()
-                stats[status] = stats.get(status, 0) + 1
-                
-            # Map to user-friendly categories
-            stats['purchased'] = stats['won']
-            stats['long_term_future'] = stats['lost'] + stats['abandoned']
-            # New/engaged can be determined by stage or other criteria
-            stats['open'] = stats.get('open', 0)
-            stats['new_opportunities'] = stats['total'] - stats['won'] - stats['lost'] - stats['abandoned']
-            
-        return stats
+        from app.services.ghl_stats_service import OpportunityStatsService
 
-    def get_dashboard_stats(self, **query):
+        pipeline_id = pipeline_id or query.pop('pipelineId', None)
+        return OpportunityStatsService.get_stats(self, pipeline_id, fresh=fresh, **query)
+
+    def get_dashboard_stats(self, user_id: int = None, sections: list = None, timeout: float = None, **query):
         """Get comprehensive dashboard statistics
         
-        Aggregates data from opportunities, contacts, and tasks
+        Aggregates opportunities, pipelines, local task counts and the contact
+        total. Sections are fetched concurrently; any that fail or exceed their
+        timeout come back empty and are listed under `errors`.
         """
-        stats = {
-            'opportunities': self.get_opportunity_stats(**query),
-            'pipelines': [],
-            'recent_activity': []
-        }
-        
-        # Get pipeline summaries
-        try:
-            pipelines = self.list_pipelines()
-            if 'pipelines' in pipelines:
-                stats['pipelines'] = [
-                    {
-                        'id': p.get('id'),
-                        'name': p.get('name'),
-                        'stages_count': len(p.get('stages', []))
-                    }
-                    for p in pipelines['pipelines']
-                ]
-        except Exception:
-            pass
-            
-        return stats
\ No newline at end of file
+        from app.services.ghl_stats_service import DashboardStatsService
+
+        return DashboardStatsService.build(self, user_id=user_id, sections=sections, timeout=timeout, **query)
\ No newline at end of file
@@ -12,6 +12,8 @@ from flask import Response
 from urllib.parse import urljoin, urlparse, quote
 from ..models import User, FacebookPost, FacebookComment
 from ..extensions import db
+from ..services.ai_reply_queue_service import AIReplyQueueService
+from ..services.facebook_timestamps import parse_comment_timestamp
 from datetime import datetime
 # ---- CONFIG ----
 FB_POST_URL = "https://www.facebook.com/2309878802795671/posts/2319112888538929"
@@ -41,6 +43,8 @@ def scrape_post_comments(posts):
             # Navigate to the starting URL
             driver.get(post.permalink_url)
             time.sleep(5)  # Allow page to load
+            # Relative comment times ("5h") are resolved against this
+            scraped_at = datetime.utcnow()
 
 
             # ---- EXTRACT POST TEXT ----
@@ -74,6 +78,7 @@ def scrape_post_comments(posts):
                 # Create a map to store comment ID to DB ID mapping
                 comment_id_to_db_id = {}
                 comment_name_to_db_id = {}
+                seen_comment_ids, new_comment_ids = [], []
                 
                 comments = []
                 for comment in comment_blocks:
@@ -170,12 +175,14 @@ def scrape_post_comments(posts):
                         existing_comment.from_id = comment_data["name"]
                         existing_comment.from_name = comment_data["name"]
                         existing_comment.comment_date = comment_data["date"] if comment_data["date"] else 'N/A'
+                        existing_comment.commented_at = existing_comment.commented_at or parse_comment_timestamp(comment_data["date"], scraped_at)
                         existing_comment.likes_count = comment_data["likes"] if comment_data["likes"] else 0
                         existing_comment.has_liked = True if comment_data["has_liked"] else False
                         existing_comment.language = comment_data["language"] if comment_data["language"] else None
                         existing_comment.fetched_at = datetime.utcnow()
                         db.session.commit()
                         parent_db_comment_id = existing_comment.id
+                        seen_comment_ids.append(existing_comment.id)
                     else:
                         new_comment = FacebookComment(
                             post_id=post.id, 
@@ -184,6 +191,7 @@ def scrape_post_comments(posts):
                             from_id=comment_data["name"], 
                             from_name=comment_data["name"], 
                             comment_date=comment_data["date"] if comment_data["date"] else 'N/A', 
+                            commented_at=parse_comment_timestamp(comment_data["date"], scraped_at),
                             likes_count=comment_data["likes"] if comment_data["likes"] else 0, 
                             post_url=comment_data["profile_url"] if comment_data["profile_url"] else 'N/A',
                             has_liked=True if comment_data["has_liked"] else False,
@@ -194,6 +202,8 @@ def scrape_post_comments(posts):
                         db.session.add(new_comment)
                         db.session.commit()
                         parent_db_comment_id = new_comment.id
+                        seen_comment_ids.append(new_comment.id)
+                        new_comment_ids.append(new_comment.id)
                     
                     # Store mapping for later reply matching
                     if comment_data["comment_id"]:
@@ -320,12 +330,14 @@ def scrape_post_comments(posts):
                                     existing_reply.from_id = reply_data["name"]
                                     existing_reply.from_name = reply_data["name"]
                                     existing_reply.comment_date = reply_data["date"] if reply_data["date"] else 'N/A'
+                                    existing_reply.commented_at = existing_reply.commented_at or parse_comment_timestamp(reply_data["date"], scraped_at)
                                     existing_reply.likes_count = reply_data["likes"] if reply_data["likes"] else 0
                                     existing_reply.has_liked = True if reply_data["has_liked"] else False
                                     existing_reply.language = reply_data["language"] if reply_data["language"] else None
                                     existing_reply.parent_comment_id = parent_db_comment_id
                                     existing_reply.fetched_at = datetime.utcnow()
                                     db.session.commit()
+                                    seen_comment_ids.append(existing_reply.id)
                                 else:
                                     new_reply = FacebookComment(
                                         post_id=post.id,
@@ -335,6 +347,7 @@ def scrape_post_comments(posts):
                                         from_id=reply_data["name"],
                                         from_name=reply_data["name"],
                                         comment_date=reply_data["date"] if reply_data["date"] else 'N/A',
+                                        commented_at=parse_comment_timestamp(reply_data["date"], scraped_at),
                                         likes_count=reply_data["likes"] if reply_data["likes"] else 0,
                                         post_url=reply_data["profile_url"] if reply_data["profile_url"] else 'N/A',
                                         has_liked=True if reply_data["has_liked"] else False,
@@ -344,6 +357,8 @@ def scrape_post_comments(posts):
                                     )
                                     db.session.add(new_reply)
                                     db.session.commit()
+                                    seen_comment_ids.append(new_reply.id)
+                                    new_comment_ids.append(new_reply.id)
                                     # print(f"✅ Saved reply: {reply_data['comment'][:50]}...")
                     except Exception as e:
                         logging.error(f"Error getting replies for comment {comment_data.get('comment_id')}: {e}")
@@ -470,12 +485,14 @@ def scrape_post_comments(posts):
                                 existing_reply.from_id = reply_data["name"]
                                 existing_reply.from_name = reply_data["name"]
                                 existing_reply.comment_date = reply_data["date"] if reply_data["date"] else 'N/A'
+                                existing_reply.commented_at = existing_reply.commented_at or parse_comment_timestamp(reply_data["date"], scraped_at)
                                 existing_reply.likes_count = reply_data["likes"] if reply_data["likes"] else 0
                                 existing_reply.has_liked = True if reply_data["has_liked"] else False
                                 existing_reply.language = reply_data["language"] if reply_data["language"] else None
                                 existing_reply.parent_comment_id = parent_db_id
                                 existing_reply.fetched_at = datetime.utcnow()
                                 db.session.commit()
+                                seen_comment_ids.append(existing_reply.id)
                                 # print(f"  ✅ Updated reply: {reply_data['comment'][:50]}...")
                             else:
                                 new_reply = FacebookComment(
@@ -486,6 +503,7 @@ def scrape_post_comments(posts):
                                     from_id=reply_data["name"],
                                     from_name=reply_data["name"],
                                     comment_date=reply_data["date"] if reply_data["date"] else 'N/A',
+                                    commented_at=parse_comment_timestamp(reply_data["date"], scraped_at),
                                     likes_count=reply_data["likes"] if reply_data["likes"] else 0,
                                     post_url=reply_data["profile_url"] if reply_data["profile_url"] else 'N/A',
                                     has_liked=True if reply_data["has_liked"] else False,
@@ -495,6 +513,8 @@ def scrape_post_comments(posts):
                                 )
                                 db.session.add(new_reply)
                                 db.session.commit()
+                                seen_comment_ids.append(new_reply.id)
+                                new_comment_ids.append(new_reply.id)
                                 # print(f"  ✅ Saved new reply: {reply_data['comment'][:50]}...")
                         # else:
                         #     if not reply_data["comment_id"]:
@@ -506,6 +526,9 @@ def scrape_post_comments(posts):
                         logging.error(f"Error processing page-level reply: {e}")
                         continue
                         
+
+                # Queue this post's comments for AI replies; new ones get the fresh boost
+                AIReplyQueueService.enqueue(seen_comment_ids, fresh_ids=new_comment_ids)
             except Exception as e:
                 logging.error(f"Error getting comments: {e}")
                 continue
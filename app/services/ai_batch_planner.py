@@ -0,0 +1,124 @@
+"""
+AI Reply Batch Planner
+Packs comments into LLM requests by token budget, sending each post's text once per request
+"""
+import logging
+import threading
+from flask import current_app
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with langchain-openai
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Tokens taken by the instructions around the posts and comments
+PROMPT_OVERHEAD_TOKENS = 350
+# JSON keys and punctuation around each post / comment in the prompt
+ITEM_OVERHEAD_TOKENS = 12
+
+_encodings = {}
+_encoding_lock = threading.Lock()
+
+
+def _encoding(model_name):
+    """tiktoken encoding for the model, or None if tiktoken or its BPE files aren't available."""
+    if model_name in _encodings:
+        return _encodings[model_name]
+    with _encoding_lock:
+        if model_name not in _encodings:
+            encoding = None
+            if tiktoken is not None:
+                try:
+                    try:
+                        encoding = tiktoken.encoding_for_model(model_name)
+                    except KeyError:
+                        encoding = tiktoken.get_encoding('cl100k_base')
+                except Exception as e:
+                    # The BPE files are downloaded on first use; don't retry on every call
+                    logger.warning(f"tiktoken unavailable for {model_name}, estimating tokens from length: {e}")
+            _encodings[model_name] = encoding
+    return _encodings[model_name]
+
+
+def count_tokens(text, model_name=None):
+    text = text or ''
+    encoding = _encoding(model_name or current_app.config.get('OPENAI_MODEL', 'gpt-3.5-turbo'))
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens, model_name=None):
+    """Cut text down to at most max_tokens tokens."""
+    text = text or ''
+    encoding = _encoding(model_name or current_app.config.get('OPENAI_MODEL', 'gpt-3.5-turbo'))
+    if encoding is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= max_chars else text[:max_chars].rstrip() + '…'
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]).rstrip() + '…'
+
+
+def post_key(item):
+    """Comments are grouped by post id, or by post text for callers that don't pass one."""
+    return item.get('post_id') or item.get('post_text') or ''
+
+
+def plan_batches(items, max_comments=None):
+    """
+    Split comment dicts into LLM batches.
+
+    Comments are grouped by post and each batch carries a post's text once,
+    however many of its comments it holds. A batch is closed when adding the
+    next comment (plus its post, if the post isn't in the batch yet) would
+    exceed AI_BATCH_PROMPT_TOKEN_BUDGET, or when its replies would no longer
+    fit in OPENAI_MAX_TOKENS. Over-long posts and comments are truncated to
+    AI_BATCH_MAX_POST_TOKENS / AI_BATCH_MAX_COMMENT_TOKENS so a single item
+    can never overflow a request.
+
+    Args:
+        items: Comment dicts (id, comment, user_code, post_text, optional post_id)
+        max_comments: Hard cap on comments per batch (default AI_BATCH_MAX_COMMENTS)
+
+    Returns:
+        List of batches (lists of comment dicts, post and comment text truncated)
+    """
+    config = current_app.config
+    prompt_budget = config.get('AI_BATCH_PROMPT_TOKEN_BUDGET', 6000) - PROMPT_OVERHEAD_TOKENS
+    reply_tokens = config.get('AI_BATCH_REPLY_TOKENS', 120)
+    max_post_tokens = config.get('AI_BATCH_MAX_POST_TOKENS', 1500)
+    max_comment_tokens = config.get('AI_BATCH_MAX_COMMENT_TOKENS', 300)
+    max_by_output = max(1, (int(config.get('OPENAI_MAX_TOKENS', 2000)) - ITEM_OVERHEAD_TOKENS) // reply_tokens)
+    max_comments = min(max_comments or config.get('AI_BATCH_MAX_COMMENTS', 50), max_by_output)
+
+    groups = {}
+    for item in items:
+        groups.setdefault(post_key(item), []).append(item)
+
+    batches = []
+    batch, batch_posts, batch_tokens = [], set(), 0
+    post_tokens = {}
+    for key, group in groups.items():
+        post_text = truncate_tokens(group[0].get('post_text'), max_post_tokens)
+        post_tokens[key] = count_tokens(post_text) + ITEM_OVERHEAD_TOKENS
+        for item in group:
+            comment = truncate_tokens(item.get('comment'), max_comment_tokens)
+            comment_cost = count_tokens(comment) + ITEM_OVERHEAD_TOKENS
+            cost = comment_cost if key in batch_posts else comment_cost + post_tokens[key]
+            if batch and (batch_tokens + cost > prompt_budget or len(batch) >= max_comments):
+                batches.append(batch)
+                batch, batch_posts, batch_tokens = [], set(), 0
+                cost = comment_cost + post_tokens[key]
+            batch.append({**item, 'comment': comment, 'post_text': post_text})
+            batch_posts.add(key)
+            batch_tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
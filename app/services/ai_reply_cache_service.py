@@ -0,0 +1,153 @@
+"""
+AI Reply Cache Service
+Serves replies for repeated short comments ("Nice!", "Interested", emoji-only) without calling the LLM
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from ..models import AIReplyCache
+from ..extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Trailing / repeated punctuation that doesn't change what a comment means
+_PUNCTUATION = re.compile(r'[.!?,;:~*\-_"\'()\[\]]+')
+_WHITESPACE = re.compile(r'\s+')
+_REPEATED = re.compile(r'(.)\1{2,}')
+
+
+def normalize_comment(text):
+    """
+    Reduce a comment to the form used for cache lookups: case-folded,
+    punctuation stripped, whitespace collapsed and long character runs
+    shortened ("Niiiice!!!" -> "niice"). Emoji are kept as they carry the meaning.
+    """
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = _PUNCTUATION.sub(' ', text)
+    text = _REPEATED.sub(r'\1\1', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _sha256(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+class AIReplyCacheService:
+    """Service for the ai_reply_cache table"""
+
+    @staticmethod
+    def make_key(comment_text, post_text, language, user_code):
+        """
+        Cache key for one comment, or None if the comment shouldn't be cached
+        (empty, or longer than AI_REPLY_CACHE_MAX_COMMENT_CHARS: long comments
+        are specific enough that a shared reply would read wrong).
+        """
+        if not current_app.config.get('AI_REPLY_CACHE_ENABLED', True):
+            return None
+        normalized = normalize_comment(comment_text)
+        if not normalized or len(normalized) > current_app.config.get('AI_REPLY_CACHE_MAX_COMMENT_CHARS', 80):
+            return None
+        post_hash = _sha256((post_text or '').strip())
+        return _sha256('\x1f'.join((normalized, post_hash, (language or '').lower(), user_code or '')))
+
+    @staticmethod
+    def get_many(keys):
+        """
+        Look up cached replies and mark the hits as recently used.
+
+        Returns:
+            Dict of cache key -> reply for the keys that hit
+        """
+        keys = list({k for k in keys if k})
+        if not keys:
+            return {}
+
+        now = datetime.utcnow()
+        hits = {}
+        for start in range(0, len(keys), 500):
+            rows = AIReplyCache.query.filter(
+                AIReplyCache.cache_key.in_(keys[start:start + 500]),
+                AIReplyCache.expires_at > now
+            ).all()
+            for row in rows:
+                hits[row.cache_key] = row.reply
+                row.hit_count += 1
+                row.last_used_at = now
+        if hits:
+            db.session.commit()
+        return hits
+
+    @staticmethod
+    def get(key):
+        return AIReplyCacheService.get_many([key]).get(key) if key else None
+
+    @staticmethod
+    def store(entries):
+        """
+        Cache generated replies. Failures are logged and swallowed: the cache
+        must never fail reply generation.
+
+        Args:
+            entries: Iterable of (cache key, reply, metadata dict with
+                     comment / post_text / language / user_code) tuples; None keys are skipped
+        """
+        entries = {key: (reply, meta) for key, reply, meta in entries if key and reply}
+        if not entries:
+            return 0
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=current_app.config.get('AI_REPLY_CACHE_TTL_HOURS', 168))
+        try:
+            existing = {
+                row.cache_key: row
+                for row in AIReplyCache.query.filter(AIReplyCache.cache_key.in_(list(entries))).all()
+            }
+            for key, (reply, meta) in entries.items():
+                row = existing.get(key)
+                if row is None:
+                    row = AIReplyCache(cache_key=key)
+                    db.session.add(row)
+                row.reply = reply
+                row.user_code = meta.get('user_code')
+                row.language = meta.get('language')
+                row.post_hash = _sha256((meta.get('post_text') or '').strip())
+                row.normalized_comment = normalize_comment(meta.get('comment'))[:500]
+                row.last_used_at = now
+                row.expires_at = expires_at
+            db.session.commit()
+            return len(entries)
+        except IntegrityError:
+            # Another worker cached the same comment first; theirs is as good as ours
+            db.session.rollback()
+            return 0
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to cache AI replies: {e}")
+            return 0
+
+    @staticmethod
+    def evict():
+        """Delete expired entries, then the least recently used ones above AI_REPLY_CACHE_MAX_ENTRIES."""
+        expired = AIReplyCache.query.filter(
+            AIReplyCache.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+
+        overflow = 0
+        max_entries = current_app.config.get('AI_REPLY_CACHE_MAX_ENTRIES', 20000)
+        excess = AIReplyCache.query.count() - max_entries
+        if excess > 0:
+            cutoff = AIReplyCache.query.with_entities(AIReplyCache.last_used_at).order_by(
+                AIReplyCache.last_used_at.asc()
+            ).offset(excess - 1).limit(1).scalar()
+            overflow = AIReplyCache.query.filter(
+                AIReplyCache.last_used_at <= cutoff
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+        if expired or overflow:
+            logger.info(f"AI reply cache eviction: {expired} expired, {overflow} least recently used")
+        return expired + overflow
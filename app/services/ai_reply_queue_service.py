@@ -0,0 +1,301 @@
+"""
+AI Reply Queue Service
+Prioritized, fairly shared work queue of comments waiting for an AI reply, fed at ingest
+"""
+import logging
+import math
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, func, insert
+from sqlalchemy.exc import IntegrityError
+from ..models import AIReplyQueueItem, FacebookComment, FacebookPost, User
+from ..extensions import db
+from . import ai_service
+
+logger = logging.getLogger(__name__)
+
+# Priority weights; higher priority is served first
+NEW_USER_BOOST = 1000
+FRESH_COMMENT_BOOST = 400
+POST_ENGAGEMENT_MAX = 300
+COMMENT_LIKES_MAX = 100
+
+
+def _count(value):
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def reply_priority(user_created_at, commented_at, comment_likes, post_likes, post_comments, post_shares,
+                   now=None, fresh=False):
+    """
+    Priority of one comment: users still onboarding first, then recent
+    comments (the boost fades over AI_REPLY_QUEUE_FRESH_HOURS), then engagement
+    (log-scaled so one viral post can't starve everything else).
+
+    Comments without a known commented_at count as recent when `fresh`
+    (first seen in the current ingest).
+    """
+    now = now or datetime.utcnow()
+    config = current_app.config
+    new_user_window = timedelta(hours=config.get('AI_REPLY_QUEUE_NEW_USER_HOURS', 72))
+    priority = 0
+    if user_created_at and now - user_created_at <= new_user_window:
+        priority += NEW_USER_BOOST
+    if commented_at:
+        age_hours = max(0.0, (now - commented_at).total_seconds() / 3600)
+        fresh_hours = config.get('AI_REPLY_QUEUE_FRESH_HOURS', 24)
+        priority += int(FRESH_COMMENT_BOOST * max(0.0, 1 - age_hours / fresh_hours))
+    elif fresh:
+        priority += FRESH_COMMENT_BOOST
+    engagement = _count(post_likes) + _count(post_comments) + 2 * _count(post_shares)
+    priority += min(POST_ENGAGEMENT_MAX, int(50 * math.log2(1 + engagement)))
+    priority += min(COMMENT_LIKES_MAX, int(25 * math.log2(1 + _count(comment_likes))))
+    return priority
+
+
+class AIReplyQueueService:
+    """Service for the ai_reply_queue table"""
+
+    @staticmethod
+    def _candidates_query():
+        """Pending comments of verified users with the columns reply_priority needs."""
+        return db.session.query(
+            FacebookComment.id,
+            FacebookComment.user_id,
+            FacebookComment.likes_count,
+            FacebookComment.commented_at,
+            User.created_at.label('user_created_at'),
+            FacebookPost.likes_count.label('post_likes'),
+            FacebookPost.comments_count.label('post_comments'),
+            FacebookPost.shares_count.label('post_shares'),
+        ).join(
+            User, User.id == FacebookComment.user_id
+        ).join(
+            FacebookPost, FacebookPost.id == FacebookComment.post_id
+        ).filter(
+            User.is_verified == True,
+            FacebookComment.self_comment == 0,
+            or_(FacebookComment.ai_reply == None, FacebookComment.ai_reply == ''),
+            FacebookComment.ai_reply_failures < current_app.config.get('AI_REPLY_MAX_FAILURES', 3),
+        )
+
+    @staticmethod
+    def enqueue(comment_ids, fresh_ids=()):
+        """
+        Queue comments that still need a reply, or raise the priority of ones
+        already queued (e.g. after a re-scrape found more likes).
+
+        Args:
+            comment_ids: FacebookComment ids; answered / self comments are skipped
+            fresh_ids: Those of comment_ids first seen in this ingest
+
+        Returns:
+            Number of comments newly queued
+        """
+        comment_ids = list(dict.fromkeys(i for i in comment_ids if i))
+        if not comment_ids:
+            return 0
+        fresh_ids = set(fresh_ids)
+        now = datetime.utcnow()
+
+        try:
+            queued = 0
+            for start in range(0, len(comment_ids), 500):
+                batch = comment_ids[start:start + 500]
+                rows = AIReplyQueueService._candidates_query().filter(FacebookComment.id.in_(batch)).all()
+                existing = {
+                    item.comment_id: item
+                    for item in AIReplyQueueItem.query.filter(AIReplyQueueItem.comment_id.in_(batch)).all()
+                }
+                new_items = []
+                for row in rows:
+                    priority = reply_priority(
+                        row.user_created_at, row.commented_at, row.likes_count,
+                        row.post_likes, row.post_comments, row.post_shares, now, fresh=row.id in fresh_ids
+                    )
+                    item = existing.get(row.id)
+                    if item is None:
+                        new_items.append({'comment_id': row.id, 'user_id': row.user_id, 'priority': priority})
+                    elif priority > item.priority:
+                        # Never lower a queued comment, so it keeps the fresh boost it arrived with
+                        item.priority = priority
+                if new_items:
+                    db.session.execute(insert(AIReplyQueueItem), new_items)
+                    queued += len(new_items)
+            db.session.commit()
+            return queued
+        except IntegrityError:
+            # A concurrent ingest queued the same comments first
+            db.session.rollback()
+            return 0
+
+    @staticmethod
+    def enqueue_pending(user_ids=None):
+        """
+        Queue pending comments that aren't queued yet (comments from before the
+        queue existed, or from ingest paths that don't feed it).
+
+        Returns:
+            Number of comments queued
+        """
+        query = AIReplyQueueService._candidates_query().outerjoin(
+            AIReplyQueueItem, AIReplyQueueItem.comment_id == FacebookComment.id
+        ).filter(AIReplyQueueItem.id.is_(None))
+        if user_ids is not None:
+            query = query.filter(FacebookComment.user_id.in_(user_ids))
+
+        now = datetime.utcnow()
+        queued = 0
+        last_id = None
+        while True:
+            page = query
+            if last_id is not None:
+                page = page.filter(FacebookComment.id > last_id)
+            rows = page.order_by(FacebookComment.id.asc()).limit(500).all()
+            if not rows:
+                break
+            try:
+                # One executemany INSERT per page
+                db.session.execute(insert(AIReplyQueueItem), [
+                    {
+                        'comment_id': row.id,
+                        'user_id': row.user_id,
+                        'priority': reply_priority(
+                            row.user_created_at, row.commented_at, row.likes_count,
+                            row.post_likes, row.post_comments, row.post_shares, now
+                        ),
+                    }
+                    for row in rows
+                ])
+                db.session.commit()
+                queued += len(rows)
+            except IntegrityError:
+                db.session.rollback()
+            last_id = rows[-1].id
+        if queued:
+            logger.info(f"Queued {queued} pending comments for AI replies")
+        return queued
+
+    @staticmethod
+    def drop_unverified():
+        """
+        Remove queued comments of users who are no longer verified, so they
+        stop costing LLM calls. Returns the number of items removed.
+        """
+        unverified = db.session.query(User.id).filter(
+            or_(User.is_verified == False, User.is_verified.is_(None))
+        )
+        dropped = AIReplyQueueItem.query.filter(
+            AIReplyQueueItem.user_id.in_(unverified)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if dropped:
+            logger.info(f"Dropped {dropped} queued comments of unverified users")
+        return dropped
+
+    @staticmethod
+    def _claim_round(user_ids=None):
+        """
+        Claim the next round of work: the AI_REPLY_QUEUE_ROUND_USERS users with
+        the most urgent items, at most AI_REPLY_QUEUE_USER_SHARE items each, so
+        one user's backlog can't hold up everyone else's replies.
+
+        Returns:
+            (claim token, claimed comment ids)
+        """
+        config = current_app.config
+        now = datetime.utcnow()
+        stale_before = now - timedelta(minutes=config.get('AI_REPLY_QUEUE_LEASE_MINUTES', 15))
+        share = config.get('AI_REPLY_QUEUE_USER_SHARE', 20)
+
+        available = AIReplyQueueItem.query.join(
+            User, User.id == AIReplyQueueItem.user_id
+        ).filter(
+            User.is_verified == True,
+            User.code.isnot(None),
+            or_(AIReplyQueueItem.claimed_at.is_(None), AIReplyQueueItem.claimed_at < stale_before)
+        )
+        if user_ids is not None:
+            available = available.filter(AIReplyQueueItem.user_id.in_(user_ids))
+
+        users = available.with_entities(
+            AIReplyQueueItem.user_id, func.max(AIReplyQueueItem.priority).label('top')
+        ).group_by(AIReplyQueueItem.user_id).order_by(
+            func.max(AIReplyQueueItem.priority).desc()
+        ).limit(config.get('AI_REPLY_QUEUE_ROUND_USERS', 50)).all()
+
+        item_ids = []
+        for user_id, _ in users:
+            item_ids.extend(
+                row.id for row in available.with_entities(AIReplyQueueItem.id).filter(
+                    AIReplyQueueItem.user_id == user_id
+                ).order_by(AIReplyQueueItem.priority.desc(), AIReplyQueueItem.id.desc()).limit(share)
+            )
+        if not item_ids:
+            return None, []
+
+        token = str(uuid.uuid4())
+        AIReplyQueueItem.query.filter(
+            AIReplyQueueItem.id.in_(item_ids),
+            or_(AIReplyQueueItem.claimed_at.is_(None), AIReplyQueueItem.claimed_at < stale_before)
+        ).update({'claimed_at': now, 'claim_token': token}, synchronize_session=False)
+        db.session.commit()
+
+        comment_ids = [
+            row.comment_id for row in AIReplyQueueItem.query.with_entities(
+                AIReplyQueueItem.comment_id
+            ).filter(AIReplyQueueItem.claim_token == token)
+        ]
+        return token, comment_ids
+
+    @staticmethod
+    def process(user_ids=None):
+        """
+        Work through the queue one round at a time until it is empty or a round
+        makes no progress (e.g. the LLM is down). Answered and given-up comments
+        leave the queue; the rest are released for the next run.
+
+        Returns:
+            Number of comments that left the queue
+        """
+        AIReplyQueueService.drop_unverified()
+        done = 0
+        while True:
+            token, comment_ids = AIReplyQueueService._claim_round(user_ids)
+            if not comment_ids:
+                break
+
+            items = [
+                ai_service.comment_item(row)
+                for row in ai_service.pending_comments_query().filter(FacebookComment.id.in_(comment_ids)).all()
+            ]
+            if items:
+                ai_service.generate_items(items)
+
+            still_pending = {
+                row.id for row in ai_service.pending_comments_query().with_entities(FacebookComment.id).filter(
+                    FacebookComment.id.in_(comment_ids)
+                )
+            }
+            finished = AIReplyQueueItem.query.filter(
+                AIReplyQueueItem.claim_token == token,
+                AIReplyQueueItem.comment_id.notin_(still_pending)
+            ).delete(synchronize_session=False)
+            AIReplyQueueItem.query.filter(AIReplyQueueItem.claim_token == token).update(
+                {'claimed_at': None, 'claim_token': None}, synchronize_session=False
+            )
+            db.session.commit()
+
+            done += finished
+            if not finished:
+                logger.warning(f"AI reply queue round made no progress ({len(comment_ids)} comments); stopping")
+                break
+
+        ai_service.evict_reply_cache()
+        if done:
+            logger.info(f"AI reply queue: {done} comments done")
+        return done
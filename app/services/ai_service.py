@@ -1,16 +1,30 @@
 import os
 import logging
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import current_app
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from app.models.facebook_post import FacebookComment
-from sqlalchemy import or_
+from app.models.facebook_post import FacebookComment, FacebookPost
+from app.models.user import User
+from sqlalchemy import or_, case, update
 import json
 from app.extensions import db
+from app.services.ai_reply_cache_service import AIReplyCacheService
+from app.services.ai_batch_planner import plan_batches, post_key
+from app.services.pagination import keyset_paginate
+from app.services.llm_backends import create_llm
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-_llm_instance = None
+
+# Long-lived LLM clients keyed by backend and settings, so every call reuses
+# the same HTTP connection pool; a config change simply maps to a new key
+_llm_instances = {}
+_llm_lock = threading.Lock()
+
+# Replies written per UPDATE ... CASE statement
+SAVE_REPLIES_BATCH_SIZE = 500
 
 
 def clean_json_response(response_text):
@@ -35,125 +49,487 @@ def clean_json_response(response_text):
     return response_text.strip()
 
 
+def parse_replies(response_text, expected_ids=None):
+    """
+    Pull every well-formed {"id": ..., "reply": ...} object out of an LLM
+    response, whether it is a JSON-mode object ({"replies": [...]}), a bare
+    array, fenced in markdown, or cut off half way through. Objects that don't
+    parse, lack a reply, repeat an id or name an id that wasn't asked for are
+    dropped, so the rest of the batch can still be saved.
+    """
+    decoder = json.JSONDecoder()
+    text = response_text or ''
+    expected = {_as_id(i) for i in expected_ids} if expected_ids is not None else None
+    replies = {}
+
+    def collect(value):
+        if isinstance(value, list):
+            for element in value:
+                collect(element)
+        elif isinstance(value, dict):
+            if 'replies' in value:
+                collect(value['replies'])
+                return
+            reply_id = _as_id(value.get('id'))
+            reply = value.get('reply')
+            if isinstance(reply, str) and reply.strip() and reply_id not in replies \
+                    and (expected is None or reply_id in expected):
+                replies[reply_id] = {'id': reply_id, 'reply': reply.strip()}
+
+    try:
+        collect(json.loads(clean_json_response(text)))
+    except ValueError:
+        # Scan for objects one by one; raw_decode stops at the end of each complete object
+        position = text.find('{')
+        while position != -1:
+            try:
+                value, end = decoder.raw_decode(text, position)
+            except ValueError:
+                position = text.find('{', position + 1)
+                continue
+            collect(value)
+            position = text.find('{', end)
+    return list(replies.values())
+
+
+def _llm_settings():
+    """(backend name, settings for that backend) from the app config."""
+    config = current_app.config
+    backend = config.get("AI_LLM_BACKEND", "openai")
+    if backend == "fake":
+        return backend, {
+            "model_name": config.get("OPENAI_MODEL", "gpt-3.5-turbo"),
+            "latency_ms": config.get("AI_FAKE_LLM_LATENCY_MS", 0),
+            "error_rate": config.get("AI_FAKE_LLM_ERROR_RATE", 0.0),
+            "malformed_rate": config.get("AI_FAKE_LLM_MALFORMED_RATE", 0.0),
+            "seed": config.get("AI_FAKE_LLM_SEED", 0),
+        }
+    return backend, {
+        "temperature": float(config.get("OPENAI_TEMPERATURE", 0.7)),
+        "max_tokens": config.get("OPENAI_MAX_TOKENS", 500),
+        "model_name": config.get("OPENAI_MODEL", "gpt-3.5-turbo"),
+        "openai_api_key": config.get("OPENAI_API_KEY"),
+        "request_timeout": config.get("OPENAI_REQUEST_TIMEOUT_SECONDS", 60),
+        "max_retries": config.get("OPENAI_MAX_RETRIES", 2),
+    }
+
+
+def _llm_key(backend, settings):
+    # The API key is part of the identity but is only kept as a hash
+    api_key = settings.get("openai_api_key") or ""
+    return (backend,) + tuple(
+        (name, hashlib.sha256(api_key.encode()).hexdigest() if name == "openai_api_key" else value)
+        for name, value in sorted(settings.items())
+    )
+
+
 def get_llm_instance():
-    """Get or create a singleton LLM instance for reuse."""
-    global _llm_instance
-    
-    if _llm_instance is None:
-        try:
-            _llm_instance = ChatOpenAI(
-                temperature=current_app.config.get("OPENAI_TEMPERATURE", 0.7),
-                max_tokens=current_app.config.get("OPENAI_MAX_TOKENS", 500),
-                model_name=current_app.config.get("OPENAI_MODEL", "gpt-3.5-turbo"),
-                openai_api_key=current_app.config.get("OPENAI_API_KEY")
-            )
-            logger.info("LLM instance created successfully")
-        except Exception as e:
-            logger.error(f"Failed to create LLM instance: {e}")
-            raise
-    
-    return _llm_instance
+    """
+    Return the shared LLM client for the current settings, creating it on
+    first use. AI_LLM_BACKEND picks the implementation (see llm_backends).
+    """
+    backend, settings = _llm_settings()
+    key = _llm_key(backend, settings)
+    llm = _llm_instances.get(key)
+    if llm is not None:
+        return llm
+
+    with _llm_lock:
+        llm = _llm_instances.get(key)
+        if llm is None:
+            try:
+                llm = create_llm(backend, settings)
+                logger.info(f"LLM instance created for model {settings['model_name']} ({backend} backend)")
+            except Exception as e:
+                logger.error(f"Failed to create LLM instance: {e}")
+                raise
+            _llm_instances[key] = llm
+    return llm
 
-def generateCommentsReply(userIds, limit=10):
+
+def reload_llm_instances():
+    """Drop every cached LLM client; the next call builds a fresh one (e.g. after rotating the API key)."""
+    with _llm_lock:
+        dropped = len(_llm_instances)
+        _llm_instances.clear()
+    logger.info(f"Dropped {dropped} cached LLM instances")
+    return dropped
+
+def generateCommentsReply(userIds, limit=None):
+    """
+    Generate replies for every pending comment of the given users, one page
+    of iter_pending_comments at a time so memory stays flat however large the
+    backlog is.
+
+    Args:
+        limit: Optional cap on comments per LLM request; batches are otherwise
+               sized by token budget (see ai_batch_planner.plan_batches)
+    """
     try:
-        allComments = FacebookComment.query.filter(
-            FacebookComment.user_id.in_(userIds), 
-            FacebookComment.self_comment == 0,
-            or_(FacebookComment.ai_reply == None, FacebookComment.ai_reply == ''),
-        ).order_by(FacebookComment.comment_date.desc()).all()
-
-        total_comments = len(allComments)
-        processed_count = 0
-        chunk_number = 1
-        remainingComments = []
-        if total_comments > 0:
-            for i in range(0, total_comments, limit):
-                chunk_size = min(limit, total_comments - i)
-                chunk_comments = allComments[i:i + chunk_size]
-                for comment in chunk_comments:
-                    remaining = {}
-                    remaining['id'] = comment.id
-                    remaining['comment'] = comment.message
-                    remaining['user_id'] = comment.user_id
-                    remaining['user_code'] = comment.user.code
-                    remaining['post_text'] = comment.post.message
-                    if comment.user.code is not None:
-                        processed_count += 1
-                        remainingComments.append(remaining)
-                    else:
-                        logger.info(f"User {comment.user_id} has no code, skipping comment {comment.id}")
-                        # continue
-                generatereply(remainingComments)
-                remainingComments = []
-                chunk_number += 1
-        # print(f"\nTotal processed: {processed_count} comments in {chunk_number - 1} chunks oftotal comments {len(allComments)}")
+        for items in iter_pending_comments(userIds):
+            generate_items(items, max_comments=limit)
+        evict_reply_cache()
         return True
     except Exception as e:
         # logger.error(f"Error generating comments replies: {str(e)}")
         return False
-    finally:
-        reset_llm_instance()
 
-def generatereply(commentsList):
+
+def pending_comments_query(userIds=None):
+    """
+    Comments that still need a reply, with the user's code and the post text
+    joined in so no per-comment lazy loads are needed. Comments whose user has
+    no code yet are left for a later run.
+    """
+    query = db.session.query(
+        FacebookComment.id,
+        FacebookComment.message,
+        FacebookComment.user_id,
+        FacebookComment.post_id,
+        FacebookComment.language,
+        User.code.label('user_code'),
+        FacebookPost.message.label('post_text'),
+    ).join(
+        User, User.id == FacebookComment.user_id
+    ).join(
+        FacebookPost, FacebookPost.id == FacebookComment.post_id
+    ).filter(
+        FacebookComment.self_comment == 0,
+        or_(FacebookComment.ai_reply == None, FacebookComment.ai_reply == ''),
+        FacebookComment.ai_reply_failures < current_app.config.get("AI_REPLY_MAX_FAILURES", 3),
+        User.code.isnot(None),
+    )
+    if userIds is not None:
+        query = query.filter(FacebookComment.user_id.in_(userIds))
+    return query
+
+
+def comment_item(row):
+    """A pending_comments_query row as the dict the prompt builder takes."""
+    return {
+        'id': row.id,
+        'comment': row.message,
+        'user_id': row.user_id,
+        'user_code': row.user_code,
+        'post_id': row.post_id,
+        'post_text': row.post_text,
+        'language': row.language,
+    }
+
+
+def iter_pending_comments(userIds, page_size=None):
+    """
+    Yield pages of pending comments, most recently posted first (comments
+    with no known commented_at last), as comment_item() dicts.
+
+    One query per page, walked by keyset on (commented_at, id), so comments
+    answered while iterating don't shift later pages.
+    """
+    page_size = page_size or current_app.config.get("AI_REPLY_PAGE_SIZE", 500)
+    query = pending_comments_query(userIds).add_columns(FacebookComment.commented_at)
+
+    cursor = None
+    while True:
+        rows, cursor = keyset_paginate(
+            query, 'commented_at', FacebookComment.commented_at, FacebookComment.id, 'desc',
+            cursor=cursor, limit=page_size
+        )
+        if rows:
+            yield [comment_item(row) for row in rows]
+        if not cursor:
+            return
+
+
+def generate_items(items, max_comments=None):
+    """Generate and save replies for comment_item() dicts, using the reply cache."""
+    cache_entries = {item['id']: _cache_entry(item, item['language']) for item in items}
+    return generate_replies_concurrently([items], cache_entries, max_comments=max_comments)
+
+
+def evict_reply_cache():
     try:
-        llm = get_llm_instance()
-        comments_json = json.dumps(commentsList, indent=2)
-        default_instructions = f"""
+        AIReplyCacheService.evict()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"AI reply cache eviction failed: {e}")
+
+
+def _cache_entry(item, language=None):
+    """Reply-cache key and metadata for one chunk item."""
+    return {
+        'key': AIReplyCacheService.make_key(item.get('comment'), item.get('post_text'), language, item.get('user_code')),
+        'comment': item.get('comment'),
+        'post_text': item.get('post_text'),
+        'language': language,
+        'user_code': item.get('user_code'),
+    }
+
+
+def _serve_cached(chunks, cache_entries):
+    """
+    Answer what we can from the reply cache before calling the LLM.
+
+    Cache hits are saved straight away. Among the misses, only the first
+    comment per cache key is sent; later identical comments wait for its reply.
+
+    Returns:
+        (chunks still needing the LLM, cache key -> ids of comments waiting on it)
+    """
+    hits = AIReplyCacheService.get_many(entry['key'] for entry in cache_entries.values())
+    cached_replies = []
+    waiting = {}
+    remaining_chunks = []
+    for chunk in chunks:
+        remaining = []
+        for item in chunk:
+            key = cache_entries.get(item['id'], {}).get('key')
+            if key in hits:
+                cached_replies.append({'id': item['id'], 'reply': hits[key]})
+            elif key and key in waiting:
+                waiting[key].append(item['id'])
+            else:
+                if key:
+                    waiting[key] = []
+                remaining.append(item)
+        if remaining:
+            remaining_chunks.append(remaining)
+
+    if cached_replies:
+        save_replies(cached_replies)
+        logger.info(f"Served {len(cached_replies)} comment replies from the reply cache")
+    return remaining_chunks, {key: ids for key, ids in waiting.items() if ids}
+
+
+def _save_chunk(replies, cache_entries, waiting):
+    """
+    Save a chunk's fresh replies together with the identical comments that
+    were held back for them (one write), then cache the fresh replies.
+    """
+    followers = []
+    to_cache = []
+    for reply in replies:
+        entry = cache_entries.get(_as_id(reply.get('id')))
+        if not entry or not entry['key'] or not reply.get('reply'):
+            continue
+        to_cache.append((entry['key'], reply['reply'], entry))
+        followers.extend({'id': i, 'reply': reply['reply']} for i in waiting.pop(entry['key'], []))
+    save_replies(list(replies) + followers)
+    AIReplyCacheService.store(to_cache)
+
+
+def _as_id(value):
+    """The LLM echoes comment ids back as strings or numbers."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def generate_replies_concurrently(chunks, cache_entries=None, max_workers=None, max_comments=None):
+    """
+    Generate replies for many chunks, keeping up to OPENAI_REPLY_CONCURRENCY
+    LLM requests in flight. Each chunk's replies are saved as soon as that
+    chunk comes back; database writes stay on the calling thread.
+
+    Whatever the cache can't answer is re-packed into token-budgeted batches
+    by plan_batches, so the chunks passed in only need to list the comments.
+
+    Args:
+        chunks: Lists of comment dicts (id, comment, user_id, user_code, post_text, post_id)
+        cache_entries: Comment id -> _cache_entry(); enables the reply cache
+        max_comments: Optional cap on comments per LLM request
+
+    Comments the LLM left out of a response, or answered with malformed JSON,
+    are retried AI_REPLY_RETRY_ROUNDS times in smaller batches, and each miss
+    is counted in FacebookComment.ai_reply_failures.
+
+    Returns:
+        (chunks saved, chunks failed)
+    """
+    cache_entries = cache_entries or {}
+    waiting = {}
+    if cache_entries:
+        chunks, waiting = _serve_cached(chunks, cache_entries)
+    chunks = plan_batches([item for chunk in chunks for item in chunk], max_comments=max_comments)
+    if not chunks:
+        return 0, 0
+    config = current_app.config
+    max_workers = max_workers or config.get("OPENAI_REPLY_CONCURRENCY", 4)
+    retry_rounds = config.get("AI_REPLY_RETRY_ROUNDS", 1)
+    llm = get_llm_instance()
+    if config.get("OPENAI_JSON_MODE", True):
+        llm = llm.bind(response_format={"type": "json_object"})
+
+    saved = failed = 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix='ai-reply') as executor:
+        for attempt in range(retry_rounds + 1):
+            missing = []
+            futures = {executor.submit(request_replies, llm, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    replies = future.result()
+                    _save_chunk(replies, cache_entries, waiting)
+                except Exception as e:
+                    # Transport / API errors aren't the comments' fault: no failure is recorded
+                    db.session.rollback()
+                    failed += 1
+                    logger.error(f"Error generating replies for a chunk of {len(chunk)} comments: {str(e)}")
+                    continue
+                saved += 1
+                replied = {reply['id'] for reply in replies}
+                missing.extend(item for item in chunk if _as_id(item['id']) not in replied)
+
+            if not missing:
+                break
+            record_reply_failures([item['id'] for item in missing])
+            if attempt == retry_rounds:
+                logger.warning(f"No usable reply for {len(missing)} comments after {retry_rounds} retries")
+                break
+            logger.info(f"Retrying {len(missing)} comments missing from the LLM responses")
+            chunks = plan_batches(missing, max_comments=config.get("AI_REPLY_RETRY_BATCH_SIZE", 5))
+    logger.info(f"Generated replies for {saved} chunks ({failed} failed)")
+    return saved, failed
+
+
+def build_batch_prompt(commentsList):
+    """
+    Prompt for one batch. Each post (and its user's link) is listed once and
+    comments refer to it by label, so a post with many comments isn't repeated.
+    """
+    posts = {}
+    comments = []
+    for item in commentsList:
+        post = posts.setdefault((post_key(item), item.get('user_code')), {
+            'post': f"P{len(posts) + 1}",
+            'text': item.get('post_text') or '',
+            'link': f"http://form.zestal.pro/{item.get('user_code')}",
+        })
+        comments.append({'id': item['id'], 'post': post['post'], 'comment': item.get('comment') or ''})
+
+    posts_json = json.dumps(list(posts.values()), ensure_ascii=False)
+    comments_json = json.dumps(comments, ensure_ascii=False)
+    return f"""
             You are a helpful AI assistant that generates personalized replies to Facebook comments.
             
-            I will provide you a list of comments and you need to generate a reply for each comment.
+            I will provide you a list of posts and a list of comments on them, and you need to generate a reply for each comment.
             
             For each comment, create a personalized reply that:
             1. Responds appropriately to the comment content
             2. Is in the same language as the comment
-            3. Includes a call-to-action with the user's unique link: http://form.zestal.pro/{{user_code}}
+            3. Includes a call-to-action with the link of the comment's post
             4. Is engaging and relevant to the post content
             
-            The comments are:
+            The posts are:
+            {posts_json}
+            
+            The comments (each refers to its post by "post") are:
             {comments_json}
             
-            Return ONLY a JSON array with replies in this exact format:
-            [
-                {{
-                    "id": "comment_id",
-                    "comment": "original_comment_text",
-                    "user_id": "user_id",
-                    "user_code": "user_code",
-                    "post_text": "post_text",
-                    "reply": "personalized_reply_with_link"
-                }},
-                ...
-            ]
+            Return ONLY a JSON object with one reply per comment in this exact format:
+            {{
+                "replies": [
+                    {{
+                        "id": "comment_id",
+                        "reply": "personalized_reply_with_link"
+                    }},
+                    ...
+                ]
+            }}
             
-            Make sure each reply is personalized based on the comment and post content, and include the user's unique link in each reply.
+            Make sure each reply is personalized based on the comment and post content, and include the post's link in each reply.
         """
-        # print(f"Default instructions: {default_instructions}")
-        response = llm.invoke(default_instructions)
-        if hasattr(response, 'content'):
-            result = response.content
-        else:
-            result = str(response)
-        result = clean_json_response(result)
-        try:
-            parsed_result = json.loads(result)
-            for reply in parsed_result:
-                FacebookComment.query.filter_by(id=reply['id']).update({'ai_reply': reply['reply']})
-                db.session.commit()
-            return True
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            return False
+
+
+def request_replies(llm, commentsList):
+    """
+    Ask the LLM for one chunk's replies and parse whatever came back intact.
+    Touches no database state, so it is safe to run in a worker thread.
+
+    Returns:
+        Reply dicts (id, reply) for the comments the response covered
+    """
+    response = llm.invoke(build_batch_prompt(commentsList))
+    if hasattr(response, 'content'):
+        result = response.content
+    else:
+        result = str(response)
+    return parse_replies(result, [c['id'] for c in commentsList])
+
+
+def record_reply_failures(comment_ids):
+    """Count one more failed attempt for comments the LLM gave no usable reply for."""
+    if not comment_ids:
+        return
+    FacebookComment.query.filter(FacebookComment.id.in_(comment_ids)).update(
+        {'ai_reply_failures': FacebookComment.ai_reply_failures + 1}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def save_replies(replies):
+    """
+    Store parsed replies on their comments: one CASE-based UPDATE per
+    SAVE_REPLIES_BATCH_SIZE replies, all in a single transaction. Comments
+    that got a reply some other way in the meantime are left as they are.
+
+    Returns:
+        Number of comments updated
+    """
+    by_id = {}
+    for reply in replies:
+        by_id[_as_id(reply['id'])] = reply['reply']
+    if not by_id:
+        return 0
+
+    updated = 0
+    ids = list(by_id)
+    try:
+        for start in range(0, len(ids), SAVE_REPLIES_BATCH_SIZE):
+            batch = {i: by_id[i] for i in ids[start:start + SAVE_REPLIES_BATCH_SIZE]}
+            result = db.session.execute(
+                update(FacebookComment)
+                .where(
+                    FacebookComment.id.in_(list(batch)),
+                    or_(FacebookComment.ai_reply == None, FacebookComment.ai_reply == ''),
+                )
+                .values(ai_reply=case(batch, value=FacebookComment.id))
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return updated
+
+
+def generatereply(commentsList):
+    try:
+        cache_entries = {c['id']: _cache_entry(c, c.get('language')) for c in commentsList}
+        _, failed = generate_replies_concurrently([commentsList], cache_entries)
+        return failed == 0
     except Exception as e:
         logger.error(f"Error generating replies: {str(e)}")
         return False
 
 def reset_llm_instance():
-    global _llm_instance
-    _llm_instance = None
+    """Kept for existing callers; same as reload_llm_instances()."""
+    reload_llm_instances()
 
 
-def generate_single_reply(comment_id, comment_text, post_text, user_code):
+def generate_single_reply(comment_id, comment_text, post_text, user_code, language=None, use_cache=True):
+    """
+    Generate one reply. Short comments are served from the reply cache when
+    use_cache is set; a fresh reply always refreshes the cache entry.
+    """
     try:
+        cache_key = AIReplyCacheService.make_key(comment_text, post_text, language, user_code)
+        if use_cache and cache_key:
+            cached = AIReplyCacheService.get(cache_key)
+            if cached:
+                return cached
+
         llm = get_llm_instance()
         
         prompt = f"""
@@ -179,10 +555,12 @@ def generate_single_reply(comment_id, comment_text, post_text, user_code):
         else:
             result = str(response)
         
-        return result.strip()
+        result = result.strip()
+        AIReplyCacheService.store([(cache_key, result, {
+            'comment': comment_text, 'post_text': post_text, 'language': language, 'user_code': user_code
+        })])
+        return result
         
     except Exception as e:
         logger.error(f"Error generating single reply for comment {comment_id}: {str(e)}")
         return None
-    finally:
-        reset_llm_instance()
@@ -0,0 +1,109 @@
+"""
+Facebook Timestamps
+Turns the timestamps Facebook shows next to comments ("5h", "2w", "Yesterday at 3:15 PM", "March 5") into datetimes
+"""
+import re
+from datetime import datetime, timedelta
+
+# Unit spellings Facebook uses in compact ("5h") and long ("5 hrs", "5 hours") form
+_UNITS = {
+    's': 'seconds', 'sec': 'seconds', 'secs': 'seconds', 'second': 'seconds', 'seconds': 'seconds',
+    'm': 'minutes', 'min': 'minutes', 'mins': 'minutes', 'minute': 'minutes', 'minutes': 'minutes',
+    'h': 'hours', 'hr': 'hours', 'hrs': 'hours', 'hour': 'hours', 'hours': 'hours',
+    'd': 'days', 'day': 'days', 'days': 'days',
+    'w': 'weeks', 'wk': 'weeks', 'wks': 'weeks', 'week': 'weeks', 'weeks': 'weeks',
+    'mo': 'months', 'mos': 'months', 'month': 'months', 'months': 'months',
+    'y': 'years', 'yr': 'years', 'yrs': 'years', 'year': 'years', 'years': 'years',
+}
+
+_RELATIVE = re.compile(r'^(\d+)\s*([a-z]+)$')
+_TIME_OF_DAY = re.compile(r'\s+at\s+(\d{1,2}:\d{2}\s*(?:[ap]m)?)$')
+_WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Absolute dates, with and without a year
+_DATE_FORMATS = (
+    '%B %d, %Y', '%b %d, %Y', '%d %B %Y', '%d %b %Y', '%Y-%m-%d', '%m/%d/%Y',
+)
+_DATE_FORMATS_NO_YEAR = ('%B %d', '%b %d', '%d %B', '%d %b')
+
+
+def _parse_time_of_day(value):
+    for fmt in ('%I:%M %p', '%I:%M%p', '%H:%M'):
+        try:
+            parsed = datetime.strptime(value.upper(), fmt)
+            return parsed.hour, parsed.minute
+        except ValueError:
+            continue
+    return None
+
+
+def parse_comment_timestamp(text, scraped_at):
+    """
+    Convert a scraped comment timestamp to a datetime.
+
+    Relative values ("5h", "2 wks", "Just now", "Yesterday") are taken back
+    from scraped_at, so they are as precise as the unit shown. Absolute dates
+    without a year are placed in the year before scraped_at when they would
+    otherwise lie in the future.
+
+    Returns:
+        datetime, or None when the text isn't a recognisable timestamp ("N/A", "")
+    """
+    if not text or not scraped_at:
+        return None
+    value = text.strip().lower().replace('\xa0', ' ')
+    value = re.sub(r'\s*(·.*|ago|edited)$', '', value).strip()
+    if not value or value == 'n/a':
+        return None
+    if value in ('just now', 'now'):
+        return scraped_at
+
+    match = _RELATIVE.match(value)
+    if match:
+        amount, unit = int(match.group(1)), _UNITS.get(match.group(2))
+        if unit == 'months':
+            return scraped_at - timedelta(days=30 * amount)
+        if unit == 'years':
+            return scraped_at - timedelta(days=365 * amount)
+        if unit:
+            return scraped_at - timedelta(**{unit: amount})
+        return None
+
+    time_of_day = None
+    match = _TIME_OF_DAY.search(value)
+    if match:
+        time_of_day = _parse_time_of_day(match.group(1))
+        value = value[:match.start()].strip()
+
+    day = None
+    if value == 'today':
+        day = scraped_at
+    elif value == 'yesterday':
+        day = scraped_at - timedelta(days=1)
+    elif value in _WEEKDAYS:
+        # The most recent such weekday before today
+        days_back = (scraped_at.weekday() - _WEEKDAYS.index(value)) % 7 or 7
+        day = scraped_at - timedelta(days=days_back)
+    else:
+        for fmt in _DATE_FORMATS:
+            try:
+                day = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            for fmt in _DATE_FORMATS_NO_YEAR:
+                try:
+                    parsed = datetime.strptime(value, fmt)
+                except ValueError:
+                    continue
+                day = parsed.replace(year=scraped_at.year)
+                if day > scraped_at:
+                    day = day.replace(year=scraped_at.year - 1)
+                break
+
+    if day is None:
+        return None
+    hour, minute = time_of_day if time_of_day else (0, 0)
+    # A clock time later than the scrape is a timezone mismatch, not the future
+    return min(day.replace(hour=hour, minute=minute, second=0, microsecond=0), scraped_at)
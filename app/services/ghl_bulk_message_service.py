@@ -0,0 +1,426 @@
+"""
+GoHighLevel Bulk Message Service
+Sends one templated Email / SMS / WhatsApp message to many contacts as a resumable background job
+"""
+import logging
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime, timedelta
+import requests
+from flask import current_app
+from sqlalchemy import or_, and_
+from ..models import Job, BulkMessageRecipient, GHLContact
+from ..extensions import db
+from app.script.ghl_rate_limiter import GHLRateLimitExceeded
+from .ghl_token_service import token_provider
+from .ghl_contact_service import GHLContactService
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_TYPES = ('Email', 'SMS', 'WhatsApp')
+
+# GHL caps contact search pages at 100
+CONTACTS_PAGE_SIZE = 100
+
+# {{contact.first_name}} etc., the same merge fields GHL templates use
+PLACEHOLDER = re.compile(r'\{\{\s*contact\.(\w+)\s*\}\}')
+
+# "[404] Error calling POST ..." raised by LeadConnectorClient._send
+HTTP_STATUS = re.compile(r'^\[(\d{3})\]')
+
+
+def render_template(template, contact):
+    """Fill {{contact.*}} merge fields from a GHL contact dict; unknown fields are left as they are."""
+    if not template:
+        return template
+    contact = contact or {}
+    first_name = contact.get('firstName') or ''
+    last_name = contact.get('lastName') or ''
+    fields = {
+        'first_name': first_name,
+        'last_name': last_name,
+        'name': contact.get('name') or f"{first_name} {last_name}".strip(),
+        'full_name': contact.get('name') or f"{first_name} {last_name}".strip(),
+        'email': contact.get('email') or '',
+        'phone': contact.get('phone') or '',
+    }
+    return PLACEHOLDER.sub(lambda m: fields.get(m.group(1), m.group(0)), template)
+
+
+def _classify_error(error):
+    """
+    Map a send failure to the recipient's next status.
+
+    Only failures where GHL certainly didn't take the message are retried:
+    our own rate limiter refusing to send, a 429, or a connect timeout. Other
+    4xx are final. 5xx and read timeouts may have been delivered, so they are
+    recorded as unknown rather than risking a duplicate.
+
+    A limiter refusal never reached GHL; run_job doesn't count it as an
+    attempt and waits for the limiter instead.
+    """
+    if isinstance(error, (GHLRateLimitExceeded, requests.exceptions.ConnectTimeout)):
+        return BulkMessageRecipient.STATUS_PENDING
+    match = HTTP_STATUS.match(str(error))
+    if match:
+        status_code = int(match.group(1))
+        if status_code == 429:
+            return BulkMessageRecipient.STATUS_PENDING
+        if 400 <= status_code < 500:
+            return BulkMessageRecipient.STATUS_FAILED
+    return BulkMessageRecipient.STATUS_UNKNOWN
+
+
+class GHLBulkMessageService:
+    """Service for bulk GHL message jobs (Job rows of type ghl_bulk_message)"""
+
+    @staticmethod
+    def create_job(user_id, location_id, message_type, message, contact_ids=None, tag=None,
+                   subject=None, html=None, attachments=None):
+        """
+        Persist a bulk message job and its explicit recipients. Recipients matching
+        `tag` are resolved by the runner, so creating the job never waits on GHL.
+        """
+        job = Job(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            job_type=Job.TYPE_GHL_BULK_MESSAGE,
+            status=Job.STATUS_PENDING
+        )
+        job.set_params({
+            'location_id': location_id,
+            'type': message_type,
+            'message': message,
+            'subject': subject,
+            'html': html,
+            'attachments': attachments,
+            'tag': tag,
+            'tag_resolved': False,
+        })
+        db.session.add(job)
+        db.session.flush()
+        job.total_items = BulkMessageRecipient.add_contacts(job.id, contact_ids or [])
+        db.session.commit()
+
+        logger.info(f"Created bulk message job {job.id} for user {user_id}: {job.total_items} contacts, tag={tag}")
+        return job
+
+    @staticmethod
+    def run_job_background(app, job_id):
+        """Background entry point (run_job_async / resume)."""
+        with app.app_context():
+            try:
+                GHLBulkMessageService.run_job(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Bulk message job {job_id} failed: {str(e)}")
+                job = Job.query.get(job_id)
+                if job and job.status == Job.STATUS_IN_PROGRESS:
+                    job.mark_failed(str(e))
+
+    @staticmethod
+    def run_job(job_id):
+        """
+        Send the job's pending recipients until none are left.
+
+        Safe to call again after a crash: the job is only taken over once its
+        previous runner stopped heartbeating, and recipients that were mid-send
+        are marked unknown instead of being sent a second time. Each run claims
+        the job under a fresh runner_id and heartbeats with it (before every
+        batch and while a batch is in flight); a runner that finds the job
+        cancelled or taken over stops without sending its next batch.
+
+        When the rate limiter holds sends back, the runner sleeps until the
+        limiter has budget again, or, for longer waits (a spent daily quota),
+        pauses the job until params['next_attempt_at'] and returns;
+        resume_interrupted() continues it from there.
+        """
+        runner_id = str(uuid.uuid4())
+        if not GHLBulkMessageService._claim(job_id, runner_id):
+            logger.info(f"Bulk message job {job_id} is finished or owned by another runner")
+            return
+
+        job = Job.query.get(job_id)
+        if not job.started_at:
+            job.started_at = datetime.utcnow()
+        params = job.get_params()
+        if params.pop('next_attempt_at', None):
+            job.set_params(params)
+
+        interrupted = BulkMessageRecipient.query.filter_by(
+            job_id=job_id, status=BulkMessageRecipient.STATUS_SENDING
+        ).update({
+            'status': BulkMessageRecipient.STATUS_UNKNOWN,
+            'error': 'Interrupted while sending; not retried to avoid a duplicate'
+        }, synchronize_session=False)
+        db.session.commit()
+        if interrupted:
+            logger.warning(f"Bulk message job {job_id}: {interrupted} recipients were mid-send when the last run stopped")
+
+        client = token_provider.client_for_location(params['location_id'])
+
+        if params.get('tag') and not params.get('tag_resolved'):
+            GHLBulkMessageService._resolve_tag(client, job, params)
+
+        config = current_app.config
+        batch_size = config.get('GHL_BULK_MESSAGE_BATCH_SIZE', 50)
+        max_attempts = config.get('GHL_BULK_MESSAGE_MAX_ATTEMPTS', 3)
+        max_sleep = config.get('GHL_BULK_MESSAGE_MAX_SLEEP_SECONDS', 60)
+        heartbeat = config.get('GHL_BULK_MESSAGE_HEARTBEAT_SECONDS', 30)
+        personalized = any(
+            PLACEHOLDER.search(params.get(field) or '') for field in ('message', 'subject', 'html')
+        )
+
+        with ThreadPoolExecutor(max_workers=config.get('GHL_BULK_MESSAGE_CONCURRENCY', 4),
+                                thread_name_prefix='ghl-bulk') as executor:
+            while True:
+                if not GHLBulkMessageService._heartbeat(job_id, runner_id):
+                    logger.info(f"Bulk message job {job_id} stopped (cancelled or taken over)")
+                    return
+
+                batch = GHLBulkMessageService._claim_batch(job_id, runner_id, batch_size)
+                if batch is None:
+                    break
+                if not batch:
+                    # Another runner claimed these first; it owns the job now
+                    continue
+
+                contacts = {}
+                if personalized:
+                    contacts = {
+                        c.ghl_contact_id: c.to_contact_info()
+                        for c in GHLContact.query.filter(
+                            GHLContact.location_id == params['location_id'],
+                            GHLContact.ghl_contact_id.in_([r.contact_id for r in batch])
+                        ).all()
+                    }
+
+                futures = [
+                    executor.submit(GHLBulkMessageService._send_one, client, params, personalized,
+                                    r.contact_id, contacts.get(r.contact_id))
+                    for r in batch
+                ]
+                # Keep last_updated fresh while the batch is out, so a slow batch
+                # isn't mistaken for a dead runner and sent again by another one
+                while wait_futures(futures, timeout=heartbeat).not_done:
+                    GHLBulkMessageService._heartbeat(job_id, runner_id)
+                results = [f.result() for f in futures]
+
+                fetched = []
+                deferred_for = []
+                for recipient, result in zip(batch, results):
+                    status = result['status']
+                    if 'retry_after' in result:
+                        # Held back by our limiter, never sent: not an attempt
+                        recipient.attempts -= 1
+                        deferred_for.append(result['retry_after'])
+                    elif status == BulkMessageRecipient.STATUS_PENDING and recipient.attempts >= max_attempts:
+                        status = BulkMessageRecipient.STATUS_FAILED
+                    recipient.status = status
+                    recipient.error = result.get('error')
+                    if status == BulkMessageRecipient.STATUS_SENT:
+                        recipient.ghl_message_id = result.get('message_id')
+                        recipient.ghl_conversation_id = result.get('conversation_id')
+                        recipient.sent_at = datetime.utcnow()
+                    if result.get('contact'):
+                        fetched.append(result['contact'])
+                db.session.commit()
+
+                GHLContactService.cache_contacts(params['location_id'], fetched)
+                GHLBulkMessageService._update_progress(job)
+
+                if deferred_for:
+                    wait = max(deferred_for)
+                    if wait > max_sleep:
+                        GHLBulkMessageService._pause(job, wait)
+                        return
+                    logger.info(f"Bulk message job {job_id}: rate limited, waiting {wait:.1f}s")
+                    time.sleep(wait)
+
+        counts = GHLBulkMessageService._update_progress(job)
+        if not GHLBulkMessageService._heartbeat(job_id, runner_id):
+            return
+        job.mark_completed({'recipients': counts})
+        logger.info(f"Bulk message job {job_id} completed: {counts}")
+
+    @staticmethod
+    def _claim(job_id, runner_id):
+        """Atomically take ownership of a job that is new or whose runner went quiet."""
+        stale_before = datetime.utcnow() - timedelta(
+            minutes=current_app.config.get('GHL_BULK_MESSAGE_STALE_MINUTES', 10)
+        )
+        claimed = Job.query.filter(
+            Job.id == job_id,
+            Job.job_type == Job.TYPE_GHL_BULK_MESSAGE,
+            or_(
+                Job.status == Job.STATUS_PENDING,
+                and_(Job.status == Job.STATUS_IN_PROGRESS, Job.last_updated < stale_before)
+            )
+        ).update({'status': Job.STATUS_IN_PROGRESS, 'runner_id': runner_id, 'last_updated': datetime.utcnow()},
+                 synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    @staticmethod
+    def _heartbeat(job_id, runner_id):
+        """Bump last_updated if this runner still owns the job. False once it was cancelled or taken over."""
+        owned = Job.query.filter(
+            Job.id == job_id,
+            Job.runner_id == runner_id,
+            Job.status == Job.STATUS_IN_PROGRESS
+        ).update({'last_updated': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return owned == 1
+
+    @staticmethod
+    def _claim_batch(job_id, runner_id, batch_size):
+        """
+        Move up to batch_size pending recipients to 'sending' for this runner.
+
+        The UPDATE only matches rows that are still pending, so two runners can
+        never both claim a recipient; the rows read back are the ones stamped
+        with our runner_id. It is committed before any request goes out, so a
+        crash from here on leaves them as 'sending'.
+
+        Returns:
+            The claimed recipients, [] if another runner got them first, or
+            None if nothing is pending
+        """
+        candidate_ids = [
+            row.id for row in BulkMessageRecipient.query.with_entities(BulkMessageRecipient.id).filter_by(
+                job_id=job_id, status=BulkMessageRecipient.STATUS_PENDING
+            ).order_by(BulkMessageRecipient.id).limit(batch_size).all()
+        ]
+        if not candidate_ids:
+            return None
+
+        BulkMessageRecipient.query.filter(
+            BulkMessageRecipient.id.in_(candidate_ids),
+            BulkMessageRecipient.status == BulkMessageRecipient.STATUS_PENDING
+        ).update({
+            'status': BulkMessageRecipient.STATUS_SENDING,
+            'attempts': BulkMessageRecipient.attempts + 1,
+            'runner_id': runner_id,
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return BulkMessageRecipient.query.filter(
+            BulkMessageRecipient.id.in_(candidate_ids),
+            BulkMessageRecipient.status == BulkMessageRecipient.STATUS_SENDING,
+            BulkMessageRecipient.runner_id == runner_id
+        ).order_by(BulkMessageRecipient.id).all()
+
+    @staticmethod
+    def _pause(job, wait):
+        """Leave the job for resume_interrupted() to continue once `wait` seconds have passed."""
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=wait)
+        params = job.get_params()
+        params['next_attempt_at'] = next_attempt_at.isoformat()
+        job.set_params(params)
+        job.last_updated = datetime.utcnow()
+        db.session.commit()
+        logger.warning(f"Bulk message job {job.id}: GHL quota spent, paused until {next_attempt_at.isoformat()}")
+
+    @staticmethod
+    def _resolve_tag(client, job, params):
+        """Add every contact carrying the job's tag as a recipient."""
+        search_after = None
+        while True:
+            body = {
+                'pageLimit': CONTACTS_PAGE_SIZE,
+                'filters': [{'field': 'tags', 'operator': 'contains', 'value': params['tag']}],
+            }
+            if search_after:
+                body['searchAfter'] = search_after
+            contacts = client.search_contacts(body).get('contacts', [])
+
+            BulkMessageRecipient.add_contacts(job.id, [c.get('id') for c in contacts])
+            job.last_updated = datetime.utcnow()
+            db.session.commit()
+            GHLContactService.cache_contacts(params['location_id'], contacts)
+
+            search_after = contacts[-1].get('searchAfter') if contacts else None
+            if len(contacts) < CONTACTS_PAGE_SIZE or not search_after:
+                break
+
+        params['tag_resolved'] = True
+        job.set_params(params)
+        db.session.commit()
+
+    @staticmethod
+    def _send_one(client, params, personalized, contact_id, contact):
+        """Send to one contact (runs in a worker thread, no database access)."""
+        result = {}
+        try:
+            if personalized and contact is None:
+                fetched = client.get_contact(contact_id)
+                contact = fetched.get('contact', fetched)
+                result['contact'] = {**contact, 'id': contact_id}
+
+            response = client.send_message(
+                message_type=params['type'],
+                contact_id=contact_id,
+                message=render_template(params.get('message'), contact),
+                subject=render_template(params.get('subject'), contact),
+                html=render_template(params.get('html'), contact),
+                attachments=params.get('attachments'),
+            )
+            result.update(
+                status=BulkMessageRecipient.STATUS_SENT,
+                message_id=response.get('messageId'),
+                conversation_id=response.get('conversationId'),
+            )
+        except Exception as e:
+            result.update(status=_classify_error(e), error=str(e))
+            if isinstance(e, GHLRateLimitExceeded):
+                result['retry_after'] = e.retry_after or 0
+        return result
+
+    @staticmethod
+    def _update_progress(job):
+        counts = BulkMessageRecipient.counts_by_status(job.id)
+        job.update_progress(
+            processed=counts['sent'] + counts['failed'] + counts['unknown'],
+            success=counts['sent'],
+            error=counts['failed'] + counts['unknown'],
+            total=sum(counts.values()),
+        )
+        return counts
+
+    @staticmethod
+    def resume_interrupted():
+        """Restart bulk message jobs that were never started, whose runner died, or whose pause is over."""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(
+            minutes=current_app.config.get('GHL_BULK_MESSAGE_STALE_MINUTES', 10)
+        )
+        job_ids = []
+        for job in Job.query.filter(
+            Job.job_type == Job.TYPE_GHL_BULK_MESSAGE,
+            Job.status.in_([Job.STATUS_PENDING, Job.STATUS_IN_PROGRESS]),
+            Job.last_updated < stale_before
+        ).all():
+            next_attempt_at = job.get_params().get('next_attempt_at')
+            if next_attempt_at and datetime.fromisoformat(next_attempt_at) > now:
+                continue
+            job_ids.append(job.id)
+        for job_id in job_ids:
+            logger.info(f"Resuming bulk message job {job_id}")
+            try:
+                GHLBulkMessageService.run_job(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error resuming bulk message job {job_id}: {str(e)}")
+                job = Job.query.get(job_id)
+                if job and job.status == Job.STATUS_IN_PROGRESS:
+                    job.mark_failed(str(e))
+        return len(job_ids)
+
+    @staticmethod
+    def cancel(job):
+        """Stop a job; the runner notices before its next batch."""
+        if job.status in (Job.STATUS_PENDING, Job.STATUS_IN_PROGRESS):
+            job.mark_cancelled()
+        return job
@@ -0,0 +1,435 @@
+"""
+GoHighLevel Contact Import Service
+Streams a CSV / NDJSON upload into GHL as a background job and writes a per-row result report
+"""
+import csv
+import json
+import logging
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_
+from ..models import Job, GHLContact
+from ..extensions import db
+from app.script.ghl_rate_limiter import GHLRateLimitExceeded
+from .ghl_token_service import token_provider
+from .ghl_contact_service import GHLContactService
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson')
+
+# Header / key (lowercased, punctuation removed) -> GHL contact field
+FIELD_ALIASES = {
+    'firstname': 'firstName', 'first': 'firstName',
+    'lastname': 'lastName', 'last': 'lastName',
+    'name': 'name', 'fullname': 'name',
+    'email': 'email', 'emailaddress': 'email',
+    'phone': 'phone', 'phonenumber': 'phone', 'mobile': 'phone',
+    'companyname': 'companyName', 'company': 'companyName',
+    'address': 'address1', 'address1': 'address1',
+    'city': 'city',
+    'state': 'state',
+    'postalcode': 'postalCode', 'zip': 'postalCode', 'zipcode': 'postalCode',
+    'country': 'country',
+    'website': 'website',
+    'timezone': 'timezone',
+    'source': 'source',
+    'tags': 'tags',
+    'dateofbirth': 'dateOfBirth', 'dob': 'dateOfBirth',
+}
+
+REPORT_COLUMNS = ('row', 'email', 'phone', 'result', 'contact_id', 'error')
+
+# Per-row outcomes written to the report
+RESULT_CREATED = 'created'
+RESULT_UPDATED = 'updated'
+RESULT_DUPLICATE = 'duplicate'
+RESULT_INVALID = 'invalid'
+RESULT_FAILED = 'failed'
+
+
+def normalize_email(value):
+    value = str(value or '').strip().lower()
+    return value if '@' in value else None
+
+
+def normalize_phone(value):
+    """Digits only, keeping a leading +, so '+1 (555) 010-2000' matches '+15550102000'."""
+    value = str(value or '').strip()
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+    return f"+{digits}" if value.startswith('+') else digits
+
+
+def phone_key(value):
+    """Digits only, for matching phones written with and without a leading +."""
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def to_contact(record):
+    """Map one parsed row to a GHL contact payload (unknown columns are ignored)."""
+    contact = {}
+    for key, value in record.items():
+        field = FIELD_ALIASES.get(re.sub(r'[^a-z0-9]', '', str(key).lower()))
+        if not field or value in (None, ''):
+            continue
+        if field == 'tags':
+            value = value if isinstance(value, list) else [t.strip() for t in str(value).split(',') if t.strip()]
+        elif isinstance(value, str):
+            value = value.strip()
+        contact[field] = value
+
+    if 'email' in contact:
+        contact['email'] = normalize_email(contact['email'])
+    if 'phone' in contact:
+        contact['phone'] = normalize_phone(contact['phone'])
+    return {k: v for k, v in contact.items() if v}
+
+
+def iter_records(path, fmt):
+    """Yield (row number, record dict or None, parse error) without reading the whole file."""
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        if fmt == 'csv':
+            for number, record in enumerate(csv.DictReader(f), start=1):
+                yield number, record, None
+            return
+
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield number, None, "Expected a JSON object"
+                continue
+            yield number, record, None
+
+
+class GHLContactImportService:
+    """Service for bulk contact import jobs (Job rows of type ghl_contact_import)"""
+
+    @staticmethod
+    def import_dir():
+        path = current_app.config.get('GHL_IMPORT_DIR') or os.path.join(current_app.instance_path, 'ghl_imports')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def create_job(user_id, location_id, stream, fmt):
+        """
+        Save an upload to disk in chunks and create its import job.
+
+        Args:
+            stream: Readable file object (an uploaded file or the request body)
+            fmt: 'csv' or 'ndjson'
+        """
+        job_id = str(uuid.uuid4())
+        directory = GHLContactImportService.import_dir()
+        upload_path = os.path.join(directory, f"{job_id}.{fmt}")
+        with open(upload_path, 'wb') as f:
+            while True:
+                chunk = stream.read(64 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+        job = Job(
+            id=job_id,
+            user_id=user_id,
+            job_type=Job.TYPE_GHL_CONTACT_IMPORT,
+            status=Job.STATUS_PENDING
+        )
+        job.set_params({
+            'location_id': location_id,
+            'format': fmt,
+            'upload_path': upload_path,
+            'report_path': os.path.join(directory, f"{job_id}-report.csv"),
+        })
+        db.session.add(job)
+        db.session.commit()
+
+        logger.info(f"Created contact import job {job_id} for user {user_id} ({os.path.getsize(upload_path)} bytes)")
+        return job
+
+    @staticmethod
+    def run_job_background(app, job_id):
+        """Background entry point."""
+        with app.app_context():
+            try:
+                GHLContactImportService.run_job(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Contact import job {job_id} failed: {str(e)}")
+                job = Job.query.get(job_id)
+                if job:
+                    job.mark_failed(str(e))
+
+    @staticmethod
+    def run_job(job_id):
+        """
+        Import every row of the job's upload.
+
+        Rows are read in chunks. Each chunk is deduplicated against earlier rows
+        of the file (by email, then phone) and matched against the local
+        ghl_contacts index. Contacts already known are updated in place; the rest
+        go through GHL's upsert so GHL still catches duplicates we haven't seen.
+
+        If the rate limiter won't send (usually a spent daily quota), the job
+        goes back to pending with params['resume_row'] and
+        params['next_attempt_at']; resume_paused() continues it from that row
+        once the limiter has budget again.
+        """
+        # Atomic, so a resume can't start the job twice
+        claimed = Job.query.filter(Job.id == job_id, Job.status == Job.STATUS_PENDING).update(
+            {'status': Job.STATUS_IN_PROGRESS, 'last_updated': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            return
+        job = Job.query.get(job_id)
+        if not job.started_at:
+            job.started_at = datetime.utcnow()
+
+        params = job.get_params()
+        params.pop('next_attempt_at', None)
+        job.set_params(params)
+        db.session.commit()
+
+        config = current_app.config
+        chunk_size = config.get('GHL_IMPORT_CHUNK_SIZE', 200)
+        client = token_provider.client_for_location(params['location_id'])
+
+        total = sum(1 for _ in iter_records(params['upload_path'], params['format']))
+        job.update_progress(total=total)
+
+        # Rows before resume_row were reported by an earlier run
+        resume_row = params.get('resume_row', 0)
+        counts = dict.fromkeys((RESULT_CREATED, RESULT_UPDATED, RESULT_DUPLICATE, RESULT_INVALID, RESULT_FAILED), 0)
+        counts.update(params.get('counts') or {})
+        seen_emails, seen_phones = set(), set()
+        paused = None
+
+        with open(params['report_path'], 'a' if resume_row else 'w', newline='') as report_file, \
+                ThreadPoolExecutor(max_workers=config.get('GHL_IMPORT_CONCURRENCY', 4),
+                                   thread_name_prefix='ghl-import') as executor:
+            report = csv.DictWriter(report_file, fieldnames=REPORT_COLUMNS)
+            if not resume_row:
+                report.writeheader()
+
+            def record_result(number, contact, result, contact_id=None, error=None):
+                counts[result] += 1
+                report.writerow({
+                    'row': number,
+                    'email': contact.get('email', ''),
+                    'phone': contact.get('phone', ''),
+                    'result': result,
+                    'contact_id': contact_id or '',
+                    'error': error or '',
+                })
+
+            # (row number, contact, result, error); result is None for rows still to push
+            rows, to_push = [], 0
+            for number, record, parse_error in iter_records(params['upload_path'], params['format']):
+                row = GHLContactImportService._check_row(number, record, parse_error, seen_emails, seen_phones)
+                if number < resume_row:
+                    # Already reported; checked only to rebuild the duplicate sets
+                    continue
+                rows.append(row)
+                to_push += row[2] is None
+                if to_push >= chunk_size:
+                    paused = GHLContactImportService._push_chunk(client, executor, params, rows, record_result)
+                    rows, to_push = [], 0
+                    report_file.flush()
+                    GHLContactImportService._update_progress(job, counts)
+                    if paused:
+                        break
+
+            if rows and not paused:
+                paused = GHLContactImportService._push_chunk(client, executor, params, rows, record_result)
+            GHLContactImportService._update_progress(job, counts)
+
+        if paused:
+            GHLContactImportService._pause(job, counts, *paused)
+            return
+
+        try:
+            os.remove(params['upload_path'])
+        except OSError:
+            pass
+
+        job.mark_completed({'results': counts})
+        logger.info(f"Contact import job {job_id} completed: {counts}")
+
+    @staticmethod
+    def _check_row(number, record, parse_error, seen_emails, seen_phones):
+        """
+        Validate one row and deduplicate it against earlier rows (updates the seen sets).
+
+        Returns:
+            (number, contact, result or None if the row should be pushed, error)
+        """
+        if parse_error:
+            return number, {}, RESULT_INVALID, parse_error
+        try:
+            contact = to_contact(record)
+        except Exception as e:
+            return number, {}, RESULT_INVALID, f"Unreadable row: {e}"
+
+        email, phone = contact.get('email'), phone_key(contact.get('phone'))
+        if not email and not phone:
+            return number, contact, RESULT_INVALID, 'Row needs a valid email or phone'
+        if (email and email in seen_emails) or (phone and phone in seen_phones):
+            return number, contact, RESULT_DUPLICATE, 'Same email or phone as an earlier row'
+        if email:
+            seen_emails.add(email)
+        if phone:
+            seen_phones.add(phone)
+        return number, contact, None, None
+
+    @staticmethod
+    def _push_chunk(client, executor, params, rows, record_result):
+        """
+        Send one chunk to GHL concurrently and report its rows in order; database
+        and report writes stay on this thread.
+
+        Returns:
+            None, or (row number, seconds to wait) if the rate limiter stopped sending at
+            that row; it and the rows after it are left unreported
+        """
+        location_id = params['location_id']
+        chunk = [(number, contact) for number, contact, result, _ in rows if result is None]
+        emails = [c['email'] for _, c in chunk if c.get('email')]
+        # Stored phones may or may not carry the leading +
+        phones = set()
+        for _, c in chunk:
+            if c.get('phone'):
+                phones.update((c['phone'], phone_key(c['phone']), f"+{phone_key(c['phone'])}"))
+
+        known_by_email, known_by_phone = {}, {}
+        conditions = []
+        if emails:
+            conditions.append(GHLContact.email.in_(emails))
+        if phones:
+            conditions.append(GHLContact.phone.in_(list(phones)))
+        if conditions:
+            for row in GHLContact.query.filter(GHLContact.location_id == location_id, or_(*conditions)).all():
+                if row.email:
+                    known_by_email[row.email.lower()] = row.ghl_contact_id
+                if row.phone:
+                    known_by_phone[phone_key(row.phone)] = row.ghl_contact_id
+
+        futures = {
+            number: executor.submit(
+                GHLContactImportService._push_one, client, contact,
+                known_by_email.get(contact.get('email')) or known_by_phone.get(phone_key(contact.get('phone')))
+            )
+            for number, contact in chunk
+        }
+
+        pushed = []
+        paused = None
+        for number, contact, result, error in rows:
+            ghl_contact = None
+            if result is None:
+                try:
+                    result, ghl_contact, error = futures[number].result()
+                except GHLRateLimitExceeded as e:
+                    # Rows after this one may have gone through; upsert makes pushing them again safe
+                    paused = (number, e.retry_after or 0)
+                    break
+            record_result(number, contact, result, ghl_contact.get('id') if ghl_contact else None, error)
+            if ghl_contact and ghl_contact.get('id'):
+                pushed.append({**contact, **ghl_contact})
+        GHLContactService.cache_contacts(location_id, pushed)
+        return paused
+
+    @staticmethod
+    def _push_one(client, contact, contact_id):
+        """
+        Create or update one contact (runs in a worker thread, no database access).
+
+        The client already retries 429/5xx, so any other failure is final.
+
+        Returns:
+            (result, GHL contact dict or None, error message or None)
+
+        Raises:
+            GHLRateLimitExceeded: if the rate limiter won't send now (e.g. the daily quota is spent)
+        """
+        try:
+            if contact_id:
+                try:
+                    response = client.update_contact(contact_id, contact)
+                    return RESULT_UPDATED, response.get('contact', response), None
+                except GHLRateLimitExceeded:
+                    raise
+                except Exception as e:
+                    if not str(e).startswith('[404]'):
+                        raise
+                    # Deleted in GHL since we cached it; let GHL match or create instead
+            response = client.upsert_contact(contact)
+            result = RESULT_CREATED if response.get('new') else RESULT_UPDATED
+            return result, response.get('contact', response), None
+        except GHLRateLimitExceeded:
+            raise
+        except Exception as e:
+            return RESULT_FAILED, None, str(e)
+
+    @staticmethod
+    def _pause(job, counts, resume_row, wait):
+        """Put the job back to pending for resume_paused() to continue from resume_row after `wait` seconds."""
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=wait)
+        params = job.get_params()
+        params.update(resume_row=resume_row, counts=counts, next_attempt_at=next_attempt_at.isoformat())
+        job.set_params(params)
+        job.status = Job.STATUS_PENDING
+        job.last_updated = datetime.utcnow()
+        db.session.commit()
+        logger.warning(
+            f"Contact import job {job.id}: GHL quota spent at row {resume_row}, "
+            f"paused until {next_attempt_at.isoformat()}"
+        )
+
+    @staticmethod
+    def resume_paused():
+        """Continue import jobs paused on the GHL quota whose pause is over."""
+        now = datetime.utcnow()
+        job_ids = []
+        for job in Job.query.filter(
+            Job.job_type == Job.TYPE_GHL_CONTACT_IMPORT,
+            Job.status == Job.STATUS_PENDING
+        ).all():
+            next_attempt_at = job.get_params().get('next_attempt_at')
+            if next_attempt_at and datetime.fromisoformat(next_attempt_at) <= now:
+                job_ids.append(job.id)
+
+        for job_id in job_ids:
+            logger.info(f"Resuming contact import job {job_id}")
+            try:
+                GHLContactImportService.run_job(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error resuming contact import job {job_id}: {str(e)}")
+                job = Job.query.get(job_id)
+                if job:
+                    job.mark_failed(str(e))
+        return len(job_ids)
+
+    @staticmethod
+    def _update_progress(job, counts):
+        processed = sum(counts.values())
+        job.update_progress(
+            processed=processed,
+            success=counts[RESULT_CREATED] + counts[RESULT_UPDATED],
+            error=counts[RESULT_INVALID] + counts[RESULT_FAILED],
+        )
@@ -0,0 +1,89 @@
+"""
+GoHighLevel Contact Cache Service
+Keeps the local ghl_contacts summary table in step with GHL and serves lookups from it
+"""
+import logging
+import threading
+from ..models import GHLContact, GHLTask
+from ..extensions import db
+from .ghl_token_service import token_provider
+
+logger = logging.getLogger(__name__)
+
+
+class GHLContactService:
+    """Service for the local GHL contact summary cache"""
+
+    @staticmethod
+    def cache_contacts(location_id, contacts):
+        """
+        Upsert contact summaries seen in a GHL response. Failures are logged and
+        swallowed: the cache is best-effort and must never fail the caller.
+        """
+        if not location_id or not contacts:
+            return 0
+        try:
+            written = GHLContact.upsert_from_ghl(location_id, contacts)
+            db.session.commit()
+            return written
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to cache GHL contacts for location {location_id}: {e}")
+            return 0
+
+    @staticmethod
+    def forget_contact(location_id, contact_id):
+        """Remove a deleted contact from the cache."""
+        try:
+            GHLContact.query.filter_by(location_id=location_id, ghl_contact_id=contact_id).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to remove cached GHL contact {contact_id}: {e}")
+
+    @staticmethod
+    def get_contact_info(location_id, contact_id):
+        """Cached contact info dict, or None on a miss."""
+        contact = GHLContact.get_by_contact(location_id, contact_id)
+        return contact.to_contact_info() if contact else None
+
+    @staticmethod
+    def handle_webhook(event_type, data):
+        """Apply a ContactCreate / ContactUpdate / ContactDelete webhook to the cache."""
+        location_id = data.get('locationId')
+        contact_id = data.get('id') or data.get('contactId')
+        if not location_id or not contact_id:
+            return
+
+        if event_type == 'ContactDelete':
+            GHLContactService.forget_contact(location_id, contact_id)
+        else:
+            GHLContactService.cache_contacts(location_id, [{**data, 'id': contact_id}])
+
+    @staticmethod
+    def fill_task_contact_background(app, location_id, ghl_task_id, contact_id):
+        """Start a thread that fetches a contact missing from the cache and fills it into a task."""
+        thread = threading.Thread(
+            target=GHLContactService._fill_task_contact,
+            args=(app, location_id, ghl_task_id, contact_id),
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _fill_task_contact(app, location_id, ghl_task_id, contact_id):
+        with app.app_context():
+            try:
+                client = token_provider.client_for_location(location_id)
+                contact_data = client.get_contact(contact_id)
+                contact = contact_data.get('contact', contact_data)
+
+                GHLContact.upsert_from_ghl(location_id, [{**contact, 'id': contact_id}])
+                local_task = GHLTask.query.filter_by(ghl_task_id=ghl_task_id).first()
+                if local_task:
+                    local_task.set_contact_info(contact)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Failed to fill contact {contact_id} for task {ghl_task_id}: {e}")
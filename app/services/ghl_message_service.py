@@ -0,0 +1,127 @@
+"""
+GoHighLevel Conversation Message Service
+Keeps a local copy of conversation messages so opening a conversation is a local read plus a small delta fetch
+"""
+import logging
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from ..models import GHLMessage
+from ..extensions import db
+
+logger = logging.getLogger(__name__)
+
+# GHL caps conversation message pages at 100
+MESSAGES_PAGE_SIZE = 100
+
+
+def _unwrap(response):
+    """
+    GET /conversations/{id}/messages nests the page one level down:
+    {"messages": {"messages": [...], "lastMessageId": ..., "nextPage": bool}}
+    """
+    page = response.get('messages', response)
+    if isinstance(page, list):
+        return page, None, False
+    return page.get('messages', []), page.get('lastMessageId'), bool(page.get('nextPage'))
+
+
+class GHLMessageService:
+    """Service for the local ghl_messages store and its incremental sync"""
+
+    @staticmethod
+    def sync_new_messages(client, conversation_id):
+        """
+        Fetch messages newer than the newest one stored locally.
+
+        GHL returns messages newest first, so pages are walked until one contains
+        a message that is already stored. A conversation seen for the first time
+        only gets its newest GHL_MESSAGE_INITIAL_PAGES pages; older history is
+        filled in by sync_older_messages as the user scrolls back.
+
+        Returns:
+            Number of messages inserted
+        """
+        location_id = client.location_id
+        has_local = db.session.query(
+            GHLMessage.query.filter_by(ghl_conversation_id=conversation_id).exists()
+        ).scalar()
+        max_pages = None if has_local else current_app.config.get('GHL_MESSAGE_INITIAL_PAGES', 1)
+
+        inserted = 0
+        last_message_id = None
+        pages = 0
+        while True:
+            params = {'limit': MESSAGES_PAGE_SIZE}
+            if last_message_id:
+                params['lastMessageId'] = last_message_id
+            messages, next_last_id, next_page = _unwrap(
+                client.get_conversation_messages(conversation_id, **params)
+            )
+            pages += 1
+
+            known = GHLMessage.known_ids([m.get('id') for m in messages if m.get('id')])
+            fresh = []
+            for message in messages:
+                if message.get('id') in known:
+                    break
+                fresh.append(message)
+            inserted += GHLMessageService._store(location_id, conversation_id, fresh)
+
+            if known or not next_page or not next_last_id or next_last_id == last_message_id:
+                break
+            if max_pages is not None and pages >= max_pages:
+                break
+            last_message_id = next_last_id
+
+        return inserted
+
+    @staticmethod
+    def sync_older_messages(client, conversation_id):
+        """
+        Fetch one page of messages older than the oldest one stored locally.
+
+        Returns:
+            Number of messages inserted (0 once the start of the conversation is reached)
+        """
+        oldest = GHLMessage.query.filter_by(ghl_conversation_id=conversation_id).order_by(
+            GHLMessage.date_added.asc(), GHLMessage.id.asc()
+        ).first()
+        if not oldest:
+            return GHLMessageService.sync_new_messages(client, conversation_id)
+
+        messages, _, _ = _unwrap(client.get_conversation_messages(
+            conversation_id, limit=MESSAGES_PAGE_SIZE, lastMessageId=oldest.ghl_message_id
+        ))
+        return GHLMessageService._store(client.location_id, conversation_id, messages)
+
+    @staticmethod
+    def _store(location_id, conversation_id, messages):
+        """Insert one page and commit. A concurrent sync of the same conversation wins on conflict."""
+        if not messages:
+            return 0
+        try:
+            inserted = GHLMessage.add_new(location_id, conversation_id, messages)
+            db.session.commit()
+            return inserted
+        except IntegrityError:
+            db.session.rollback()
+            logger.info(f"Messages for conversation {conversation_id} were stored by a concurrent sync")
+            return 0
+
+    @staticmethod
+    def search(location_id, text, conversation_id=None, contact_id=None):
+        """
+        Query for stored messages in a location whose body matches `text`.
+
+        Uses the FULLTEXT index on MySQL (boolean mode, so +word / -word / "phrase"
+        work); other databases fall back to a case-insensitive substring match.
+        """
+        query = GHLMessage.query.filter(GHLMessage.location_id == location_id)
+        if conversation_id:
+            query = query.filter(GHLMessage.ghl_conversation_id == conversation_id)
+        if contact_id:
+            query = query.filter(GHLMessage.ghl_contact_id == contact_id)
+
+        if db.session.get_bind().dialect.name == 'mysql':
+            return query.filter(GHLMessage.body.match(text))
+        return query.filter(GHLMessage.body.ilike(f"%{text}%"))
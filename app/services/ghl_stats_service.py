@@ -0,0 +1,365 @@
+"""
+GoHighLevel Opportunity Statistics Service
+Aggregates every opportunity in a location (not just one search page) and keeps the result warm
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, case
+from ..models import GHLTask
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('open', 'won', 'lost', 'abandoned')
+
+OPPORTUNITY_EVENTS = (
+    'OpportunityCreate',
+    'OpportunityUpdate',
+    'OpportunityStatusUpdate',
+    'OpportunityStageUpdate',
+    'OpportunityMonetaryValueUpdate',
+    'OpportunityAssignedToUpdate',
+    'OpportunityDelete',
+)
+
+# (location_id, pipeline_id, startDate, endDate) -> OpportunityStats
+_stats_cache = TTLCache(maxsize=1024)
+
+# Shared by all dashboard requests; a section that overruns its timeout keeps
+# running here (and still warms its cache) without holding up the response
+_dashboard_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='ghl-dashboard')
+
+# (location_id, section, user_id, query) -> Future still running on _dashboard_executor.
+# A request for a section that is already in flight waits on that run instead of
+# queueing another, so a slow location can't fill the pool with repeats of its overruns.
+_dashboard_in_flight = {}
+_dashboard_in_flight_lock = threading.Lock()
+
+
+def _value(opp):
+    try:
+        return float(opp.get('monetaryValue') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class OpportunityStats:
+    """
+    Running totals by status and stage, plus the per-opportunity facts needed to
+    apply a later change (so a webhook can move one opportunity between buckets
+    without recounting everything).
+    """
+
+    def __init__(self, pipeline_id=None):
+        self.pipeline_id = pipeline_id
+        self.count_by_status = Counter()
+        self.value_by_status = defaultdict(float)
+        self.count_by_stage = Counter()
+        self.value_by_stage = defaultdict(float)
+        # opportunity id -> (status, stage id, pipeline id, monetary value)
+        self.opportunities = {}
+        self.computed_at = None
+        self._lock = threading.Lock()
+
+    def _add(self, opp_id, facts):
+        status, stage_id, _, value = facts
+        self.opportunities[opp_id] = facts
+        self.count_by_status[status] += 1
+        self.value_by_status[status] += value
+        self.count_by_stage[stage_id] += 1
+        self.value_by_stage[stage_id] += value
+
+    def _remove(self, opp_id):
+        facts = self.opportunities.pop(opp_id, None)
+        if facts is None:
+            return None
+        status, stage_id, _, value = facts
+        self.count_by_status[status] -= 1
+        self.value_by_status[status] -= value
+        self.count_by_stage[stage_id] -= 1
+        self.value_by_stage[stage_id] -= value
+        return facts
+
+    def add_page(self, opportunities):
+        """Fold one page of search results into the totals. Duplicates across pages count once."""
+        with self._lock:
+            for opp in opportunities:
+                if opp.get('id'):
+                    self._remove(opp['id'])
+                    self._add(opp['id'], self._facts(opp))
+
+    def apply(self, opp, deleted=False):
+        """Apply a created / updated / deleted opportunity (e.g. from a webhook)."""
+        opp_id = opp.get('id')
+        if not opp_id:
+            return
+        with self._lock:
+            previous = self._remove(opp_id)
+            if deleted:
+                return
+            facts = self._facts(opp, previous)
+            if self.pipeline_id is None or facts[2] == self.pipeline_id:
+                self._add(opp_id, facts)
+
+    @staticmethod
+    def _facts(opp, previous=None):
+        """Extract (status, stage, pipeline, value); fields missing from a partial webhook keep their old values."""
+        status, stage_id, pipeline_id, value = previous or ('open', None, None, 0.0)
+        if opp.get('status'):
+            status = opp['status'].lower()
+        stage_id = opp.get('pipelineStageId', stage_id)
+        pipeline_id = opp.get('pipelineId', pipeline_id)
+        if 'monetaryValue' in opp:
+            value = _value(opp)
+        return status, stage_id, pipeline_id, value
+
+    def to_dict(self):
+        with self._lock:
+            total = len(self.opportunities)
+            stats = {'total': total}
+            for status in STATUSES:
+                stats[status] = self.count_by_status.get(status, 0)
+            for status, count in self.count_by_status.items():
+                if status not in stats and count:
+                    stats[status] = count
+
+            # User-friendly categories (same meaning as before)
+            stats['purchased'] = stats['won']
+            stats['long_term_future'] = stats['lost'] + stats['abandoned']
+            stats['new_opportunities'] = total - stats['won'] - stats['lost'] - stats['abandoned']
+            stats['engaged_leads'] = 0
+
+            stats['monetary_value'] = {
+                'total': round(sum(self.value_by_status.values()), 2),
+                **{status: round(self.value_by_status.get(status, 0.0), 2) for status in STATUSES},
+            }
+            stats['by_stage'] = [
+                {
+                    'stage_id': stage_id,
+                    'count': count,
+                    'monetary_value': round(self.value_by_stage.get(stage_id, 0.0), 2),
+                }
+                for stage_id, count in self.count_by_stage.items() if count
+            ]
+            stats['computed_at'] = self.computed_at.isoformat() if self.computed_at else None
+            return stats
+
+
+class OpportunityStatsService:
+    """Service for full-pagination opportunity statistics with a per-location cache"""
+
+    @staticmethod
+    def _cache_key(location_id, pipeline_id, query):
+        return (location_id, pipeline_id or None, query.get('startDate'), query.get('endDate'))
+
+    @staticmethod
+    def get_stats(client, pipeline_id=None, fresh=False, **query):
+        """
+        Return stats for a location (optionally one pipeline), computing them on a cache miss.
+
+        Args:
+            client: LeadConnectorClient for the location
+            pipeline_id: Only count this pipeline
+            fresh: Ignore any cached result
+            query: Extra search filters (startDate, endDate)
+        """
+        key = OpportunityStatsService._cache_key(client.location_id, pipeline_id, query)
+        if not fresh:
+            cached = _stats_cache.get(key)
+            if cached is not None:
+                return cached.to_dict()
+
+        stats = OpportunityStatsService.compute(client, pipeline_id, **query)
+        _stats_cache.set(key, stats, ttl=current_app.config.get('GHL_STATS_CACHE_TTL_SECONDS', 120))
+        return stats.to_dict()
+
+    @staticmethod
+    def compute(client, pipeline_id=None, max_workers=None, **query):
+        """Page through every matching opportunity concurrently, aggregating each page as it arrives."""
+        max_workers = max_workers or current_app.config.get('GHL_FANOUT_CONCURRENCY', 8)
+        if pipeline_id:
+            query['pipeline_id'] = pipeline_id
+
+        stats = OpportunityStats(pipeline_id)
+        for page in client.iter_opportunity_pages(max_workers=max_workers, **query):
+            stats.add_page(page)
+        stats.computed_at = datetime.utcnow()
+        return stats
+
+    @staticmethod
+    def handle_webhook(event_type, data):
+        """
+        Apply an opportunity webhook to every cached result for its location.
+        Date-filtered results can't be patched reliably, so they are dropped.
+        """
+        location_id = data.get('locationId')
+        if not location_id or event_type not in OPPORTUNITY_EVENTS:
+            return
+
+        opp = dict(data)
+        opp['id'] = data.get('id') or data.get('opportunityId')
+        deleted = event_type == 'OpportunityDelete'
+
+        for key, stats in _stats_cache.items():
+            if key[0] != location_id:
+                continue
+            if key[2] or key[3]:
+                _stats_cache.delete(key)
+                continue
+            stats.apply(opp, deleted=deleted)
+
+    @staticmethod
+    def invalidate(location_id):
+        """Drop every cached result for a location."""
+        return _stats_cache.delete_where(lambda key: key[0] == location_id)
+
+
+class DashboardStatsService:
+    """Builds /stats/dashboard from independent sections fetched concurrently"""
+
+    SECTIONS = ('opportunities', 'pipelines', 'tasks', 'contacts')
+
+    # Seconds each section may take before the dashboard is returned without it
+    SECTION_TIMEOUTS = {
+        'opportunities': 10,
+        'pipelines': 5,
+        'tasks': 3,
+        'contacts': 5,
+    }
+
+    # What a section holds when it failed or timed out
+    SECTION_DEFAULTS = {
+        'opportunities': {},
+        'pipelines': [],
+        'tasks': {},
+        'contacts': {},
+    }
+
+    @staticmethod
+    def build(client, user_id=None, sections=None, timeout=None, **query):
+        """
+        Run the requested sections in parallel and collect whatever finishes in time.
+
+        Args:
+            client: LeadConnectorClient for the location
+            user_id: Local user for the tasks section (skipped if None)
+            sections: Section names to include (default: all)
+            timeout: Override every section's timeout, in seconds
+            query: Opportunity filters (pipelineId, startDate, endDate)
+
+        Returns:
+            Dict with one key per section, plus `partial` and `errors` describing
+            sections that failed or timed out (their value is the empty default
+            from SECTION_DEFAULTS)
+        """
+        app = current_app._get_current_object()
+        sections = [s for s in (sections or DashboardStatsService.SECTIONS) if s in DashboardStatsService.SECTIONS]
+        if user_id is None and 'tasks' in sections:
+            sections.remove('tasks')
+
+        builders = {
+            'opportunities': lambda: client.get_opportunity_stats(**query),
+            'pipelines': lambda: DashboardStatsService._pipelines(client),
+            'tasks': lambda: DashboardStatsService._tasks(user_id),
+            'contacts': lambda: DashboardStatsService._contacts(client),
+        }
+
+        started = time.monotonic()
+        query_key = tuple(sorted(query.items()))
+        futures = {
+            name: DashboardStatsService._submit(
+                (client.location_id, name, user_id if name == 'tasks' else None, query_key),
+                app, builders[name]
+            )
+            for name in sections
+        }
+
+        stats = {'recent_activity': []}
+        errors = {}
+        for name, future in futures.items():
+            limit = timeout if timeout is not None else DashboardStatsService.SECTION_TIMEOUTS[name]
+            remaining = max(0, started + limit - time.monotonic())
+            try:
+                stats[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                # Drops it if it never got a worker; a started run finishes (once) in the background
+                future.cancel()
+                stats[name] = DashboardStatsService.SECTION_DEFAULTS[name].copy()
+                errors[name] = f"Timed out after {limit}s"
+                logger.warning(f"Dashboard section '{name}' timed out for location {client.location_id}")
+            except Exception as e:
+                stats[name] = DashboardStatsService.SECTION_DEFAULTS[name].copy()
+                errors[name] = str(e)
+                logger.error(f"Dashboard section '{name}' failed for location {client.location_id}: {e}")
+
+        stats['partial'] = bool(errors)
+        stats['errors'] = errors
+        return stats
+
+    @staticmethod
+    def _submit(key, app, builder):
+        """Start a section on the shared executor, or join the run already in flight for key."""
+        with _dashboard_in_flight_lock:
+            future = _dashboard_in_flight.get(key)
+            if future is not None:
+                return future
+            future = _dashboard_in_flight[key] = _dashboard_executor.submit(DashboardStatsService._run, app, builder)
+        # Outside the lock: this runs the callback immediately if the section already finished
+        future.add_done_callback(lambda f: DashboardStatsService._forget(key, f))
+        return future
+
+    @staticmethod
+    def _forget(key, future):
+        with _dashboard_in_flight_lock:
+            if _dashboard_in_flight.get(key) is future:
+                del _dashboard_in_flight[key]
+
+    @staticmethod
+    def _run(app, builder):
+        with app.app_context():
+            return builder()
+
+    @staticmethod
+    def _pipelines(client):
+        pipelines = client.list_pipelines()
+        return [
+            {
+                'id': p.get('id'),
+                'name': p.get('name'),
+                'stages_count': len(p.get('stages', []))
+            }
+            for p in pipelines.get('pipelines', [])
+        ]
+
+    @staticmethod
+    def _tasks(user_id):
+        """Task counts from the local ghl_tasks mirror (one aggregate query)."""
+        now = datetime.utcnow()
+        total, completed, overdue = GHLTask.query.with_entities(
+            func.count(GHLTask.id),
+            func.sum(case((GHLTask.completed.is_(True), 1), else_=0)),
+            func.sum(case(
+                ((GHLTask.completed.is_(False)) & (GHLTask.due_date < now), 1),
+                else_=0
+            )),
+        ).filter(GHLTask.user_id == user_id).one()
+
+        total, completed, overdue = total or 0, int(completed or 0), int(overdue or 0)
+        return {
+            'total': total,
+            'completed': completed,
+            'open': total - completed,
+            'overdue': overdue,
+        }
+
+    @staticmethod
+    def _contacts(client):
+        """Contact total from the search metadata; only one contact is transferred."""
+        result = client.list_contacts(limit=1)
+        meta = result.get('meta') or {}
+        return {'total': meta.get('total', len(result.get('contacts', [])))}
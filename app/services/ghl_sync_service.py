@@ -0,0 +1,468 @@
+"""
+GoHighLevel Mirror Sync Service
+Mirrors a location's tasks and opportunities into local tables in the background
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from flask import current_app
+from sqlalchemy import or_, and_
+from ..models import User, GHLToken, GHLTask, GHLSyncState, GHLContact, GHLOpportunity
+from ..models.ghl_opportunity import parse_ghl_datetime
+from ..extensions import db
+from .ghl_token_service import token_provider
+
+logger = logging.getLogger(__name__)
+
+# GHL caps contact list and opportunity search pages at 100
+CONTACTS_PAGE_SIZE = 100
+OPPORTUNITIES_PAGE_SIZE = 100
+
+# Incremental opportunity syncs ask for the most recently changed first and stop
+# once a page reaches the watermark; the overlap absorbs clock skew with GHL
+OPPORTUNITIES_INCREMENTAL_ORDER = 'updated_desc'
+OPPORTUNITIES_WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
+def _fetch_contact_tasks(client, contact):
+    """client.fetch_contact_tasks, returning (tasks, error) so one bad contact doesn't stop the page."""
+    try:
+        return client.fetch_contact_tasks(contact), None
+    except Exception as e:
+        logger.warning(f"Error fetching tasks for contact {contact['id']}: {e}")
+        return [], str(e)
+
+
+class GHLTaskSyncService:
+    """Service for mirroring GHL tasks into the local ghl_tasks table"""
+
+    @staticmethod
+    def get_client(location_id):
+        """Build a client for a location outside of a request."""
+        return token_provider.client_for_location(location_id)
+
+    @staticmethod
+    def sync_all_locations():
+        """Mirror tasks for every connected GHL location."""
+        location_ids = [
+            row.ghl_location_id
+            for row in User.query.with_entities(User.ghl_location_id)
+            .filter(User.ghl_location_id.isnot(None)).distinct().all()
+        ]
+        logger.info(f"Starting GHL task mirror sync for {len(location_ids)} locations")
+
+        for location_id in location_ids:
+            try:
+                GHLTaskSyncService.sync_location(location_id)
+            except Exception as e:
+                logger.error(f"Error syncing GHL tasks for location {location_id}: {str(e)}")
+                db.session.rollback()
+                continue
+
+    @staticmethod
+    def run_for_user_background(app, user_id):
+        """Background entry point for a manually triggered sync of a user's location."""
+        with app.app_context():
+            try:
+                user = User.query.get(user_id)
+                if not user or not user.ghl_location_id:
+                    logger.warning(f"User {user_id} has no GHL location configured, skipping task sync")
+                    return
+                GHLTaskSyncService.sync_location(user.ghl_location_id)
+            except Exception as e:
+                logger.error(f"Error in background GHL task sync for user {user_id}: {str(e)}")
+
+    @staticmethod
+    def _location_user_ids(location_id):
+        """Ids of the users connected to a location, lowest (the owner of new tasks) first."""
+        return [
+            row.id
+            for row in User.query.with_entities(User.id)
+            .filter(User.ghl_location_id == location_id).order_by(User.id).all()
+        ]
+
+    @staticmethod
+    def sync_location(location_id, concurrency=None):
+        """
+        Mirror all tasks in a GHL location into ghl_tasks.
+
+        Contacts are walked one page at a time; each page's tasks are fetched with
+        bounded concurrency, bulk-upserted and committed together with the resume
+        cursor, so an interrupted run picks up at the last completed page. Tasks not
+        seen during a clean run are deleted at the end.
+
+        Several users can share a location; it is synced once and its tasks stay
+        with whichever of its users already holds them. New tasks (and tasks held
+        by a user who has since left the location) go to the location's lowest
+        user id, and the stale cleanup only looks at tasks held by its users.
+
+        Args:
+            location_id: GHL location id
+            concurrency: Parallel task fetches per page (defaults to GHL_SYNC_CONCURRENCY)
+
+        Returns:
+            The sync state as a dict
+        """
+        state = GHLSyncState.get_or_create(location_id, GHLSyncState.RESOURCE_TASKS)
+
+        if state.is_locked():
+            logger.info(f"GHL task sync already running for location {location_id}, skipping")
+            return state.to_dict()
+
+        if not GHLToken.get_by_location(location_id):
+            logger.warning(f"No OAuth token for location {location_id}, skipping task sync")
+            return state.to_dict()
+
+        user_ids = GHLTaskSyncService._location_user_ids(location_id)
+        if not user_ids:
+            logger.warning(f"No users connected to location {location_id}, skipping task sync")
+            return state.to_dict()
+
+        concurrency = concurrency or current_app.config.get('GHL_SYNC_CONCURRENCY', 5)
+
+        if state.can_resume() and state.get_cursor():
+            logger.info(f"Resuming GHL task sync for location {location_id} from {state.get_cursor()}")
+        else:
+            state.run_started_at = datetime.utcnow()
+            state.set_cursor(None)
+            state.items_synced = 0
+            state.items_deleted = 0
+            state.contacts_scanned = 0
+            state.error_count = 0
+        state.status = GHLSyncState.STATUS_RUNNING
+        state.error_message = None
+        state.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            client = GHLTaskSyncService.get_client(location_id)
+            cursor = state.get_cursor() or {}
+
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                while True:
+                    result = client.list_contacts(limit=CONTACTS_PAGE_SIZE, **cursor)
+                    contacts = [c for c in result.get('contacts', []) if c.get('id')]
+                    if not contacts:
+                        break
+
+                    # executor.map preserves contact order while keeping `concurrency` calls in flight
+                    page_results = list(executor.map(_fetch_contact_tasks, repeat(client), contacts))
+                    synced = GHLTaskSyncService._upsert_page(user_ids, contacts, page_results)
+                    GHLContact.upsert_from_ghl(location_id, contacts)
+
+                    meta = result.get('meta') or {}
+                    cursor = {k: meta[k] for k in ('startAfterId', 'startAfter') if meta.get(k)}
+
+                    state.items_synced += synced
+                    state.contacts_scanned += len(contacts)
+                    state.error_count += sum(1 for _, error in page_results if error)
+                    state.set_cursor(cursor)
+                    state.updated_at = datetime.utcnow()
+                    # Tasks, contact summaries and checkpoint are committed together
+                    db.session.commit()
+
+                    if len(result.get('contacts', [])) < CONTACTS_PAGE_SIZE or not cursor:
+                        break
+
+            if state.error_count == 0:
+                state.items_deleted = GHLTaskSyncService._delete_missing(user_ids, state.run_started_at)
+            else:
+                # A contact we failed to read would look like it lost all its tasks
+                logger.warning(
+                    f"Skipping stale task cleanup for location {location_id}: "
+                    f"{state.error_count} contacts failed during this run"
+                )
+
+            state.status = GHLSyncState.STATUS_COMPLETED
+            state.set_cursor(None)
+            state.last_completed_at = datetime.utcnow()
+            db.session.commit()
+
+            logger.info(
+                f"GHL task sync completed for location {location_id}: {state.items_synced} synced, "
+                f"{state.items_deleted} deleted, {state.contacts_scanned} contacts scanned"
+            )
+        except Exception as e:
+            logger.error(f"GHL task sync failed for location {location_id}: {str(e)}")
+            db.session.rollback()
+            state.status = GHLSyncState.STATUS_FAILED
+            state.error_message = str(e)
+            db.session.commit()
+
+        return state.to_dict()
+
+    @staticmethod
+    def _upsert_page(user_ids, contacts, page_results):
+        """
+        Insert or update every task from one contacts page. Returns the number of tasks written.
+
+        Args:
+            user_ids: The location's user ids; new tasks are owned by the first
+        """
+        synced_at = datetime.utcnow()
+        rows = [
+            (contact, task_data)
+            for contact, (tasks, _) in zip(contacts, page_results)
+            for task_data in tasks
+            if task_data.get('id')
+        ]
+        if not rows:
+            return 0
+
+        task_ids = [task_data['id'] for _, task_data in rows]
+        existing = {
+            t.ghl_task_id: t
+            for t in GHLTask.query.filter(GHLTask.ghl_task_id.in_(task_ids)).all()
+        }
+
+        for contact, task_data in rows:
+            local_task = existing.get(task_data['id'])
+            if local_task:
+                local_task.update_from_ghl(task_data)
+                if local_task.user_id not in user_ids:
+                    local_task.user_id = user_ids[0]
+                local_task.ghl_contact_id = contact['id']
+                local_task.set_contact_info(task_data['contact'])
+            else:
+                local_task = GHLTask.from_ghl_response(
+                    ghl_data=task_data,
+                    user_id=user_ids[0],
+                    contact_id=contact['id'],
+                    contact_info=task_data['contact'],
+                )
+                db.session.add(local_task)
+                existing[task_data['id']] = local_task
+            local_task.last_synced_at = synced_at
+
+        return len(rows)
+
+    @staticmethod
+    def _delete_missing(user_ids, run_started_at):
+        """Delete the location's tasks that were not seen by the run that started at run_started_at."""
+        deleted = GHLTask.query.filter(
+            GHLTask.user_id.in_(user_ids),
+            or_(
+                GHLTask.last_synced_at < run_started_at,
+                # Created locally before the run but never seen on GHL
+                and_(GHLTask.last_synced_at.is_(None), GHLTask.created_at < run_started_at),
+            )
+        ).delete(synchronize_session=False)
+        return deleted
+
+
+class GHLOpportunitySyncService:
+    """Service for mirroring GHL opportunities into the local ghl_opportunities table"""
+
+    @staticmethod
+    def sync_all_locations():
+        """Mirror opportunities for every connected GHL location."""
+        location_ids = [
+            row.ghl_location_id
+            for row in User.query.with_entities(User.ghl_location_id)
+            .filter(User.ghl_location_id.isnot(None)).distinct().all()
+        ]
+        logger.info(f"Starting GHL opportunity mirror sync for {len(location_ids)} locations")
+
+        for location_id in location_ids:
+            try:
+                GHLOpportunitySyncService.sync_location(location_id)
+            except Exception as e:
+                logger.error(f"Error syncing GHL opportunities for location {location_id}: {str(e)}")
+                db.session.rollback()
+                continue
+
+    @staticmethod
+    def run_for_location_background(app, location_id, full=None):
+        """Background entry point for a manually triggered sync."""
+        with app.app_context():
+            try:
+                GHLOpportunitySyncService.sync_location(location_id, full=full)
+            except Exception as e:
+                logger.error(f"Error in background GHL opportunity sync for location {location_id}: {str(e)}")
+
+    @staticmethod
+    def _full_sync_due(state):
+        """True if the location has no watermark yet or its last full reconcile is too old."""
+        if not state.watermark or not state.last_full_sync_at:
+            return True
+        every = timedelta(hours=current_app.config.get('GHL_OPPORTUNITY_FULL_SYNC_HOURS', 24))
+        return datetime.utcnow() - state.last_full_sync_at >= every
+
+    @staticmethod
+    def _reached_watermark(opportunities, watermark):
+        """
+        True if this page of an updated-desc walk already reaches changes older
+        than the watermark. None if the page isn't in that order (or lacks
+        updatedAt), in which case stopping early isn't safe.
+        """
+        updated = [parse_ghl_datetime(o.get('updatedAt')) for o in opportunities]
+        if any(u is None for u in updated) or any(a < b for a, b in zip(updated, updated[1:])):
+            return None
+        return updated[-1] < watermark
+
+    @staticmethod
+    def sync_location(location_id, full=None):
+        """
+        Mirror a GHL location's opportunities into ghl_opportunities.
+
+        Runs are incremental: opportunities are requested most recently
+        updated first and the walk stops at the first page that reaches the
+        previous run's watermark (its start time, less a small overlap), so a
+        quiet location costs one request. Every GHL_OPPORTUNITY_FULL_SYNC_HOURS
+        (or with full=True) a full run walks every page instead and deletes
+        opportunities it didn't see. Webhooks keep the mirror current between
+        runs.
+
+        Pages are walked with GHL's startAfter cursor and checkpointed like the
+        task sync. Only opportunities whose updatedAt changed are rewritten;
+        unchanged ones just have last_synced_at bumped in one UPDATE.
+
+        Args:
+            location_id: GHL location id
+            full: Force (True) or skip (False) the full reconcile; None picks by schedule
+
+        Returns:
+            The sync state as a dict
+        """
+        state = GHLSyncState.get_or_create(location_id, GHLSyncState.RESOURCE_OPPORTUNITIES)
+
+        if state.is_locked():
+            logger.info(f"GHL opportunity sync already running for location {location_id}, skipping")
+            return state.to_dict()
+
+        if not GHLToken.get_by_location(location_id):
+            logger.warning(f"No OAuth token for location {location_id}, skipping opportunity sync")
+            return state.to_dict()
+
+        if state.can_resume() and state.get_cursor():
+            # Resumed runs keep the mode (and so the page order) they started with
+            logger.info(f"Resuming GHL opportunity sync for location {location_id} from {state.get_cursor()}")
+        else:
+            state.run_started_at = datetime.utcnow()
+            state.full_run = GHLOpportunitySyncService._full_sync_due(state) if full is None else bool(full)
+            state.set_cursor(None)
+            state.items_synced = 0
+            state.items_deleted = 0
+            state.contacts_scanned = 0
+            state.error_count = 0
+        state.status = GHLSyncState.STATUS_RUNNING
+        state.error_message = None
+        state.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            client = GHLTaskSyncService.get_client(location_id)
+            cursor = state.get_cursor() or {}
+            if state.full_run or not state.watermark:
+                order, watermark = {}, None
+            else:
+                order = {'order': OPPORTUNITIES_INCREMENTAL_ORDER}
+                watermark = state.watermark - OPPORTUNITIES_WATERMARK_OVERLAP
+
+            while True:
+                result = client.search_opportunities(limit=OPPORTUNITIES_PAGE_SIZE, **order, **cursor)
+                opportunities = [o for o in result.get('opportunities', []) if o.get('id')]
+                if not opportunities:
+                    break
+
+                state.items_synced += GHLOpportunitySyncService._upsert_page(location_id, opportunities)
+
+                meta = result.get('meta') or {}
+                cursor = {k: meta[k] for k in ('startAfterId', 'startAfter') if meta.get(k)}
+                state.set_cursor(cursor)
+                state.updated_at = datetime.utcnow()
+                # Opportunities and checkpoint are committed together
+                db.session.commit()
+
+                if len(result.get('opportunities', [])) < OPPORTUNITIES_PAGE_SIZE or not cursor:
+                    break
+
+                if watermark is not None:
+                    reached = GHLOpportunitySyncService._reached_watermark(opportunities, watermark)
+                    if reached:
+                        break
+                    if reached is None:
+                        logger.warning(
+                            f"GHL opportunities for location {location_id} aren't ordered by updatedAt; "
+                            f"walking every page this run"
+                        )
+                        watermark = None
+
+            if state.full_run:
+                state.items_deleted = GHLOpportunity.query.filter(
+                    GHLOpportunity.location_id == location_id,
+                    or_(
+                        GHLOpportunity.last_synced_at < state.run_started_at,
+                        # Created (e.g. by a webhook) before the run but never seen on GHL
+                        and_(
+                            GHLOpportunity.last_synced_at.is_(None),
+                            GHLOpportunity.created_at < state.run_started_at
+                        ),
+                    )
+                ).delete(synchronize_session=False)
+                state.last_full_sync_at = state.run_started_at
+
+            state.status = GHLSyncState.STATUS_COMPLETED
+            state.set_cursor(None)
+            state.watermark = state.run_started_at
+            state.last_completed_at = datetime.utcnow()
+            db.session.commit()
+
+            logger.info(
+                f"GHL opportunity {'full' if state.full_run else 'incremental'} sync completed for location "
+                f"{location_id}: {state.items_synced} changed, {state.items_deleted} deleted"
+            )
+        except Exception as e:
+            logger.error(f"GHL opportunity sync failed for location {location_id}: {str(e)}")
+            db.session.rollback()
+            state.status = GHLSyncState.STATUS_FAILED
+            state.error_message = str(e)
+            db.session.commit()
+
+        return state.to_dict()
+
+    @staticmethod
+    def _upsert_page(location_id, opportunities):
+        """Write changed opportunities from one page. Returns how many were inserted or updated."""
+        synced_at = datetime.utcnow()
+        known = dict(
+            GHLOpportunity.query.with_entities(GHLOpportunity.ghl_opportunity_id, GHLOpportunity.ghl_updated_at)
+            .filter(GHLOpportunity.ghl_opportunity_id.in_([o['id'] for o in opportunities]))
+            .all()
+        )
+
+        changed, unchanged_ids = [], []
+        for opp in opportunities:
+            updated_at = parse_ghl_datetime(opp.get('updatedAt'))
+            stored = known.get(opp['id'])
+            # MySQL DATETIME drops fractional seconds, so compare at second precision
+            if stored and updated_at and stored.replace(microsecond=0) == updated_at.replace(microsecond=0):
+                unchanged_ids.append(opp['id'])
+            else:
+                changed.append(opp)
+
+        if unchanged_ids:
+            GHLOpportunity.query.filter(
+                GHLOpportunity.ghl_opportunity_id.in_(unchanged_ids)
+            ).update({GHLOpportunity.last_synced_at: synced_at}, synchronize_session=False)
+
+        return GHLOpportunity.upsert_from_ghl(location_id, changed, synced_at=synced_at)
+
+    @staticmethod
+    def handle_webhook(event_type, data):
+        """Apply an opportunity webhook to the local mirror."""
+        location_id = data.get('locationId')
+        opportunity_id = data.get('id') or data.get('opportunityId')
+        if not location_id or not opportunity_id:
+            return
+
+        try:
+            if event_type == 'OpportunityDelete':
+                GHLOpportunity.query.filter_by(ghl_opportunity_id=opportunity_id).delete()
+            else:
+                GHLOpportunity.upsert_from_ghl(location_id, [{**data, 'id': opportunity_id}])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to apply {event_type} webhook for opportunity {opportunity_id}: {e}")
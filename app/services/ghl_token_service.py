@@ -0,0 +1,314 @@
+"""
+GoHighLevel Token Provider
+Serves GHL access tokens from an in-process cache and refreshes them single-flight
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from flask import current_app
+from sqlalchemy.orm import Session
+from ..models import User, GHLToken
+from ..extensions import db
+from .cache import TTLCache
+from app.script.highLevelAPI import LeadConnectorClient
+
+logger = logging.getLogger(__name__)
+
+# Cache key for the single agency-level token
+AGENCY_KEY = '__agency__'
+
+# Requests only refresh inline when the token is this close to expiring (i.e. the
+# background refresher has fallen behind or is failing); anything earlier is left to it
+INLINE_REFRESH_SECONDS = 120
+
+# Upper bound on the retry backoff for a token whose refresh keeps failing
+MAX_BACKOFF_MINUTES = 60
+
+
+class CachedToken:
+    """What the provider keeps in memory for one location (or the agency)."""
+
+    __slots__ = ('access_token', 'expires_at', 'company_id')
+
+    def __init__(self, access_token, expires_at, company_id=None):
+        self.access_token = access_token
+        self.expires_at = expires_at
+        self.company_id = company_id
+
+    def expires_within(self, seconds) -> bool:
+        return datetime.utcnow() + timedelta(seconds=seconds) >= self.expires_at
+
+
+class GHLTokenProvider:
+    """
+    TTL-bounded cache of GHL access tokens keyed by location.
+
+    Most requests are answered from memory without touching ghl_tokens. When a
+    token does need refreshing, a per-key lock makes concurrent callers in this
+    process share one refresh, and a SELECT ... FOR UPDATE on the token row does
+    the same across processes. GHL refresh tokens are single-use, so two
+    refreshes racing each other would invalidate the loser's token.
+    """
+
+    def __init__(self, maxsize=10000):
+        self._tokens = TTLCache(maxsize=maxsize)
+        self._user_locations = TTLCache(maxsize=maxsize)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _cache_ttl():
+        return current_app.config.get('GHL_TOKEN_CACHE_TTL_SECONDS', 300)
+
+    @staticmethod
+    def _refresh_margin_minutes():
+        return current_app.config.get('GHL_TOKEN_REFRESH_MARGIN_MINUTES', 30)
+
+    # ===============
+    # Public accessors
+    # ===============
+    def get_user_location(self, user_id):
+        """Return the GHL location id for an app user."""
+        key = str(user_id)
+        location_id = self._user_locations.get(key)
+        if location_id is None:
+            user = User.query.get(user_id)
+            if not user:
+                raise Exception("User not found")
+            location_id = user.ghl_location_id
+            if not location_id:
+                raise Exception("User has no GHL location configured")
+            self._user_locations.set(key, location_id, ttl=self._cache_ttl())
+        return location_id
+
+    def get_location_token(self, location_id):
+        """Return a usable access token for a location."""
+        return self._get(location_id).access_token
+
+    def get_agency_token(self):
+        """Return (access_token, company_id) for the agency-level token."""
+        entry = self._get(AGENCY_KEY)
+        return entry.access_token, entry.company_id
+
+    def client_for_location(self, location_id):
+        """Build a LeadConnectorClient for a location."""
+        return LeadConnectorClient(
+            access_token=self.get_location_token(location_id),
+            location_id=location_id
+        )
+
+    def agency_client(self):
+        """Build a LeadConnectorClient with the agency token."""
+        access_token, company_id = self.get_agency_token()
+        return LeadConnectorClient(
+            access_token=access_token,
+            location_id=None,  # Agency level - no specific location
+            rate_limit_key=f"agency:{company_id}"
+        )
+
+    def refresh(self, location_id=None, agency=False):
+        """
+        Force a refresh now (e.g. from the /crm/refresh endpoint).
+
+        Returns:
+            The refreshed GHLToken row
+
+        Raises:
+            Exception if the token doesn't exist or GHL rejects the refresh
+        """
+        key = AGENCY_KEY if agency else location_id
+        with self._lock_for(key):
+            ghl_token = self._refresh_locked(key, force=True, raise_errors=True)
+            self._store(key, ghl_token)
+            return ghl_token
+
+    def invalidate(self, location_id=None, agency=False):
+        """Drop a cached token, e.g. after re-authorization or uninstall."""
+        self._tokens.delete(AGENCY_KEY if agency else location_id)
+
+    def refresh_expiring(self):
+        """
+        Refresh every stored token that expires within the refresh margin.
+
+        Runs from the scheduler so user requests never pay the OAuth round trip.
+        Tokens are taken soonest-expiring first and refreshed in small batches
+        with bounded concurrency. Failures are recorded on the token row and
+        retried with exponential backoff.
+
+        Returns:
+            Summary dict with due/refreshed/failed/skipped counts
+        """
+        app = current_app._get_current_object()
+        now = datetime.utcnow()
+        due = (
+            GHLToken.query
+            .with_entities(
+                GHLToken.location_id,
+                GHLToken.is_agency,
+                GHLToken.refresh_failures,
+                GHLToken.last_refresh_attempt_at,
+            )
+            .filter(
+                GHLToken.expires_at <= now + timedelta(minutes=self._refresh_margin_minutes()),
+                GHLToken.refresh_token != '',
+            )
+            .order_by(GHLToken.expires_at.asc())
+            .all()
+        )
+        db.session.commit()  # Don't hold a read transaction open while the batches run
+
+        keys = [
+            AGENCY_KEY if row.is_agency else row.location_id
+            for row in due
+            if (row.is_agency or row.location_id) and not self._backing_off(row, now)
+        ]
+        summary = {'due': len(due), 'refreshed': 0, 'failed': 0, 'skipped': len(due) - len(keys)}
+
+        batch_size = app.config.get('GHL_TOKEN_REFRESH_BATCH_SIZE', 20)
+        concurrency = app.config.get('GHL_TOKEN_REFRESH_CONCURRENCY', 4)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                for ok in executor.map(self._refresh_in_context, repeat(app), batch):
+                    summary['refreshed' if ok else 'failed'] += 1
+
+        if summary['failed']:
+            logger.error(f"GHL token refresh: {summary['failed']} of {len(keys)} tokens failed to refresh")
+        return summary
+
+    @staticmethod
+    def _backing_off(row, now):
+        """True if a token failed recently enough that it shouldn't be retried yet."""
+        if not row.refresh_failures or not row.last_refresh_attempt_at:
+            return False
+        backoff = timedelta(minutes=min(2 ** row.refresh_failures, MAX_BACKOFF_MINUTES))
+        return now - row.last_refresh_attempt_at < backoff
+
+    def _refresh_in_context(self, app, key):
+        """Worker-thread entry point for refresh_expiring."""
+        with app.app_context():
+            try:
+                with self._lock_for(key):
+                    ghl_token = self._refresh_locked(key, raise_errors=True)
+                    self._store(key, ghl_token)
+                return True
+            except Exception:
+                return False
+
+    # ========
+    # Internals
+    # ========
+    def _get(self, key):
+        entry = self._tokens.get(key)
+        if entry and not entry.expires_within(INLINE_REFRESH_SECONDS):
+            return entry
+
+        with self._lock_for(key):
+            # Another thread may have loaded or refreshed it while we waited
+            entry = self._tokens.get(key)
+            if entry and not entry.expires_within(INLINE_REFRESH_SECONDS):
+                return entry
+
+            ghl_token = self._load(key)
+            if ghl_token and ghl_token.expires_soon(minutes=INLINE_REFRESH_SECONDS / 60):
+                # None if the row was deleted (e.g. uninstalled) before we locked it
+                ghl_token = self._refresh_locked(key)
+            if not ghl_token:
+                if key == AGENCY_KEY:
+                    raise Exception("No agency OAuth token found. Please authorize the marketplace app first.")
+                raise Exception(f"No OAuth token found for location {key}. Please re-authorize.")
+
+            return self._store(key, ghl_token)
+
+    @staticmethod
+    def _query(key, session=db.session):
+        query = session.query(GHLToken)
+        if key == AGENCY_KEY:
+            return query.filter_by(is_agency=True)
+        return query.filter_by(location_id=key)
+
+    def _load(self, key):
+        return self._query(key).first()
+
+    def _store(self, key, ghl_token):
+        entry = CachedToken(ghl_token.access_token, ghl_token.expires_at, ghl_token.company_id)
+        seconds_left = (ghl_token.expires_at - datetime.utcnow()).total_seconds() - INLINE_REFRESH_SECONDS
+        self._tokens.set(key, entry, ttl=max(1, min(self._cache_ttl(), seconds_left)))
+        return entry
+
+    def _refresh_locked(self, key, force=False, raise_errors=False):
+        """
+        Refresh one token. Caller must hold the key's lock.
+
+        The row is locked FOR UPDATE and re-checked first, so if another
+        process refreshed it in the meantime we just pick up its new token.
+        This runs in its own session: the lock, commits and rollbacks never
+        touch the caller's db.session or any work a request has pending in it.
+        The returned row is detached with its columns loaded.
+        """
+        with Session(db.engine, expire_on_commit=False) as session:
+            ghl_token = self._query(key, session).with_for_update().first()
+            if not ghl_token:
+                session.rollback()
+                if raise_errors:
+                    raise Exception(f"No OAuth token found for {key}")
+                return None
+
+            if not force and not ghl_token.expires_soon(minutes=self._refresh_margin_minutes()):
+                session.commit()  # Release the row lock
+                return ghl_token
+
+            try:
+                from app.script.ghl_oauth import GHLOAuthClient
+                oauth_client = GHLOAuthClient(
+                    client_id=current_app.config.get('GHL_CLIENT_ID'),
+                    client_secret=current_app.config.get('GHL_CLIENT_SECRET'),
+                    redirect_uri=current_app.config.get('GHL_REDIRECT_URI')
+                )
+                token_data = oauth_client.refresh_access_token(
+                    ghl_token.refresh_token,
+                    ghl_token.user_type
+                )
+                ghl_token.update_tokens(token_data)
+                ghl_token.last_refresh_attempt_at = datetime.utcnow()
+                session.commit()
+                logger.info(f"Refreshed GHL OAuth token for {key}")
+            except Exception as e:
+                session.rollback()
+                ghl_token = self._query(key, session).first()
+                if not ghl_token:
+                    # Deleted (e.g. by the uninstall webhook) while we were refreshing
+                    logger.warning(f"GHL OAuth token for {key} was removed during a failed refresh: {e}")
+                    if raise_errors:
+                        raise
+                    return None
+                ghl_token.record_refresh_failure(str(e))
+                session.commit()
+                logger.error(
+                    f"Failed to refresh GHL OAuth token for {key} "
+                    f"({ghl_token.refresh_failures} consecutive failures): {e}"
+                )
+                if raise_errors:
+                    raise
+                # Continue with the existing token if refresh fails
+
+            return ghl_token
+
+    def stats(self):
+        return {
+            'tokens': self._tokens.stats(),
+            'user_locations': self._user_locations.stats(),
+        }
+
+
+# Global provider instance
+token_provider = GHLTokenProvider()
@@ -0,0 +1,119 @@
+"""
+LLM Backends
+Builds the chat model behind the AI reply pipeline: OpenAI in production, a deterministic local fake for benchmarks
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Backend name -> factory(settings) returning an object with invoke(prompt) and bind(**kwargs)
+BACKENDS = {}
+
+
+def register_backend(name, factory):
+    BACKENDS[name] = factory
+
+
+def create_llm(backend, settings):
+    """Build a chat model with the named backend."""
+    try:
+        factory = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend '{backend}' (available: {', '.join(sorted(BACKENDS))})")
+    return factory(settings)
+
+
+def _openai(settings):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(**settings)
+
+
+class FakeLLMError(Exception):
+    """Simulated API failure raised by FakeLLM."""
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """
+    Offline stand-in for ChatOpenAI. Batch prompts get a {"replies": [...]}
+    answer covering every comment id in the prompt; single-reply prompts get
+    plain text. Outcomes are drawn from a RNG seeded by the prompt, so a run
+    is reproducible no matter how calls interleave across threads.
+
+    Args (settings keys):
+        latency_ms: Simulated time per call
+        error_rate: Share of calls that raise FakeLLMError
+        malformed_rate: Share of batch answers cut off mid-JSON
+        seed: Changes which calls fail / are malformed
+    """
+
+    def __init__(self, settings):
+        self.latency_ms = float(settings.get('latency_ms', 0))
+        self.error_rate = float(settings.get('error_rate', 0))
+        self.malformed_rate = float(settings.get('malformed_rate', 0))
+        self.seed = str(settings.get('seed', 0))
+        self.model_name = settings.get('model_name', 'fake')
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.calls = 0
+        self.errors = 0
+
+    def bind(self, **kwargs):
+        # response_format etc. don't change what the fake returns
+        return self
+
+    def invoke(self, prompt):
+        started = time.perf_counter()
+        rng = random.Random(hashlib.sha256(f"{self.seed}:{prompt}".encode('utf-8')).digest())
+        try:
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000.0)
+            if rng.random() < self.error_rate:
+                with self._lock:
+                    self.errors += 1
+                raise FakeLLMError('Simulated LLM API error')
+
+            comments = self._comments(prompt)
+            if not comments:
+                return FakeMessage(f"Thanks for your comment! Find out more: http://form.zestal.pro/{rng.randrange(10 ** 6)}")
+
+            content = json.dumps({'replies': [
+                {'id': c['id'], 'reply': f"Thanks for your comment! ({str(c.get('comment') or '')[:40]})"}
+                for c in comments
+            ]})
+            if rng.random() < self.malformed_rate:
+                content = content[:rng.randrange(1, len(content))]
+            return FakeMessage(content)
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.latencies.append(time.perf_counter() - started)
+
+    @staticmethod
+    def _comments(prompt):
+        """Comment objects ({"id", "comment", ...}) found in a batch prompt."""
+        decoder = json.JSONDecoder()
+        position = prompt.find('[')
+        while position != -1:
+            try:
+                value, end = decoder.raw_decode(prompt, position)
+            except ValueError:
+                position = prompt.find('[', position + 1)
+                continue
+            if isinstance(value, list) and value and all(isinstance(v, dict) and 'id' in v and 'comment' in v for v in value):
+                return value
+            position = prompt.find('[', end)
+        return []
+
+
+register_backend('openai', _openai)
+register_backend('fake', FakeLLM)
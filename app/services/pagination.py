@@ -0,0 +1,117 @@
+"""
+Keyset (seek) pagination helpers
+Builds opaque cursors and seek predicates so deep pages cost the same as the first one
+"""
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_, literal
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or was issued for a different sort"""
+
+
+def encode_cursor(sort_key, sort_order, value, row_id):
+    """Encode the last row's sort value and id into an opaque, URL-safe cursor."""
+    if isinstance(value, datetime):
+        value = {'dt': value.isoformat()}
+    payload = json.dumps([sort_key, sort_order, value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_key, sort_order):
+    """Decode a cursor, checking it belongs to the requested sort. Returns (value, row_id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key, order, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(value, dict) and 'dt' in value:
+            value = datetime.fromisoformat(value['dt'])
+    except Exception as e:
+        raise InvalidCursor('Malformed cursor') from e
+
+    if key != sort_key or order != sort_order:
+        raise InvalidCursor('Cursor does not match the requested sortBy/sortOrder')
+    return value, row_id
+
+
+def _seek_predicate(sort_column, id_column, value, last_id, descending):
+    """
+    Rows strictly after (value, last_id) in (sort_column, id_column) order.
+
+    NULLs are treated as the smallest value, which matches how MySQL and SQLite
+    order them natively, so the ORDER BY stays a plain index scan.
+    """
+    if value is not None:
+        # Bind explicitly so boolean sort columns can be compared with < / >
+        value = literal(value, type_=sort_column.type)
+
+    if descending:
+        if value is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id),
+            sort_column.is_(None),
+        )
+
+    if value is None:
+        return or_(
+            and_(sort_column.is_(None), id_column > last_id),
+            sort_column.isnot(None),
+        )
+    return or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > last_id),
+    )
+
+
+def keyset_paginate(query, sort_key, sort_column, id_column, sort_order='desc',
+                    cursor=None, limit=50, offset=None):
+    """
+    Fetch one page of `query` ordered by (sort_column, id_column).
+
+    Args:
+        query: Filtered SQLAlchemy query (no ORDER BY applied yet)
+        sort_key: Public name of the sort column, baked into the cursor
+        sort_column / id_column: Model columns to order and tie-break on
+        sort_order: 'asc' or 'desc'
+        cursor: Cursor returned by the previous page, if any
+        limit: Page size
+        offset: Legacy page offset, only used when no cursor is given
+
+    Returns:
+        (items, next_cursor) - next_cursor is None on the last page
+
+    Raises:
+        InvalidCursor: if the cursor is malformed or was issued for another sort
+    """
+    sort_order = 'asc' if sort_order == 'asc' else 'desc'
+    descending = sort_order == 'desc'
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_key, sort_order)
+        query = query.filter(_seek_predicate(sort_column, id_column, value, last_id, descending))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    if offset and not cursor:
+        query = query.offset(offset)
+
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            sort_key, sort_order,
+            getattr(last, sort_column.key),
+            getattr(last, id_column.key),
+        )
+    return items, next_cursor
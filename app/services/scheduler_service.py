@@ -13,7 +13,11 @@ from apscheduler.triggers.cron import CronTrigger
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 from flask import current_app
 from .facebook_service import FacebookService
-from .ai_service import generateCommentsReply
+from .ai_reply_queue_service import AIReplyQueueService
+from .ghl_sync_service import GHLTaskSyncService, GHLOpportunitySyncService
+from .ghl_token_service import token_provider
+from .ghl_bulk_message_service import GHLBulkMessageService
+from .ghl_contact_import_service import GHLContactImportService
 from ..models import User, FacebookPost
 from ..extensions import db
 from app.script.scrapper import scrape_post_comments
@@ -35,6 +39,12 @@ class SchedulerService:
         self.taskTimeMinutes = app.config['FACEBOOK_TASK_TIME_MINUTES']
         self.scraperTaskTimeMinutes = app.config['SCRAPER_TASK_TIME_MINUTES']
         self.limit = app.config['FACEBOOK_POST_LIMIT']
+        self.ghlTaskSyncMinutes = app.config['GHL_TASK_SYNC_MINUTES']
+        self.ghlOpportunitySyncMinutes = app.config['GHL_OPPORTUNITY_SYNC_MINUTES']
+        self.ghlTokenRefreshMinutes = app.config['GHL_TOKEN_REFRESH_INTERVAL_MINUTES']
+        self.ghlBulkMessageResumeMinutes = app.config['GHL_BULK_MESSAGE_RESUME_MINUTES']
+        self.ghlImportResumeMinutes = app.config['GHL_IMPORT_RESUME_MINUTES']
+        self.aiReplyQueueMinutes = app.config['AI_REPLY_QUEUE_MINUTES']
         print(f"Scheduler service initialized with limit: {self.limit} and task time minutes: {self.taskTimeMinutes} and scraper task time minutes: {self.scraperTaskTimeMinutes}")
         # Configure scheduler with memory job store (simpler setup)
         self.scheduler = BackgroundScheduler(timezone='UTC')
@@ -56,6 +66,7 @@ class SchedulerService:
             
             # Add default jobs
             self.add_facebook_jobs()
+            self.add_ghl_jobs()
     
     def shutdown(self):
         """Shutdown the scheduler"""
@@ -109,7 +120,7 @@ class SchedulerService:
             max_instances=1  # Prevent overlapping executions
         )
         
-        # Job 2: Generate comments after 2 hours of fetching comments
+        # Job 2: Queue pending comments that ingest didn't (older comments, other ingest paths)
         self.scheduler.add_job(
             func=self._generate_comments_replies,
             trigger=IntervalTrigger(hours=2),
@@ -118,9 +129,74 @@ class SchedulerService:
             replace_existing=True,
             max_instances=1  # Prevent overlapping executions
         )
+
+        # Drain the AI reply queue, highest priority first
+        self.scheduler.add_job(
+            func=self._process_ai_reply_queue,
+            trigger=IntervalTrigger(minutes=self.aiReplyQueueMinutes),
+            id='process_ai_reply_queue',
+            name='Process AI Reply Queue',
+            replace_existing=True,
+            max_instances=1  # Prevent overlapping executions
+        )
         
         logging.info("Facebook scheduler jobs added")
     
+    def add_ghl_jobs(self):
+        """Add GoHighLevel-related scheduled jobs"""
+
+        # Mirror GHL tasks into the local ghl_tasks table
+        self.scheduler.add_job(
+            func=self._sync_ghl_tasks,
+            trigger=IntervalTrigger(minutes=self.ghlTaskSyncMinutes),
+            id='sync_ghl_tasks',
+            name='Sync GHL Tasks',
+            replace_existing=True,
+            max_instances=1  # Prevent overlapping executions
+        )
+
+        # Mirror GHL opportunities into the local ghl_opportunities table
+        self.scheduler.add_job(
+            func=self._sync_ghl_opportunities,
+            trigger=IntervalTrigger(minutes=self.ghlOpportunitySyncMinutes),
+            id='sync_ghl_opportunities',
+            name='Sync GHL Opportunities',
+            replace_existing=True,
+            max_instances=1  # Prevent overlapping executions
+        )
+
+        # Refresh OAuth tokens before they expire so requests never wait on it
+        self.scheduler.add_job(
+            func=self._refresh_ghl_tokens,
+            trigger=IntervalTrigger(minutes=self.ghlTokenRefreshMinutes),
+            id='refresh_ghl_tokens',
+            name='Refresh GHL Tokens',
+            replace_existing=True,
+            max_instances=1  # Prevent overlapping executions
+        )
+
+        # Pick up bulk message jobs whose runner died (e.g. a deploy mid-send)
+        self.scheduler.add_job(
+            func=self._resume_ghl_bulk_messages,
+            trigger=IntervalTrigger(minutes=self.ghlBulkMessageResumeMinutes),
+            id='resume_ghl_bulk_messages',
+            name='Resume GHL Bulk Messages',
+            replace_existing=True,
+            max_instances=1  # Prevent overlapping executions
+        )
+
+        # Continue contact imports paused on a spent daily GHL quota
+        self.scheduler.add_job(
+            func=self._resume_ghl_contact_imports,
+            trigger=IntervalTrigger(minutes=self.ghlImportResumeMinutes),
+            id='resume_ghl_contact_imports',
+            name='Resume GHL Contact Imports',
+            replace_existing=True,
+            max_instances=1  # Prevent overlapping executions
+        )
+
+        logging.info("GHL scheduler jobs added")
+    
     def _fetch_all_user_posts(self):
         """Fetch posts for all users with valid Facebook tokens"""
         with self.app.app_context():
@@ -182,15 +258,70 @@ class SchedulerService:
                 logging.error(f"Error in scheduled scrape_post_comments: {str(e)}")
     
     def _generate_comments_replies(self):
-        """Generate comments replies for all users with valid Facebook tokens"""
+        """Queue pending comments of verified users that aren't in the AI reply queue yet"""
         with self.app.app_context():
             try:
-                users = User.query.filter(User.is_verified == True).all()
-                userIds = [user.id for user in users]
-                generateCommentsReply(userIds)
+                userIds = [row.id for row in User.query.with_entities(User.id).filter(User.is_verified == True)]
+                AIReplyQueueService.enqueue_pending(userIds)
                 logging.info(f"Scheduled Generate comments replies completed.")
             except Exception as e:
                 logging.error(f"Error in scheduled generate_comments_replies: {str(e)}")
+
+    def _process_ai_reply_queue(self):
+        """Generate replies for queued comments"""
+        with self.app.app_context():
+            try:
+                AIReplyQueueService.process()
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error in scheduled process_ai_reply_queue: {str(e)}")
+    
+    def _sync_ghl_tasks(self):
+        """Mirror GHL tasks for all users with a connected location"""
+        with self.app.app_context():
+            try:
+                GHLTaskSyncService.sync_all_locations()
+                logging.info("Scheduled GHL task sync completed.")
+            except Exception as e:
+                logging.error(f"Error in scheduled sync_ghl_tasks: {str(e)}")
+    
+    def _sync_ghl_opportunities(self):
+        """Mirror GHL opportunities for all connected locations"""
+        with self.app.app_context():
+            try:
+                GHLOpportunitySyncService.sync_all_locations()
+                logging.info("Scheduled GHL opportunity sync completed.")
+            except Exception as e:
+                logging.error(f"Error in scheduled sync_ghl_opportunities: {str(e)}")
+    
+    def _refresh_ghl_tokens(self):
+        """Pre-emptively refresh stored GHL tokens that are close to expiring"""
+        with self.app.app_context():
+            try:
+                summary = token_provider.refresh_expiring()
+                logging.info(f"Scheduled GHL token refresh completed: {summary}")
+            except Exception as e:
+                logging.error(f"Error in scheduled refresh_ghl_tokens: {str(e)}")
+    
+    def _resume_ghl_bulk_messages(self):
+        """Resume interrupted GHL bulk message jobs"""
+        with self.app.app_context():
+            try:
+                resumed = GHLBulkMessageService.resume_interrupted()
+                if resumed:
+                    logging.info(f"Resumed {resumed} GHL bulk message jobs")
+            except Exception as e:
+                logging.error(f"Error in scheduled resume_ghl_bulk_messages: {str(e)}")
+    
+    def _resume_ghl_contact_imports(self):
+        """Resume GHL contact imports paused on the daily quota"""
+        with self.app.app_context():
+            try:
+                resumed = GHLContactImportService.resume_paused()
+                if resumed:
+                    logging.info(f"Resumed {resumed} GHL contact import jobs")
+            except Exception as e:
+                logging.error(f"Error in scheduled resume_ghl_contact_imports: {str(e)}")
     
     def _cleanup_expired_tokens(self):
         """Clean up expired Facebook tokens"""